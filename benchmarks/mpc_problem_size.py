@@ -0,0 +1,91 @@
+"""
+Benchmark of the ModelPredictiveControl problem size against the forecast horizon.
+
+For each horizon builds a synthetic 15-minute microgrid (load, PV, battery, grid with oracle forecasts) and reports
+the time to build the MPC problem, the first solve (including CVXPY canonicalization), the mean receding-horizon
+step (``get_action`` followed by ``Microgrid.step``) and the number of stored entries of the constraint matrices,
+compared with their dense size. With ``--backend highs`` the problem is compiled once into a persistent HiGHS model
+and each step only patches costs and right-hand sides (requires highspy).
+
+Usage::
+
+    python benchmarks/mpc_problem_size.py [--horizons 24 96 672] [--steps 10] [--backend cvxpy]
+"""
+import argparse
+import sys
+import time
+import warnings
+from pathlib import Path
+
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from src.pymgrid import Microgrid
+from src.pymgrid.algos import ModelPredictiveControl
+from src.pymgrid.modules import BatteryModule, GridModule, LoadModule, RenewableModule
+
+
+STEPS_PER_DAY = 96
+
+
+def build_microgrid(horizon, n_steps, seed=0):
+    rng = np.random.default_rng(seed)
+    step = np.arange(horizon + n_steps + STEPS_PER_DAY)
+    hour_of_day = step % STEPS_PER_DAY
+
+    load = 2.0 + np.sin(2 * np.pi * step / STEPS_PER_DAY) + 0.3 * rng.random(len(step))
+    pv = np.clip(3.0 * np.sin((hour_of_day - 24) * np.pi / 48), 0.0, None)
+    import_price = np.where((hour_of_day >= 72) & (hour_of_day < 80), 0.35, 0.20)
+    grid = np.stack([import_price, 0.4 * import_price, np.zeros(len(step)), np.ones(len(step))], axis=1)
+
+    forecast = dict(forecaster='oracle', forecast_horizon=horizon - 1)
+    microgrid = Microgrid([
+        BatteryModule(0, 51.2, 5, 5, 0.9, init_soc=0.4),
+        LoadModule(load, **forecast),
+        RenewableModule(pv, **forecast),
+        GridModule(8, 8, grid, **forecast)
+    ])
+    microgrid.reset()
+    return microgrid
+
+
+def constraint_sizes(mpc):
+    matrices = [constraint.args[0].args[0].value for constraint in mpc.problem.constraints[:2]]
+    stored = sum(matrix.nnz for matrix in matrices)
+    dense = sum(np.prod(matrix.shape) for matrix in matrices)
+    return stored, dense
+
+
+def main(horizons, n_steps, backend='cvxpy'):
+    print(f"{'horizon':>8}{'build [ms]':>12}{'first solve [ms]':>18}{'step [ms]':>12}{'stored':>10}{'dense':>12}")
+    for horizon in horizons:
+        microgrid = build_microgrid(horizon, n_steps)
+
+        start = time.perf_counter()
+        mpc = ModelPredictiveControl(microgrid, backend=backend)
+        build_time = time.perf_counter() - start
+
+        start = time.perf_counter()
+        microgrid.step(mpc.get_action(), normalized=False)
+        first_time = time.perf_counter() - start
+
+        start = time.perf_counter()
+        for _ in range(n_steps):
+            microgrid.step(mpc.get_action(), normalized=False)
+        step_time = (time.perf_counter() - start) / n_steps
+
+        stored, dense = constraint_sizes(mpc)
+        print(f"{horizon:>8}{build_time * 1e3:>12.1f}{first_time * 1e3:>18.1f}{step_time * 1e3:>12.2f}"
+              f"{stored:>10}{dense:>12}")
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--horizons', type=int, nargs='+', default=[24, 96, 672])
+    parser.add_argument('--steps', type=int, default=10)
+    parser.add_argument('--backend', choices=['cvxpy', 'highs'], default='cvxpy')
+    args = parser.parse_args()
+
+    warnings.filterwarnings('ignore', module='gym')
+    main(args.horizons, args.steps, args.backend)
@@ -0,0 +1,69 @@
+"""
+Benchmark of the Voc/R0 interpolation of the UNIPI battery transition models.
+
+Compares the SciPy ``RegularGridInterpolator`` path (``interpolation='scipy'``) with the precompiled lookup table
+(``interpolation='lut'``) on random (SoC, temperature, SOH) queries, reporting the per-call cost of
+``_interp_voc_r0`` and the maximum relative deviation between the two paths.
+
+Usage::
+
+    python benchmarks/unipi_interpolation.py [--calls 20000]
+"""
+import argparse
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from src.pymgrid.modules.battery.transition_models import (
+    LfpTransitionModel,
+    NcaTransitionModel,
+    NmcTransitionModel,
+)
+
+
+def time_per_call(model, queries):
+    start = time.perf_counter()
+    for soc, temperature_c, soh in queries:
+        model._interp_voc_r0(soc, temperature_c, soh)
+    return (time.perf_counter() - start) / len(queries)
+
+
+def max_relative_error(scipy_model, lut_model, queries):
+    err = 0.0
+    for soc, temperature_c, soh in queries:
+        expected = np.array(scipy_model._interp_voc_r0(soc, temperature_c, soh))
+        actual = np.array(lut_model._interp_voc_r0(soc, temperature_c, soh))
+        err = max(err, np.max(np.abs(expected - actual) / np.abs(expected)))
+    return err
+
+
+def main(n_calls, seed=0):
+    rng = np.random.default_rng(seed)
+    queries = np.column_stack([
+        rng.uniform(-0.05, 1.05, n_calls),
+        rng.uniform(15.0, 45.0, n_calls),
+        rng.uniform(0.79, 1.0, n_calls)
+    ]).tolist()
+
+    print(f"{'model':<22}{'scipy [us]':>12}{'lut [us]':>12}{'speedup':>10}{'max rel err':>14}")
+    for cls in (LfpTransitionModel, NcaTransitionModel, NmcTransitionModel):
+        scipy_model = cls(debug_energy=False, interpolation='scipy')
+        lut_model = cls(debug_energy=False, interpolation='lut')
+
+        scipy_time = time_per_call(scipy_model, queries)
+        lut_time = time_per_call(lut_model, queries)
+        err = max_relative_error(scipy_model, lut_model, queries)
+
+        print(f"{cls.__name__:<22}{scipy_time * 1e6:>12.2f}{lut_time * 1e6:>12.2f}"
+              f"{scipy_time / lut_time:>9.1f}x{err:>14.2e}")
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--calls', type=int, default=20000)
+    args = parser.parse_args()
+    main(args.calls)
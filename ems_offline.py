@@ -14,7 +14,7 @@ from pandas import MultiIndex
 
 
 from microgrid_simulator import MicrogridSimulator
-from tools import load_config, compute_offline_tariff_vectors, plot_results, add_module_columns
+from tools import load_config, plot_results, add_module_columns
 from EMS import Rule_Based_EMS
 
 from pandasgui import show
@@ -24,7 +24,7 @@ from pandasgui import show
 
 config = load_config()              # Carica configurazione EMS da params.yml
 
-price_config = config['price_bands']               # Configurazione fasce prezzi
+tariff = config['tariff']                          # Tariffa a fasce precompilata (stessa del percorso online)
 simulation_steps = config['steps']                 # Numero di step di simulazione da eseguire
 
 timezone_str = config['timezone']   # Configura timezone per timestamp 
@@ -44,11 +44,7 @@ load_time_series = time_series['load']
 timestamps = time_series['datetime']
 
 
-price_buy_time_series, price_sell_time_series = compute_offline_tariff_vectors(
-    ts_series=timestamps,
-    local_timezone=timezone_str,
-    price_config=price_config
-)
+price_buy_time_series, price_sell_time_series = tariff.prices(timestamps)   # Prezzi per step in ora locale
 price_buy_time_series = price_buy_time_series
 price_sell_time_series = price_sell_time_series
 
@@ -83,35 +79,32 @@ microgrid.reset()  # Porta la microgrid in uno stato noto prima di iniziare la s
 
 ###### INSTANTIATE ENERGY MANAGEMENT SYSTEM AND RUN SIMULATION
 
-rule_based_EMS = Rule_Based_EMS(microgrid)       # Crea istanza EMS basato su regole per la microgrid
+if config['fast_offline']:
+    # Kernel veloce: stessa ricorsione di microgrid.step su array, senza passare per i moduli ad ogni step
+    microgrid_df, log = simulator.run_fast_offline(steps=simulation_steps)
 
+else:
+    rule_based_EMS = Rule_Based_EMS(microgrid)       # Crea istanza EMS basato su regole per la microgrid
 
-for step in range(1, simulation_steps + 1):         # Loop principale per il numero di step specificato
 
-    load_kwh = load_module.current_load
-    pv_kwh = pv_module.current_renewable
+    for step in range(1, simulation_steps + 1):         # Loop principale per il numero di step specificato
 
-    e_batt, e_grid = rule_based_EMS.control(                                # Calcola controllo basato su regole 
-        load_kwh = load_kwh, 
-        pv_kwh = pv_kwh,       
-        )
+        load_kwh = load_module.current_load
+        pv_kwh = pv_module.current_renewable
 
-    control = {"battery": e_batt, "grid": e_grid}   # Prepara il dizionario di controllo per lo step corrente
+        e_batt, e_grid = rule_based_EMS.control(                                # Calcola controllo basato su regole 
+            load_kwh = load_kwh, 
+            pv_kwh = pv_kwh,       
+            )
 
-    obs, reward, done, info = microgrid.step(control, normalized=False)
+        control = {"battery": e_batt, "grid": e_grid}   # Prepara il dizionario di controllo per lo step corrente
 
+        obs, reward, done, info = microgrid.step(control, normalized=False)
 
-microgrid_df, log = simulator.get_simulation_log(microgrid)     # Ottiene il log della simulazione come DataFrame pandas con tutti gli step
+    microgrid_df, log = simulator.get_simulation_log(microgrid)     # Ottiene il log della simulazione come DataFrame pandas con tutti gli step
 
 log.to_csv("microgrid_log.csv", index=True)                     # Salva il log della simulazione su file CSV
 
-battery_module = microgrid.battery[0]                           # Ottiene il modulo batteria dalla microgrid
-transition_model = battery_module.battery_transition_model      # Ottiene il modello di transizione della batteria
-
-history = transition_model.get_transition_history()                 # Ottiene la cronologia delle transizioni della batteria
-#eta_dynamic = [entry['eta_dynamic'] for entry in history]           # Estrae l'efficienza dinamica dalla cronologia
-
-
 additional_columns = {
     ('datetime', 0, 'timestamp'): time_series['datetime'].to_numpy()[:len(microgrid_df)],
     ('pv', 0, 'pv_prod_input'): time_series['solar'].to_numpy()[:len(microgrid_df)],             # Aggiunge la produzione PV in input come colonna al DataFrame della microgrid
@@ -123,10 +116,17 @@ additional_columns = {
 
 microgrid_df = add_module_columns(microgrid_df, additional_columns)
 
-print(transition_model)
+if not config['fast_offline']:                                  # Il kernel veloce non registra la cronologia delle transizioni
+    battery_module = microgrid.battery[0]                           # Ottiene il modulo batteria dalla microgrid
+    transition_model = battery_module.battery_transition_model      # Ottiene il modello di transizione della batteria
+
+    history = transition_model.get_transition_history()                 # Ottiene la cronologia delle transizioni della batteria
+    #eta_dynamic = [entry['eta_dynamic'] for entry in history]           # Estrae l'efficienza dinamica dalla cronologia
+
+    print(transition_model)
 
-transition_model.plot_transition_history(save_path=f"transitions_{simulator.battery_chemistry}.png", show=True)
-transition_model.save_transition_history(history_path=f"transitions_{simulator.battery_chemistry}.json")
+    transition_model.plot_transition_history(save_path=f"transitions_{simulator.battery_chemistry}.png", show=True)
+    transition_model.save_transition_history(history_path=f"transitions_{simulator.battery_chemistry}.json")
 
 #print(microgrid.log.columns)
 
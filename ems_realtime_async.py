@@ -0,0 +1,271 @@
+"""
+Runtime asyncio dell'EMS real-time su Kafka.
+
+Gli stadi girano come task separati collegati da code limitate (asyncio.Queue):
+
+    ingestione   campioni dal KafkaConsumer                      -> coda controllo
+    controllo    ingestione nella microgrid, Rule_Based_EMS.control e Microgrid.step (control_step)
+                                                                 -> coda report, batteria live
+    report       print_step_report e raccolta dei risultati, eseguiti in un thread
+
+Il controllo non attende mai report e UI: la stampa del report avviene fuori dall'event loop e la
+batteria live (LiveBatteryDisplay) riceve lo stato tramite shared memory e si ridisegna nel suo processo.
+
+Se viene passato un ResultsSink, il controllo vi aggiunge ogni step (la serializzazione dello stato avviene
+al flush, la scrittura su disco nel thread del sink) e i risultati non vengono tenuti in memoria.
+
+Per ogni stadio vengono raccolte le latenze (LatencyMetrics), stampate e salvate a fine esecuzione.
+"""
+import asyncio
+import time
+from collections import defaultdict
+from datetime import datetime
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from generator_and_consumer.consumer_class import KafkaConsumer
+from microgrid_simulator import MicrogridSimulator
+from tools import load_config, print_step_report
+from ems_realtime_kafka import control_step, open_results_sink, save_results
+from live_display import LiveBatteryDisplay
+from EMS import Rule_Based_EMS
+
+
+class LatencyMetrics:
+    """
+    Latenze per stadio del runtime, in secondi.
+
+    Stadi registrati:
+        handoff      ricezione del campione -> presa in carico dal controllo
+        control      control_step (ingestione + decisione + Microgrid.step)
+        decision     ricezione del campione -> decisione applicata (end-to-end del controllo)
+        control_wait attesa del controllo per spazio nella coda report (0 in condizioni normali)
+        report       stampa del report
+        report_lag   decisione applicata -> report completato
+        ui_push      pubblicazione dello stato alla batteria live
+        sink         aggiunta dello step al ResultsSink (incluso il checkpoint ogni flush_every step)
+    """
+
+    def __init__(self):
+        self._samples = defaultdict(list)
+
+    def record(self, stage, seconds):
+        self._samples[stage].append(seconds)
+
+    def summary(self):
+        """DataFrame con conteggio e statistiche in millisecondi per ogni stadio."""
+        rows = []
+        for stage, samples in self._samples.items():
+            values = np.asarray(samples) * 1000.0
+            rows.append({
+                'stage': stage,
+                'count': len(values),
+                'mean_ms': values.mean(),
+                'p50_ms': np.percentile(values, 50),
+                'p95_ms': np.percentile(values, 95),
+                'p99_ms': np.percentile(values, 99),
+                'max_ms': values.max(),
+            })
+        return pd.DataFrame(rows, columns=['stage', 'count', 'mean_ms', 'p50_ms', 'p95_ms', 'p99_ms', 'max_ms'])
+
+
+async def _ingest_task(consumer, control_queue, first_sample, steps):
+    """Inoltra in ordine i campioni Kafka al controllo, marcando l'istante di ricezione."""
+    received = 0
+    try:
+        if first_sample is not None and steps > 0:
+            await control_queue.put((first_sample, time.perf_counter()))
+            received += 1
+
+        while received < steps:
+            # Attesa bloccante fuori dall'event loop, a intervalli brevi per non trattenere il thread in caso di arresto
+            sample = await asyncio.to_thread(consumer.get_sample, 0.5)
+            if sample is None:
+                if not consumer.running and consumer.samples.empty():      # Consumer fermato e coda vuota
+                    print("\nFlusso Kafka terminato, simulazione interrotta.")
+                    break
+                continue
+            await control_queue.put((sample, time.perf_counter()))
+            received += 1
+    finally:
+        await control_queue.put(None)                                # Fine flusso
+
+
+async def _control_task(simulator, microgrid, rule_based_EMS, control_queue, report_queue, live_battery_display,
+                        sink, tariff, night_charge_enabled, metrics, start_step=1):
+    """Unico task che modifica la microgrid: un campione alla volta, nell'ordine di arrivo."""
+    step = start_step - 1
+    try:
+        while True:
+            item = await control_queue.get()
+            if item is None:
+                break
+
+            sample, received_at = item
+            started_at = time.perf_counter()
+            step += 1
+
+            row, report = control_step(simulator, microgrid, rule_based_EMS, sample, step,
+                                       tariff, night_charge_enabled)
+
+            decided_at = time.perf_counter()
+            metrics.record('handoff', started_at - received_at)
+            metrics.record('control', decided_at - started_at)
+            metrics.record('decision', decided_at - received_at)
+
+            if live_battery_display is not None:
+                live_battery_display.push(row["battery_soc_pct"], row["timestamp"])
+                metrics.record('ui_push', time.perf_counter() - decided_at)
+
+            if sink is not None:                                     # Stato del checkpoint coerente con lo step appena eseguito
+                sink_start = time.perf_counter()
+                sink.append(row, microgrid, sample)
+                metrics.record('sink', time.perf_counter() - sink_start)
+
+            try:
+                report_queue.put_nowait((row, report, decided_at))
+            except asyncio.QueueFull:                                # Report in ritardo: backpressure esplicita
+                await report_queue.put((row, report, decided_at))
+                metrics.record('control_wait', time.perf_counter() - decided_at)
+    finally:
+        await report_queue.put(None)
+
+
+async def _report_task(report_queue, results, metrics, verbose=True):
+    """Stampa i report (in un thread) e raccoglie le righe dei risultati (se results non e' None)."""
+    while True:
+        item = await report_queue.get()
+        if item is None:
+            break
+
+        row, report, decided_at = item
+        if verbose:
+            started_at = time.perf_counter()
+            await asyncio.to_thread(print_step_report, *report)     # La stampa non blocca l'event loop
+            metrics.record('report', time.perf_counter() - started_at)
+
+        if results is not None:
+            results.append(row)
+        metrics.record('report_lag', time.perf_counter() - decided_at)
+
+
+async def run_realtime(consumer, simulator, microgrid, steps, tariff, night_charge_enabled=False,
+                       first_sample=None, live_battery_display=None, sink=None, queue_size=256, verbose=True):
+    """
+    Esegue l'EMS real-time con gli stadi come task asyncio.
+
+    Restituisce (results, metrics): la lista delle righe dei risultati (None se i risultati vanno al sink)
+    e le LatencyMetrics.
+    """
+    metrics = LatencyMetrics()
+    results = [] if sink is None else None
+    start_step = 1 if sink is None else sink.steps + 1
+    steps = steps - start_step + 1                      # Step ancora da eseguire (in ripresa parte dal checkpoint)
+
+    control_queue = asyncio.Queue(maxsize=queue_size)   # Ingestione -> controllo (backpressure sul consumer)
+    report_queue = asyncio.Queue(maxsize=queue_size)    # Controllo -> report
+
+    rule_based_EMS = Rule_Based_EMS(microgrid)
+
+    tasks = [
+        asyncio.create_task(_ingest_task(consumer, control_queue, first_sample, steps)),
+        asyncio.create_task(_control_task(simulator, microgrid, rule_based_EMS, control_queue, report_queue,
+                                          live_battery_display, sink, tariff, night_charge_enabled, metrics,
+                                          start_step=start_step)),
+        asyncio.create_task(_report_task(report_queue, results, metrics, verbose=verbose)),
+    ]
+
+    try:
+        await asyncio.gather(*tasks)
+    finally:
+        for task in tasks:
+            task.cancel()
+
+    return results, metrics
+
+
+def main():
+
+    config = load_config()              # Carica configurazione EMS da params.yml
+    timezone_str = config['timezone']
+    tariff = config['tariff']           # Tariffa a fasce precompilata da price_bands
+
+    sink = open_results_sink(config)    # Risultati su disco a chunk, con checkpoint per la ripresa
+
+    print("\nInizializzazione Kafka Consumer...")
+    consumer = KafkaConsumer(
+        buffer_size=config['buffer_size'],
+        topic=config['kafka_topic'],
+        timezone=timezone_str,
+    )
+    consumer.start_background(start_offsets=sink.next_offsets())
+
+    print("Attesa primi dati...")
+    first_sample = consumer.get_sample()
+    if first_sample is None:
+        raise RuntimeError("Consumer Kafka fermato prima di ricevere il primo campione.")
+
+    print("Inizializzazione microgrid...")
+    simulator = MicrogridSimulator(config_path='params.yml', online=True)
+    microgrid = simulator.build_microgrid()
+    microgrid.reset()
+    if sink.checkpoint:
+        microgrid.restore(sink.checkpoint['microgrid'])
+        print(f"Ripresa da step {sink.steps}, offset Kafka {sink.next_offsets()}")
+
+    battery_module = microgrid.battery[0]
+    initial_soc = (
+        battery_module.current_charge / simulator.nominal_capacity * 100.0
+        if simulator.nominal_capacity > 0
+        else 0.0
+    )
+    _, initial_band = tariff.lookup(first_sample.timestamp)
+    print(f"Stato iniziale: SOC {initial_soc:6.2f}% | fascia {initial_band.upper()}")
+
+    live_battery_display = LiveBatteryDisplay(
+        timezone=timezone_str,
+        max_fps=config['display_max_fps'],
+        headless=not config['live_display'],
+    )
+    live_battery_display.start(initial_soc, first_sample.timestamp)
+
+    try:
+        results, metrics = asyncio.run(run_realtime(
+            consumer, simulator, microgrid,
+            steps=config['steps'],
+            tariff=tariff,
+            night_charge_enabled=config.get('allow_night_grid_charge', False),
+            first_sample=first_sample,
+            live_battery_display=live_battery_display,
+            sink=sink,
+        ))
+    finally:
+        sink.close(microgrid)
+        consumer.stop()
+        print("\nConsumer fermato.")
+        live_battery_display.close()
+
+    if consumer.dropped_messages or consumer.invalid_messages:
+        print(f"Messaggi scartati (coda piena): {consumer.dropped_messages} | non validi: {consumer.invalid_messages}")
+
+    latency = metrics.summary()
+    output_dir = Path("outputs")
+    output_dir.mkdir(exist_ok=True)
+    latency_path = output_dir / f"ems_latency_{datetime.now().strftime('%Y%m%d_%H%M%S')}.csv"
+    latency.to_csv(latency_path, index=False)
+
+    print("\n" + "-" * 120)
+    print("LATENZE PER STADIO [ms]")
+    print("-" * 120)
+    print(latency.to_string(index=False, float_format=lambda value: f"{value:9.3f}"))
+    print(f"File latenze salvato       : {latency_path.name}")
+
+    results_df = sink.read_results()
+    if not results_df.empty:
+        save_results(results_df, timezone_str)
+
+
+if __name__ == "__main__":
+    main()
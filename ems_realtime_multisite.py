@@ -0,0 +1,308 @@
+"""
+Runtime EMS real-time multi-sito: molte microgrid su un unico consumer Kafka.
+
+Un solo KafkaConsumer sottoscrive tutti i topic dei siti (ems.multisite.kafka_topics in params.yml) e ogni
+campione viene instradato per generator_id alla microgrid del suo sito, creata al primo campione ricevuto.
+A ogni giro vengono eseguiti insieme tutti i siti con campioni in attesa (un campione per sito, nell'ordine di
+arrivo), con lo stesso control_step di ems_realtime_kafka.py.
+
+La memoria resta limitata qualunque sia la durata della run:
+    - al massimo max_sites microgrid, ognuna con al massimo pending_size campioni in attesa
+    - storico online dei moduli (online_max_history) e log delle microgrid limitati a log_history step
+      (Microgrid.trim_logs)
+    - per ogni sito solo le ultime keep_results righe dei risultati e i totali cumulati
+
+Uso:
+    python ems_realtime_multisite.py                    # Kafka (ODA), topic di params.yml
+    python ems_realtime_multisite.py --replay 200       # Replay locale di 200 siti (ReplayBroker, senza ODA)
+"""
+import argparse
+import time
+from collections import deque
+from datetime import datetime
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from generator_and_consumer.consumer_class import KafkaConsumer
+from microgrid_simulator import MicrogridSimulator
+from tools import load_config
+from ems_realtime_kafka import control_step
+from EMS import Rule_Based_EMS
+
+
+_TOTAL_COLUMNS = ('kafka_load_kwh', 'kafka_pv_kwh', 'grid_import_kwh', 'grid_export_kwh', 'battery_charge_kwh',
+                  'battery_discharge_kwh', 'curtailment_kwh', 'loss_load_kwh', 'cost_import_eur',
+                  'revenue_export_eur', 'economic_balance_eur')
+
+
+class Site:
+    """Stato di un sito: microgrid, EMS a regole, campioni in attesa, ultimi risultati e totali cumulati."""
+
+    def __init__(self, site_id, simulator, pending_size=96, keep_results=96):
+        self.site_id = site_id
+        self.microgrid = simulator.build_microgrid()
+        self.microgrid.reset()
+        self.rule_based_EMS = Rule_Based_EMS(self.microgrid)
+
+        self.pending = deque()                          # Campioni in attesa, al massimo pending_size
+        self.pending_size = pending_size
+        self.results = deque(maxlen=keep_results)       # Ultime righe dei risultati
+        self.totals = dict.fromkeys(_TOTAL_COLUMNS, 0.0)
+        self.steps = 0
+        self.dropped = 0                                # Campioni scartati per troppi campioni in attesa
+
+    def push(self, sample):
+        """Accoda un campione; se la coda del sito e' piena scarta il piu' vecchio."""
+        if len(self.pending) >= self.pending_size:
+            self.pending.popleft()
+            self.dropped += 1
+        self.pending.append(sample)
+
+    def summary(self):
+        """Riga di riepilogo del sito."""
+        last = self.results[-1] if self.results else {}
+        return {
+            'site_id': self.site_id,
+            'steps': self.steps,
+            'dropped': self.dropped,
+            'last_timestamp': last.get('timestamp'),
+            'battery_soc_pct': last.get('battery_soc_pct'),
+            **self.totals,
+        }
+
+
+class MultiSiteEMS:
+    """
+    EMS a regole per molti siti, con una microgrid online per generator_id.
+
+    sites:        generator_id ammessi (None = qualsiasi, fino a max_sites); gli altri campioni vengono ignorati
+    log_history:  step di log e storico online trattenuti da ogni microgrid
+    """
+
+    def __init__(self, simulator, tariff, night_charge_enabled=False, sites=None, max_sites=500,
+                 pending_size=96, log_history=96, keep_results=96):
+        if log_history < 1:
+            raise ValueError(f"log_history deve essere positivo, ricevuto {log_history}")
+
+        if simulator.online_max_history is None:        # Storico online limitato come i log
+            simulator.online_max_history = log_history
+
+        self.simulator = simulator
+        self.tariff = tariff
+        self.night_charge_enabled = night_charge_enabled
+        self.allowed_sites = None if sites is None else set(sites)
+        self.max_sites = max_sites
+        self.pending_size = pending_size
+        self.log_history = log_history
+        self.keep_results = keep_results
+
+        self.sites = {}
+        self.unrouted_messages = 0      # Campioni senza generator_id
+        self.ignored_messages = 0       # Campioni di siti non ammessi o oltre max_sites
+        self.rounds = 0
+        self.total_steps = 0
+        self.round_seconds = deque(maxlen=1000)     # Durata degli ultimi giri
+
+    def route(self, sample):
+        """Instrada un campione al suo sito (creandolo al primo campione); False se il campione viene scartato."""
+        site_id = sample.generator_id
+        if site_id is None:
+            self.unrouted_messages += 1
+            return False
+
+        site = self.sites.get(site_id)
+        if site is None:
+            if self.allowed_sites is not None and site_id not in self.allowed_sites:
+                self.ignored_messages += 1
+                return False
+            if len(self.sites) >= self.max_sites:
+                self.ignored_messages += 1
+                return False
+
+            site = self.sites[site_id] = Site(site_id, self.simulator, self.pending_size, self.keep_results)
+
+        site.push(sample)
+        return True
+
+    def is_full(self, sample):
+        """True se la coda del sito del campione e' piena (accodarlo scarterebbe il campione piu' vecchio)."""
+        site = self.sites.get(sample.generator_id)
+        return site is not None and len(site.pending) >= site.pending_size
+
+    def ready_sites(self):
+        return [site for site in self.sites.values() if site.pending]
+
+    def step_ready(self):
+        """
+        Un giro di controllo: un campione per ogni sito con campioni in attesa.
+        Restituisce le righe dei risultati del giro, con la colonna site_id.
+        """
+        started_at = time.perf_counter()
+        rows = []
+
+        for site in self.ready_sites():
+            sample = site.pending.popleft()
+            site.steps += 1
+
+            row, _ = control_step(self.simulator, site.microgrid, site.rule_based_EMS, sample, site.steps,
+                                  self.tariff, self.night_charge_enabled)
+            row['site_id'] = site.site_id
+
+            for column in _TOTAL_COLUMNS:
+                site.totals[column] += row[column]
+            site.results.append(row)
+            rows.append(row)
+
+            if site.steps % self.log_history == 0:       # Log della microgrid al massimo 2 * log_history step
+                site.microgrid.trim_logs(self.log_history)
+
+        if rows:
+            self.rounds += 1
+            self.total_steps += len(rows)
+            self.round_seconds.append(time.perf_counter() - started_at)
+
+        return rows
+
+    def step_all(self):
+        """Giri di controllo finche' nessun sito ha campioni in attesa; restituisce il numero di step eseguiti."""
+        steps = 0
+        while True:
+            rows = self.step_ready()
+            if not rows:
+                return steps
+            steps += len(rows)
+
+    def summary(self):
+        """DataFrame con una riga di riepilogo per sito."""
+        return pd.DataFrame([site.summary() for site in self.sites.values()],
+                            columns=['site_id', 'steps', 'dropped', 'last_timestamp', 'battery_soc_pct',
+                                     *_TOTAL_COLUMNS])
+
+    def round_summary(self):
+        """Statistiche [ms] della durata degli ultimi giri di controllo."""
+        values = np.asarray(self.round_seconds) * 1000.0
+        if not len(values):
+            return {}
+        return {
+            'count': len(values),
+            'mean_ms': values.mean(),
+            'p50_ms': np.percentile(values, 50),
+            'p95_ms': np.percentile(values, 95),
+            'max_ms': values.max(),
+        }
+
+
+def run_multisite(consumer, ems, max_steps=None, drain_limit=1024, report_every=10.0, verbose=True):
+    """
+    Esegue l'EMS multi-sito sul flusso del consumer finche' il flusso termina o si raggiungono max_steps step
+    complessivi. A ogni iterazione si prelevano i campioni gia' arrivati (fino a drain_limit), li si instrada
+    ai siti e si eseguono i giri di controllo; i giri partono prima se la coda di un sito si riempie, cosi'
+    nessun campione viene scartato.
+
+    Restituisce la durata in secondi.
+    """
+    start = last_report = time.perf_counter()
+
+    while max_steps is None or ems.total_steps < max_steps:
+        sample = consumer.get_sample(0.5)
+        if sample is None:
+            if not consumer.running and consumer.samples.empty():      # Consumer fermato e coda vuota
+                break
+            continue
+
+        routed = 0
+        while sample is not None:
+            if ems.is_full(sample):                                     # Coda del sito piena: prima i giri di controllo
+                ems.step_all()
+            ems.route(sample)
+            routed += 1
+            sample = consumer.get_sample(0) if routed < drain_limit else None   # Gia' in coda, senza attesa
+
+        ems.step_all()
+
+        now = time.perf_counter()
+        if verbose and now - last_report >= report_every:
+            last_report = now
+            print(f" Siti attivi: {len(ems.sites):4d} | step eseguiti: {ems.total_steps:8d} "
+                  f"| step/s: {ems.total_steps / (now - start):8.1f}")
+
+    return time.perf_counter() - start
+
+
+def _replay_consumer(n_sites, config, rows=None, speedup=None):
+    """Consumer collegato a un replay locale con n_sites siti interleaved (senza ODA)."""
+    from generator_and_consumer.replay_broker import ReplayBroker, ReplayKafkaConsumer
+
+    broker = ReplayBroker.from_csv(rows=rows, sites=n_sites, speedup=speedup)
+    return ReplayKafkaConsumer(broker, buffer_size=config['buffer_size'], timezone=config['timezone'])
+
+
+def main():
+    parser = argparse.ArgumentParser(description="EMS real-time multi-sito su un unico consumer Kafka")
+    parser.add_argument('--replay', type=int, default=None, metavar='SITI',
+                        help="Replay locale con SITI siti invece di Kafka (ReplayBroker)")
+    parser.add_argument('--rows', type=int, default=None, help="Righe del CSV per sito nel replay (default tutte)")
+    parser.add_argument('--steps', type=int, default=None, help="Step complessivi da eseguire (default fino a fine flusso)")
+    args = parser.parse_args()
+
+    config = load_config()
+    multisite = config['multisite']
+
+    if args.replay:
+        consumer = _replay_consumer(args.replay, config, rows=args.rows)
+    else:
+        consumer = KafkaConsumer(
+            buffer_size=config['buffer_size'],
+            topic=multisite['kafka_topics'],
+            timezone=config['timezone'],
+        )
+
+    simulator = MicrogridSimulator(config_path='params.yml', online=True)
+    ems = MultiSiteEMS(
+        simulator,
+        config['tariff'],
+        night_charge_enabled=config.get('allow_night_grid_charge', False),
+        sites=multisite['sites'],
+        max_sites=multisite['max_sites'],
+        pending_size=multisite['pending_size'],
+        log_history=multisite['log_history'],
+        keep_results=multisite['keep_results'],
+    )
+
+    consumer.start_background()
+    try:
+        elapsed = run_multisite(consumer, ems, max_steps=args.steps)
+    except KeyboardInterrupt:
+        print("\nInterrotto dall'utente.")
+        elapsed = None
+    finally:
+        consumer.stop()
+        print("\nConsumer fermato.")
+
+    summary = ems.summary()
+    output_dir = Path("outputs")
+    output_dir.mkdir(exist_ok=True)
+    summary_path = output_dir / f"ems_multisite_{datetime.now().strftime('%Y%m%d_%H%M%S')}.csv"
+    summary.to_csv(summary_path, index=False)
+
+    print("\n" + "-" * 120)
+    print("RESOCONTO MULTI-SITO")
+    print("-" * 120)
+    print(f"Siti                       : {len(ems.sites)}")
+    print(f"Step eseguiti              : {ems.total_steps} in {ems.rounds} giri")
+    if elapsed:
+        print(f"Throughput [step/s]        : {ems.total_steps / elapsed:8.1f}")
+    print(f"Campioni scartati          : {int(summary['dropped'].sum())} (coda sito) | "
+          f"{ems.ignored_messages} (sito non ammesso) | {ems.unrouted_messages} (senza generator_id)")
+    round_stats = ems.round_summary()
+    if round_stats:
+        print(f"Durata giro [ms]           : media {round_stats['mean_ms']:.3f} | p95 {round_stats['p95_ms']:.3f} "
+              f"| max {round_stats['max_ms']:.3f}")
+    print(f"Bilancio economico   [EUR] : {summary['economic_balance_eur'].sum():8.4f}")
+    print(f"File riepilogo salvato     : {summary_path.name}")
+
+
+if __name__ == "__main__":
+    main()
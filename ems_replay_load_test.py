@@ -0,0 +1,131 @@
+"""
+Test di carico dell'EMS real-time con replay locale del flusso Kafka (senza ODA ne' broker).
+
+1. Costruisce il broker simulato (ReplayBroker) dal CSV del generatore o da un file JSONL di pacchetti
+2. Collega un ReplayKafkaConsumer (decodifica, coda e backpressure reali del KafkaConsumer)
+3. Esegue il runtime asyncio dell'EMS (run_realtime) sulla microgrid di params.yml, senza report a video
+4. Stampa throughput, latenze per stadio e ritardo di consegna del broker e salva le latenze su CSV
+
+Uso:
+    python ems_replay_load_test.py [--rows 5000] [--speedup max|N] [--interval 900] [--packets file.jsonl]
+
+Con --speedup max tutti i messaggi sono disponibili subito (throughput massimo dell'EMS); con --speedup N
+i messaggi arrivano ogni interval/N secondi (es. --speedup 900 = un campione quartorario al secondo).
+"""
+import argparse
+import asyncio
+import time
+from datetime import datetime
+from pathlib import Path
+
+import pandas as pd
+
+from generator_and_consumer.replay_broker import ReplayBroker, ReplayKafkaConsumer
+from microgrid_simulator import MicrogridSimulator
+from tools import load_config
+from ems_realtime_async import run_realtime
+
+
+def _parse_speedup(value):
+    return None if value in ('max', 'inf', '0') else float(value)
+
+
+def run_load_test(broker, steps=None, config=None, queue_size=1024, on_full='block', batch_size=500):
+    """
+    Esegue l'EMS sul flusso del broker simulato.
+
+    Restituisce (results, metrics, elapsed): righe dei risultati, LatencyMetrics e durata in secondi
+    dalla connessione del consumer all'ultimo step.
+    """
+    config = config or load_config()
+    steps = len(broker) if steps is None else min(steps, len(broker))
+
+    simulator = MicrogridSimulator(config_path='params.yml', online=True)
+    microgrid = simulator.build_microgrid()
+    microgrid.reset()
+
+    consumer = ReplayKafkaConsumer(
+        broker,
+        buffer_size=config['buffer_size'],
+        timezone=config['timezone'],
+        queue_size=queue_size,
+        on_full=on_full,
+        batch_size=batch_size,
+    )
+
+    start = time.perf_counter()
+    consumer.start_background()
+    try:
+        first_sample = consumer.get_sample()
+        if first_sample is None:
+            raise RuntimeError("Nessun campione dal broker simulato.")
+
+        results, metrics = asyncio.run(run_realtime(
+            consumer, simulator, microgrid,
+            steps=steps,
+            tariff=config['tariff'],
+            night_charge_enabled=config.get('allow_night_grid_charge', False),
+            first_sample=first_sample,
+            verbose=False,
+        ))
+        elapsed = time.perf_counter() - start
+    finally:
+        consumer.stop()
+
+    if consumer.dropped_messages or consumer.invalid_messages:
+        print(f"Messaggi scartati (coda piena): {consumer.dropped_messages} | non validi: {consumer.invalid_messages}")
+
+    return results, metrics, elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Test di carico dell'EMS real-time con replay locale di Kafka")
+    parser.add_argument('--rows', type=int, default=None, help="Righe del CSV del generatore (default tutte)")
+    parser.add_argument('--packets', default=None, help="File JSONL di pacchetti (generator_and_consumer.replay_broker)")
+    parser.add_argument('--steps', type=int, default=None, help="Step da eseguire (default tutti i messaggi)")
+    parser.add_argument('--speedup', type=_parse_speedup, default=None,
+                        help="Accelerazione rispetto al tempo reale, 'max' = il piu' velocemente possibile (default)")
+    parser.add_argument('--interval', type=float, default=900.0, help="Secondi reali tra due campioni (default 900)")
+    parser.add_argument('--queue-size', type=int, default=1024, help="Dimensione della coda campioni del consumer")
+    parser.add_argument('--on-full', choices=('block', 'drop_oldest'), default='block', help="Politica a coda piena")
+    parser.add_argument('--batch-size', type=int, default=500, help="Messaggi per blocco del consumer")
+    args = parser.parse_args()
+
+    broker_kwargs = {'interval_sec': args.interval, 'speedup': args.speedup}
+    if args.packets:
+        broker = ReplayBroker.from_file(args.packets, **broker_kwargs)
+    else:
+        broker = ReplayBroker.from_csv(rows=args.rows, **broker_kwargs)
+
+    results, metrics, elapsed = run_load_test(
+        broker,
+        steps=args.steps,
+        queue_size=args.queue_size,
+        on_full=args.on_full,
+        batch_size=args.batch_size,
+    )
+
+    latency = metrics.summary()
+    delivery = broker.delivery_lag_summary()
+    if delivery:
+        latency = pd.concat([latency, pd.DataFrame([{'stage': 'broker_delivery', **delivery}])], ignore_index=True)
+
+    output_dir = Path("outputs")
+    output_dir.mkdir(exist_ok=True)
+    latency_path = output_dir / f"ems_replay_latency_{datetime.now().strftime('%Y%m%d_%H%M%S')}.csv"
+    latency.to_csv(latency_path, index=False)
+
+    print("\n" + "-" * 120)
+    print("TEST DI CARICO EMS (REPLAY LOCALE)")
+    print("-" * 120)
+    print(f"Step eseguiti              : {len(results)}")
+    print(f"Velocita' replay           : {'massima' if args.speedup is None else f'x{args.speedup:g}'}")
+    print(f"Tempo totale [s]           : {elapsed:8.3f}")
+    print(f"Throughput [step/s]        : {len(results) / elapsed:8.1f}")
+    print("\nLatenze per stadio [ms]:")
+    print(latency.to_string(index=False, float_format=lambda value: f"{value:9.3f}"))
+    print(f"File latenze salvato       : {latency_path.name}")
+
+
+if __name__ == "__main__":
+    main()
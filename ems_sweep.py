@@ -0,0 +1,263 @@
+"""
+Sweep parallelo di scenari offline su varianti di params.yml.
+
+Ogni scenario e' una combinazione degli override definiti nella sezione `sweep.grid` di params.yml
+(chiavi puntate, es. `battery.capacity` o `ems.price_bands.peak.buy`). Per ogni scenario viene costruita
+la microgrid con MicrogridSimulator e simulato l'EMS a regole come in ems_offline.py.
+
+Le serie temporali del dataset vengono lette una sola volta e condivise con i worker tramite
+multiprocessing.shared_memory, invece di essere serializzate per ogni processo.
+
+Output (in `sweep.output_dir/sweep_<timestamp>/`):
+    results.csv               tabella aggregata con una riga per scenario
+    run_<k>/params.yml        configurazione effettiva dello scenario
+    run_<k>/microgrid_log.csv log completo della simulazione
+"""
+import argparse
+import copy
+import itertools
+import multiprocessing as mp
+import time
+import traceback
+from datetime import datetime
+from multiprocessing import shared_memory
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+import yaml
+
+from fast_offline import simulate_rule_based
+from microgrid_simulator import MicrogridSimulator
+from src.pymgrid.modules.battery.transition_models import BatteryTransitionModel
+from tariff import Tariff
+from EMS import Rule_Based_EMS
+
+
+# Serie temporali condivise, popolate in ogni worker da _attach_shared_data
+_SHARED = {}
+
+
+def load_sweep_config(path='params.yml'):
+    """Legge params.yml e la sezione `sweep` con la griglia di override."""
+    with open(path, 'r') as cfg_file:
+        full_config = yaml.safe_load(cfg_file)
+
+    sweep_cfg = full_config.get('sweep')
+    if not sweep_cfg or not sweep_cfg.get('grid'):
+        raise KeyError("Sezione 'sweep.grid' mancante in params.yml")
+
+    for key, values in sweep_cfg['grid'].items():
+        if not isinstance(values, list) or len(values) == 0:
+            raise ValueError(f"L'override '{key}' deve essere una lista non vuota di valori.")
+
+    return full_config, sweep_cfg
+
+
+def expand_grid(grid):
+    """Prodotto cartesiano della griglia: lista di dizionari {chiave puntata: valore}."""
+    keys = list(grid)
+    return [dict(zip(keys, values)) for values in itertools.product(*(grid[key] for key in keys))]
+
+
+def apply_overrides(config, overrides):
+    """Copia di `config` con gli override (chiavi puntate) applicati; le chiavi devono esistere gia'."""
+    config = copy.deepcopy(config)
+    config.pop('sweep', None)
+
+    for dotted_key, value in overrides.items():
+        *parents, leaf = dotted_key.split('.')
+        node = config
+        for part in parents:
+            if not isinstance(node.get(part), dict):
+                raise KeyError(f"Override '{dotted_key}': sezione '{part}' non trovata in params.yml")
+            node = node[part]
+        if leaf not in node:
+            raise KeyError(f"Override '{dotted_key}': chiave '{leaf}' non trovata in params.yml")
+        node[leaf] = copy.deepcopy(value)
+
+    return config
+
+
+def _share_array(array):
+    """Copia `array` in un blocco di shared memory; restituisce il blocco e la descrizione per i worker."""
+    shm = shared_memory.SharedMemory(create=True, size=max(array.nbytes, 1))
+    np.ndarray(array.shape, dtype=array.dtype, buffer=shm.buf)[...] = array
+    return shm, (shm.name, array.shape, array.dtype.str)
+
+
+def _attach_shared_data(specs):
+    """Initializer dei worker: si collega ai blocchi di shared memory senza copiarli."""
+    for key, (name, shape, dtype) in specs.items():
+        shm = shared_memory.SharedMemory(name=name)
+        _SHARED[key] = (shm, np.ndarray(shape, dtype=np.dtype(dtype), buffer=shm.buf))
+
+
+def _shared(key):
+    return _SHARED[key][1]
+
+
+def _summarize(microgrid_log, soh_end, overrides, run_id, elapsed):
+    """Riga della tabella aggregata a partire dal log completo della microgrid."""
+    grid_import = microgrid_log[('grid', 0, 'grid_import')]
+    grid_export = microgrid_log[('grid', 0, 'grid_export')]
+    import_cost = float((grid_import * microgrid_log[('grid', 0, 'import_price_current')]).sum())
+    export_revenue = float((grid_export * microgrid_log[('grid', 0, 'export_price_current')]).sum())
+
+    row = {'run_id': run_id}
+    row.update(overrides)
+    row.update({
+        'steps': len(microgrid_log),
+        'import_cost': import_cost,
+        'export_revenue': export_revenue,
+        'net_cost': import_cost - export_revenue,
+        'grid_import_kwh': float(grid_import.sum()),
+        'grid_export_kwh': float(grid_export.sum()),
+        'loss_load_kwh': float(microgrid_log[('balancing', 0, 'loss_load')].sum()),
+        'overgeneration_kwh': float(microgrid_log[('balancing', 0, 'overgeneration')].sum()),
+        'total_reward': float(microgrid_log[('balance', 0, 'reward')].sum()),
+        'soh_end': soh_end,
+        'elapsed_s': elapsed,
+        'error': '',
+    })
+    return row
+
+
+def run_scenario(task):
+    """Esegue uno scenario nel worker e salva configurazione e log nella sua cartella."""
+    run_id, overrides, base_config, run_dir = task
+    run_dir = Path(run_dir)
+    run_dir.mkdir(parents=True, exist_ok=True)
+    start = time.perf_counter()
+
+    try:
+        config = apply_overrides(base_config, overrides)
+        config_path = run_dir / 'params.yml'
+        with open(config_path, 'w') as cfg_file:
+            yaml.safe_dump(config, cfg_file, sort_keys=False)
+
+        ems_cfg = config['ems']
+        data = _shared('data')
+        timestamps = pd.Series(pd.to_datetime(_shared('timestamps'), utc=True))
+
+        tariff = Tariff(ems_cfg['price_bands'], ems_cfg['timezone'], holidays=ems_cfg.get('holidays'))
+        price_buy, price_sell = tariff.prices(timestamps)
+        grid_time_series = np.stack([price_buy, price_sell, np.zeros(len(price_buy))], axis=1)
+
+        allow_night_grid_charge = bool(ems_cfg.get('allow_night_grid_charge', False))
+        bands = tariff.bands(timestamps)
+        steps = min(int(ems_cfg['steps']), len(data))
+
+        simulator = MicrogridSimulator(
+            config_path=str(config_path),
+            online=False,
+            load_time_series=pd.Series(data[:, 0]),
+            pv_time_series=pd.Series(data[:, 1]),
+            grid_time_series=grid_time_series
+        )
+
+        microgrid = simulator.build_microgrid()
+        microgrid.reset()
+        transition_model = microgrid.modules['battery'][0].battery_transition_model
+
+        if ems_cfg.get('fast_offline', False) and type(transition_model) is BatteryTransitionModel:
+            # Kernel veloce: solo per il modello batteria di default, che non ha stato di salute
+            microgrid_log = simulate_rule_based(microgrid, steps=steps, bands=bands,
+                                                allow_night_grid_charge=allow_night_grid_charge)
+        else:
+            rule_based_EMS = Rule_Based_EMS(microgrid)
+            load_module = microgrid.modules['load'][0]
+            pv_module = microgrid.modules['pv'][0]
+
+            for step in range(steps):
+                e_batt, e_grid = rule_based_EMS.control(
+                    load_kwh=load_module.current_load,
+                    pv_kwh=pv_module.current_renewable,
+                    band=bands[microgrid.current_step],
+                    allow_night_grid_charge=allow_night_grid_charge
+                )
+                microgrid.step({"battery": e_batt, "grid": e_grid}, normalized=False)
+
+            microgrid_log = microgrid.log
+
+        _, log = simulator.split_simulation_log(microgrid_log)
+        log.to_csv(run_dir / 'microgrid_log.csv', index=True)
+
+        soh_end = float(getattr(transition_model, 'soh', np.nan))
+        return _summarize(microgrid_log, soh_end, overrides, run_id, time.perf_counter() - start)
+
+    except Exception as exc:
+        # Uno scenario fallito non interrompe lo sweep: l'errore finisce nella tabella e in run_<k>/error.txt
+        (run_dir / 'error.txt').write_text(traceback.format_exc())
+        row = {'run_id': run_id}
+        row.update(overrides)
+        row.update({'elapsed_s': time.perf_counter() - start, 'error': repr(exc)})
+        return row
+
+
+def run_sweep(config_path='params.yml', processes=None, output_dir=None):
+    """
+    Esegue tutti gli scenari della griglia su un pool di processi.
+
+    Restituisce la tabella aggregata (una riga per scenario, ordinata per run_id), salvata anche in results.csv.
+    """
+    base_config, sweep_cfg = load_sweep_config(config_path)
+    scenarios = expand_grid(sweep_cfg['grid'])
+
+    processes = processes or sweep_cfg.get('processes') or mp.cpu_count()
+    output_dir = Path(output_dir or sweep_cfg.get('output_dir', 'outputs/sweep'))
+    sweep_dir = output_dir / f"sweep_{datetime.now().strftime('%Y%m%d_%H%M%S')}"
+    sweep_dir.mkdir(parents=True, exist_ok=True)
+
+    ##########  TIME SERIES DATASET (letto una volta, condiviso con i worker)   ###############
+
+    time_series = pd.read_csv(sweep_cfg.get('data_path', './data/processed_data_661_formatted.csv'))
+    time_series = time_series[["datetime", "solar", "load"]].interpolate()   # interpolate() for removing NaNs
+    time_series["datetime"] = pd.to_datetime(time_series["datetime"], utc=True, errors="coerce")
+
+    data = np.ascontiguousarray(
+        np.stack([time_series['load'].to_numpy(dtype=float), time_series['solar'].clip(lower=0).to_numpy(dtype=float)],
+                 axis=1)
+    )
+    timestamps = time_series['datetime'].to_numpy(dtype='datetime64[ns]')
+
+    shared_blocks = []
+    try:
+        specs = {}
+        for key, array in (('data', data), ('timestamps', timestamps)):
+            shm, specs[key] = _share_array(array)
+            shared_blocks.append(shm)
+
+        tasks = [
+            (run_id, overrides, base_config, str(sweep_dir / f"run_{run_id:03d}"))
+            for run_id, overrides in enumerate(scenarios)
+        ]
+
+        print(f"Sweep: {len(tasks)} scenari su {processes} processi -> {sweep_dir}")
+
+        rows = []
+        with mp.Pool(processes=processes, initializer=_attach_shared_data, initargs=(specs,)) as pool:
+            for row in pool.imap_unordered(run_scenario, tasks):
+                status = 'ERRORE ' + row['error'] if row['error'] else f"net_cost={row['net_cost']:.2f}"
+                print(f"  run_{row['run_id']:03d} completato in {row['elapsed_s']:.1f}s ({status})")
+                rows.append(row)
+
+    finally:
+        for shm in shared_blocks:
+            shm.close()
+            shm.unlink()
+
+    results = pd.DataFrame(rows).sort_values('run_id').reset_index(drop=True)
+    results.to_csv(sweep_dir / 'results.csv', index=False)
+    return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Sweep parallelo di scenari offline su varianti di params.yml")
+    parser.add_argument('--config', default='params.yml', help="File di configurazione con la sezione sweep")
+    parser.add_argument('--processes', type=int, default=None, help="Numero di processi del pool")
+    parser.add_argument('--output-dir', default=None, help="Cartella di output (default sweep.output_dir)")
+    args = parser.parse_args()
+
+    results = run_sweep(config_path=args.config, processes=args.processes, output_dir=args.output_dir)
+    print(results.to_string(index=False))
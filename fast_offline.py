@@ -0,0 +1,289 @@
+"""
+Kernel "fast offline" per simulare l'EMS a regole (Rule_Based_EMS) su tutta la traiettoria.
+
+Riproduce in un unico ciclo stretto la ricorsione di stato di `Microgrid.step` per la topologia costruita da
+`MicrogridSimulator.build_microgrid` (batteria + load + pv + rete + modulo di bilanciamento), senza passare
+per i moduli, i logger e i dizionari di controllo ad ogni step. Il risultato ha le stesse colonne di `microgrid.log`.
+
+Il kernel usa solo array NumPy e scalari: se `numba` e' installato viene compilato con `njit`,
+altrimenti viene eseguito come funzione Python.
+"""
+import numpy as np
+import pandas as pd
+
+from src.pymgrid.modules.battery.transition_models import BatteryTransitionModel
+
+try:
+    from numba import njit
+except ImportError:
+    njit = None
+
+
+# Colonne del log nell'ordine di `Microgrid.get_log` (ordinate per modulo, poi il bilancio).
+LOG_COLUMNS = (
+    ('balancing', 0, 'loss_load'),
+    ('balancing', 0, 'loss_load_energy'),
+    ('balancing', 0, 'overgeneration'),
+    ('balancing', 0, 'overgeneration_energy'),
+    ('balancing', 0, 'reward'),
+    ('battery', 0, 'charge_amount'),
+    ('battery', 0, 'current_charge'),
+    ('battery', 0, 'discharge_amount'),
+    ('battery', 0, 'reward'),
+    ('battery', 0, 'soc'),
+    ('grid', 0, 'co2_per_kwh_current'),
+    ('grid', 0, 'co2_production'),
+    ('grid', 0, 'export_price_current'),
+    ('grid', 0, 'grid_export'),
+    ('grid', 0, 'grid_import'),
+    ('grid', 0, 'grid_status_current'),
+    ('grid', 0, 'import_price_current'),
+    ('grid', 0, 'reward'),
+    ('load', 0, 'load_current'),
+    ('load', 0, 'load_met'),
+    ('load', 0, 'reward'),
+    ('pv', 0, 'curtailment'),
+    ('pv', 0, 'renewable_current'),
+    ('pv', 0, 'renewable_used'),
+    ('pv', 0, 'reward'),
+    ('balance', 0, 'reward'),
+    ('balance', 0, 'shaped_reward'),
+    ('balance', 0, 'overall_provided_to_microgrid'),
+    ('balance', 0, 'overall_absorbed_from_microgrid'),
+    ('balance', 0, 'flex_provided_to_microgrid'),
+    ('balance', 0, 'flex_absorbed_from_microgrid'),
+    ('balance', 0, 'controllable_provided_to_microgrid'),
+    ('balance', 0, 'controllable_absorbed_from_microgrid'),
+    ('balance', 0, 'fixed_provided_to_microgrid'),
+    ('balance', 0, 'fixed_absorbed_from_microgrid'),
+)
+
+
+def _rule_based_kernel(load, pv, grid_ts, night_mode, out,
+                       init_charge, min_capacity, max_capacity, max_charge, max_discharge,
+                       efficiency, battery_cost_cycle, battery_min_act, battery_max_act,
+                       max_import, max_export, cost_per_unit_co2,
+                       pv_min_act, pv_max_act, loss_load_cost, overgeneration_cost):
+    """Ricorsione di stato step per step; scrive una riga di `out` (ordine di LOG_COLUMNS) per step."""
+    tolerance = 1e-6
+    charge = init_charge
+
+    for t in range(out.shape[0]):
+        load_kwh = load[t]
+        pv_kwh = pv[t]
+        import_price = grid_ts[t, 0]
+        export_price = grid_ts[t, 1]
+        co2_per_kwh = grid_ts[t, 2]
+        grid_status = grid_ts[t, 3]
+
+        # Limiti batteria (BatteryTransitionModel: scarica * efficienza, carica / efficienza).
+        max_production = min(max_discharge, charge - min_capacity) * efficiency
+        max_consumption = min(max_charge, max_capacity - charge) / efficiency
+
+        # ---- Rule_Based_EMS.control ----
+        e_grid = 0.0
+        e_batt = 0.0
+        ems_max_discharge = max(0.0, min(max_production, max_discharge))
+        ems_max_charge = max(0.0, min(max_consumption, max_charge))
+        night = night_mode[t]
+
+        if load_kwh > pv_kwh + tolerance:
+            deficit = load_kwh - pv_kwh
+            if night:
+                e_batt = 0.0
+                e_grid = deficit
+            else:
+                discharge = min(deficit, ems_max_discharge)
+                e_batt = discharge
+                e_grid = max(deficit - discharge, 0.0)
+        elif pv_kwh > load_kwh + tolerance:
+            surplus = pv_kwh - load_kwh
+            charge_amt = min(surplus, ems_max_charge)
+            e_batt = -charge_amt
+            e_grid = -max(surplus - charge_amt, 0.0)
+
+        if night:
+            available_headroom = max(0.0, max_capacity - charge)
+            already_planned_charge = max(0.0, -e_batt)
+            available_headroom = max(0.0, available_headroom - already_planned_charge)
+            extra_charge = min(ems_max_charge, available_headroom)
+            if extra_charge > tolerance:
+                e_batt -= extra_charge
+                e_grid += extra_charge
+
+        # ---- Microgrid.step: modulo fisso (load) ----
+        fixed_absorbed = load_kwh
+
+        # ---- batteria ----
+        action = min(max(e_batt, battery_min_act), battery_max_act)
+        batt_provided = 0.0
+        batt_absorbed = 0.0
+        if action < 0:
+            batt_absorbed = max_consumption if -action > max_consumption else -action
+            internal = batt_absorbed * efficiency
+        else:
+            batt_provided = max_production if action > max_production else action
+            internal = -batt_provided / efficiency
+
+        soc_pre = charge / max_capacity
+        charge_pre = charge
+        charge = charge + internal
+        if charge < min_capacity:
+            charge = min_capacity
+        batt_reward = -1.0 * (abs(internal) * battery_cost_cycle + 0.0)
+
+        # ---- rete ----
+        action = min(max(e_grid, -max_export), max_import)
+        grid_import = 0.0
+        grid_export = 0.0
+        co2_production = 0.0
+        if action < 0:
+            grid_max_consumption = max_export * grid_status
+            grid_export = grid_max_consumption if -action > grid_max_consumption else -action
+            grid_reward = export_price * grid_export + -1.0 * cost_per_unit_co2 * 0.0
+        else:
+            grid_max_production = max_import * grid_status
+            grid_import = grid_max_production if action > grid_max_production else action
+            co2_production = grid_import * co2_per_kwh
+            grid_reward = -1 * import_price * grid_import + -1.0 * cost_per_unit_co2 * co2_production
+
+        controllable_provided = batt_provided + grid_import
+        controllable_absorbed = fixed_absorbed + batt_absorbed + grid_export
+        difference = controllable_provided - controllable_absorbed
+
+        # ---- moduli flex: pv poi bilanciamento ----
+        loss_load = 0.0
+        overgeneration = 0.0
+        if difference > 0:
+            pv_used = min(max(0.0, pv_min_act), pv_max_act)
+            overgeneration = difference
+            balancing_reward = -1.0 * (overgeneration_cost * overgeneration)
+        else:
+            energy_needed = -difference
+            pv_used = pv_kwh if pv_kwh < energy_needed else energy_needed
+            pv_used = min(max(pv_used, pv_min_act), pv_max_act)
+            energy_needed -= pv_used
+            loss_load = energy_needed
+            balancing_reward = -1.0 * (loss_load_cost * loss_load)
+
+        provided = controllable_provided + pv_used + loss_load
+        absorbed = controllable_absorbed + overgeneration
+        reward = 0.0 + 0.0 + batt_reward + grid_reward + 0.0 + balancing_reward
+
+        # Ripartizione del carico servito (Microgrid._reconcile_load_met).
+        load_met = load_kwh
+        if load_kwh > 0.0:
+            served_total = max(load_kwh - loss_load, 0.0)
+            ratio = max(0.0, min(1.0, served_total / load_kwh))
+            load_met = load_kwh * ratio
+
+        row = out[t]
+        row[0] = loss_load
+        row[1] = loss_load
+        row[2] = overgeneration
+        row[3] = overgeneration
+        row[4] = balancing_reward
+        row[5] = batt_absorbed
+        row[6] = charge_pre
+        row[7] = batt_provided
+        row[8] = batt_reward
+        row[9] = soc_pre
+        row[10] = co2_per_kwh
+        row[11] = co2_production
+        row[12] = export_price
+        row[13] = grid_export
+        row[14] = grid_import
+        row[15] = grid_status
+        row[16] = import_price
+        row[17] = grid_reward
+        row[18] = -load_kwh
+        row[19] = load_met
+        row[20] = 0.0
+        row[21] = pv_kwh - pv_used
+        row[22] = pv_kwh
+        row[23] = pv_used
+        row[24] = 0.0
+        row[25] = reward
+        row[26] = reward
+        row[27] = provided
+        row[28] = absorbed
+        row[29] = provided - controllable_provided
+        row[30] = absorbed - controllable_absorbed
+        row[31] = controllable_provided
+        row[32] = controllable_absorbed - fixed_absorbed
+        row[33] = 0.0
+        row[34] = fixed_absorbed
+
+    return charge
+
+
+if njit is not None:
+    _rule_based_kernel = njit(cache=True)(_rule_based_kernel)
+
+
+def simulate_rule_based(microgrid, steps=None, bands=None, allow_night_grid_charge=False):
+    """
+    Esegue Rule_Based_EMS + microgrid.step(normalized=False) per `steps` step con il kernel veloce.
+
+    Parameters
+    ----------
+    microgrid : Microgrid
+        Microgrid costruita da `MicrogridSimulator.build_microgrid` (moduli 'battery', 'load', 'pv', 'grid' e il
+        modulo di bilanciamento), nello stato da cui partire. Non viene modificata.
+    steps : int or None
+        Numero di step da simulare. Se None, fino alla fine delle serie temporali.
+    bands : array-like of str or None
+        Fascia tariffaria di ogni step (es. 'OFFPEAK'), usata solo con `allow_night_grid_charge`.
+    allow_night_grid_charge : bool
+        Come in `Rule_Based_EMS.control`.
+
+    Returns
+    -------
+    pd.DataFrame
+        Log con le stesse colonne e lo stesso indice di `microgrid.log` dopo la simulazione.
+    """
+    modules = microgrid.modules
+    if sorted(modules.names()) != ['balancing', 'battery', 'grid', 'load', 'pv'] or \
+            any(len(modules[name]) != 1 for name in modules.names()):
+        raise ValueError("Il kernel veloce supporta solo la topologia battery + load + pv + grid + balancing, "
+                         f"con un modulo per tipo; trovati {modules.names()}.")
+
+    battery = modules['battery'][0]
+    load_module = modules['load'][0]
+    pv_module = modules['pv'][0]
+    grid_module = modules['grid'][0]
+    balancing = modules['balancing'][0]
+
+    if type(battery.battery_transition_model) is not BatteryTransitionModel:
+        raise ValueError("Il kernel veloce supporta solo il BatteryTransitionModel di default, non "
+                         f"{battery.battery_transition_model.__class__.__name__}.")
+
+    start = microgrid.current_step
+    available = min(len(load_module), len(pv_module), len(grid_module)) - start
+    n_steps = available if steps is None else min(int(steps), available)
+
+    load = -1.0 * load_module.time_series[start:start + n_steps, 0]
+    pv = pv_module.time_series[start:start + n_steps, 0]
+    grid_ts = np.ascontiguousarray(grid_module.time_series[start:start + n_steps, :4], dtype=float)
+
+    if allow_night_grid_charge and bands is not None:
+        night_mode = np.array([str(band or '').upper() == 'OFFPEAK' for band in bands[:n_steps]], dtype=bool)
+    else:
+        night_mode = np.zeros(n_steps, dtype=bool)
+
+    out = np.empty((n_steps, len(LOG_COLUMNS)))
+
+    _rule_based_kernel(
+        np.ascontiguousarray(load, dtype=float), np.ascontiguousarray(pv, dtype=float), grid_ts, night_mode, out,
+        float(battery.current_charge), float(battery.min_capacity), float(battery.max_capacity),
+        float(battery.max_charge), float(battery.max_discharge), float(battery.efficiency),
+        float(battery.battery_cost_cycle),
+        float(battery.action_space.unnormalized.low[0]), float(battery.action_space.unnormalized.high[0]),
+        float(grid_module.max_import), float(grid_module.max_export), float(grid_module.cost_per_unit_co2),
+        float(pv_module.action_space.unnormalized.low[0]), float(pv_module.action_space.unnormalized.high[0]),
+        float(balancing.loss_load_cost), float(balancing.overgeneration_cost)
+    )
+
+    log = pd.DataFrame(out, columns=pd.MultiIndex.from_tuples(LOG_COLUMNS), index=pd.RangeIndex(start, start + n_steps))
+    log.columns.names = ['module_name', 'module_number', 'field']
+    return log
@@ -11,7 +11,7 @@ import numpy as np
 import pandas as pd
 
 from microgrid_simulator import MicrogridSimulator
-from tools import load_config, compute_offline_tariff_vectors
+from tools import load_config
 
 from pandasgui import show
 
@@ -19,7 +19,7 @@ from pandasgui import show
 
 config = load_config()              # Carica configurazione EMS da params.yml
 
-price_config = config['price_bands']               # Configurazione fasce prezzi
+tariff = config['tariff']                          # Tariffa a fasce precompilata (stessa del percorso online)
 simulation_steps = config['steps']                 # Numero di step di simulazione da eseguire
 
 timezone_str = config['timezone']   # Configura timezone per timestamp
@@ -38,11 +38,7 @@ load_time_series = time_series['load']
 
 timestamps = time_series['datetime']
 
-price_buy_time_series, price_sell_time_series = compute_offline_tariff_vectors(
-    ts_series=timestamps,
-    local_timezone=timezone_str,
-    price_config=price_config
-)
+price_buy_time_series, price_sell_time_series = tariff.prices(timestamps)   # Prezzi per step in ora locale
 
 # time series containing values for cost of carbon dioxide emissions (not accounted for this task, so put to zero)
 emissions_time_series = np.zeros(len(price_buy_time_series))
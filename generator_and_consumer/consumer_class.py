@@ -2,32 +2,110 @@
 Kafka Consumer Classe
 """
 
-from confluent_kafka import Consumer
+import asyncio
 import json
-import requests
+import queue
+import numpy as np
 import pandas as pd
 from collections import deque
+from typing import NamedTuple
 import threading
 import time
 import pytz
 
 
+try:
+    from confluent_kafka import Consumer
+except ImportError:              # Non necessario per il replay locale (generator_and_consumer.replay_broker)
+    Consumer = None
+
+try:
+    import requests
+except ImportError:
+    requests = None
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import msgspec
+except ImportError:
+    msgspec = None
+
+
+def get_json_decoder(name='auto'):
+    """
+    Restituisce (nome, funzione di decodifica) per i messaggi JSON.
+
+    name='auto' usa orjson o msgspec se installati, altrimenti json della libreria standard.
+    Tutte le funzioni accettano direttamente bytes o str.
+    """
+    if name == 'auto':
+        name = 'orjson' if orjson is not None else 'msgspec' if msgspec is not None else 'json'
+
+    if name == 'orjson':
+        if orjson is None:
+            raise ImportError("orjson non installato: pip install orjson")
+        return name, orjson.loads
+    if name == 'msgspec':
+        if msgspec is None:
+            raise ImportError("msgspec non installato: pip install msgspec")
+        return name, msgspec.json.decode
+    if name == 'json':
+        return name, json.loads
+
+    raise ValueError(f"Decoder JSON sconosciuto: '{name}' (usa 'auto', 'orjson', 'msgspec' o 'json')")
+
+
+class KafkaSample(NamedTuple):
+    """Campione quartorario ricevuto da Kafka (energie per step in kWh) con la sua posizione nel topic e il sito."""
+    timestamp: pd.Timestamp
+    solar: float
+    load: float
+    partition: int = -1
+    offset: int = -1
+    generator_id: str = None
+
+
 class KafkaConsumer:
     """
     Consumer Kafka con buffer rolling.
     
+    Oltre al buffer rolling, ogni campione viene messo in una coda thread-safe e consegnato in ordine
+    tramite get_sample() o iterando sul consumer (anche con async for).
+
     Uso:
         consumer = KafkaConsumer(buffer_size=96, topic="test_topic", timezone='Europe/Rome')
+        consumer = KafkaConsumer(topic=["test_topic_661", "test_topic_662"])                       # Piu' topic (multi-sito)
         consumer.start_background()                                                                 # Avvia in background
+        for sample in consumer:                                                                     # Un campione alla volta, in ordine
+            ...
         df = consumer.get_data()                                                                    # Prendi dati come DataFrame
+
+    I messaggi vengono letti a blocchi: si attende il primo con poll() e si prelevano con consume() quelli gia'
+    arrivati (fino a batch_size), poi il blocco viene decodificato insieme (timestamp vettorizzati).
+
+    Backpressure (coda piena):
+        on_full='block'        il thread di ricezione attende che l'EMS consumi (Kafka trattiene i messaggi)
+        on_full='drop_oldest'  scarta il campione piu' vecchio in coda e incrementa dropped_messages
     """
     
-    def __init__(self, buffer_size=96, topic="test_topic_661", timezone='Europe/Rome', sample_time_hours=0.25):
+    def __init__(self, buffer_size=96, topic="test_topic_661", timezone='Europe/Rome', sample_time_hours=0.25,
+                 queue_size=1024, on_full='block', batch_size=500, poll_timeout=1.0, json_decoder='auto'):
         """Crea consumer con parametri configurabili"""
+
+        if on_full not in ('block', 'drop_oldest'):
+            raise ValueError(f"on_full deve essere 'block' o 'drop_oldest', ricevuto '{on_full}'")
         
         self.buffer_size = buffer_size
         self.topic = topic
+        self.topics = [topic] if isinstance(topic, str) else list(topic)     # Topic sottoscritti
         self.sample_time_hours = float(sample_time_hours)
+        self.batch_size = max(1, int(batch_size))
+        self.poll_timeout = float(poll_timeout)
+        self.json_decoder, self._json_loads = get_json_decoder(json_decoder)
         
         # TIMEZONE
         self.timezone = pytz.timezone(timezone)
@@ -37,6 +115,13 @@ class KafkaConsumer:
         self.solar = deque(maxlen=buffer_size)
         self.load = deque(maxlen=buffer_size)
         self.total_messages = 0
+
+        # Coda dei campioni da consegnare all'EMS
+        self.on_full = on_full
+        self.samples = queue.Queue(maxsize=queue_size)
+        self.dropped_messages = 0    # Campioni scartati per coda piena (on_full='drop_oldest')
+        self.invalid_messages = 0    # Messaggi non decodificabili
+        self._closed = threading.Event()
         
         # Kafka
         self.consumer = None         # Tipo: Consumer
@@ -46,8 +131,16 @@ class KafkaConsumer:
         print(f" Consumer creato: buffer={buffer_size}, topic={topic}")
     
     
-    def connect(self):
-        """Connetti a Kafka"""
+    def connect(self, start_offsets=None):
+        """
+        Connetti a Kafka.
+
+        start_offsets: {partizione: offset} o {(topic, partizione): offset} da cui riprendere la lettura
+        (es. dopo un resume); le altre partizioni seguono auto.offset.reset.
+        """
+
+        if Consumer is None or requests is None:
+            raise ImportError("confluent-kafka e requests non installati: pip install confluent-kafka requests")
         
         response = requests.get("http://localhost:50005/register/dc")     # Ottieni endpoint Kafka
         kafka_endpoint = response.json()["KAFKA_ENDPOINT"]                # Estrai endpoint Kafka
@@ -57,16 +150,34 @@ class KafkaConsumer:
             'group.id': 'consumer_classe',                          # ID gruppo consumer
             'auto.offset.reset': 'latest'                           # Inizia a leggere dai messaggi più recenti
         })
-        
-        self.consumer.subscribe([self.topic])                       # Iscriviti al topic
+        self._subscribe(start_offsets)
         print(f" Connesso a Kafka: {kafka_endpoint}")
+
+
+    def _subscribe(self, start_offsets=None):
+        """Iscrive self.consumer ai topic, riposizionando le partizioni in start_offsets (privato)"""
+
+        def on_assign(consumer, partitions):                        # Riposiziona le partizioni assegnate
+            for partition in partitions:
+                key = (partition.topic, partition.partition)
+                if key in start_offsets:
+                    partition.offset = start_offsets[key]
+                elif partition.partition in start_offsets:
+                    partition.offset = start_offsets[partition.partition]
+            consumer.assign(partitions)
+
+        if start_offsets:
+            self.consumer.subscribe(self.topics, on_assign=on_assign)
+        else:
+            self.consumer.subscribe(self.topics)                    # Iscriviti ai topic
     
     
-    def start_background(self):
+    def start_background(self, start_offsets=None):
         """Avvia consumer in background (non blocca)"""
         
-        self.connect()                        # Connetti a Kafka
+        self.connect(start_offsets)           # Connetti a Kafka
         self.running = True                   # Imposta flag esecuzione
+        self._closed.clear()
         
         thread = threading.Thread(target=self._loop, daemon=False)      # Crea thread in background
         thread.start()                                                  # Avvia thread
@@ -78,44 +189,158 @@ class KafkaConsumer:
     def _loop(self):
         """Loop interno che riceve messaggi (privato)"""
         
-        while self.running:                     # Finché il consumer è attivo (flag True)
-            
-            # Ricevi messaggio
-            msg = self.consumer.poll(1.0)       # Timeout 1 secondo
-            
-            if msg is None or msg.error():      # Nessun messaggio o errore
-                continue
-            
-            # Parse messaggio
-            try:
-                data = json.loads(msg.value().decode('utf-8'))     # Decodifica JSON
-                timestamp = pd.to_datetime(data['timestamp'])      # Estrai timestamp
-
-                # Converti in timezone italiano se non lo è già
-                if timestamp.tzinfo is None:
-                    # Se naive, assume UTC e converti
-                    timestamp = pytz.utc.localize(timestamp).astimezone(self.timezone)
-                else:
-                    # Se già ha timezone, converti
-                    timestamp = timestamp.astimezone(self.timezone)
-
-                dati = json.loads(data['data'])                    # Estrai dati interni
+        try:
+            while self.running:                     # Finché il consumer è attivo (flag True)
                 
-                s_kw = max(0.0, float(dati['solar']['value']))     # Valore solar medio (kW)
-                l_kw = max(0.0, float(dati['load']['value']))      # Valore load medio (kW)
+                # Ricevi blocco di messaggi
+                messages = self._fetch_batch()
+                if not messages:                    # Nessun messaggio entro il timeout
+                    continue
 
-                # Converte potenze quartorarie in energie per step (kWh)
-                s = s_kw * self.sample_time_hours / 1000
-                l = l_kw * self.sample_time_hours / 1000
-                
-                # Aggiungi a buffer
-                self.timestamps.append(timestamp)             # Aggiungi timestamp
-                self.solar.append(s)                          # Aggiungi solar
-                self.load.append(l)                           # Aggiungi load
-                self.total_messages += 1                      # Incrementa contatore messaggi ricevuti
-                
-            except:                           # Errore nel parsing del messaggio
+                messages = [msg for msg in messages if not msg.error()]         # Scarta messaggi di errore
+                raws = [msg.value() for msg in messages]
+                positions = [(msg.partition(), msg.offset()) for msg in messages]
+
+                # Parse blocco e pubblicazione in ordine
+                for sample in self._parse_batch(raws, positions):
+                    self._publish(sample)
+        finally:
+            self._closed.set()                      # Sblocca chi attende campioni: non ne arriveranno altri
+
+
+    def _fetch_batch(self):
+        """
+        Preleva fino a batch_size messaggi (privato).
+
+        consume() attende finche' il blocco non e' pieno o scade il timeout: per non ritardare i campioni
+        real-time si attende solo il primo messaggio con poll() e si prelevano senza attesa quelli gia' arrivati.
+        """
+        first = self.consumer.poll(self.poll_timeout)
+        if first is None:
+            return []
+        if self.batch_size == 1:
+            return [first]
+        return [first] + self.consumer.consume(num_messages=self.batch_size - 1, timeout=0)
+
+
+    def _parse_batch(self, raws, positions=None):
+        """
+        Decodifica un blocco di messaggi Kafka in KafkaSample, scartando quelli non validi (privato).
+        positions: eventuali (partizione, offset) dei messaggi, riportati nei campioni.
+        """
+
+        loads = self._json_loads
+        raw_timestamps, solar, load, kept_positions, generator_ids = [], [], [], [], []
+
+        if positions is None:
+            positions = [(-1, -1)] * len(raws)
+
+        for raw, position in zip(raws, positions):
+            try:
+                data = loads(raw)                               # Decodifica JSON pacchetto
+                dati = loads(data['data'])                      # Decodifica dati interni
+                s_kw = float(dati['solar']['value'])            # Valore solar medio (kW)
+                l_kw = float(dati['load']['value'])             # Valore load medio (kW)
+                timestamp = data['timestamp']
+                generator_id = data.get('generator_id')         # Sito di provenienza (routing multi-sito)
+            except Exception:                                   # Errore nel parsing del messaggio
+                self.invalid_messages += 1
                 continue
+
+            raw_timestamps.append(timestamp)
+            solar.append(s_kw)
+            load.append(l_kw)
+            kept_positions.append(position)
+            generator_ids.append(generator_id)
+
+        if not raw_timestamps:
+            return []
+
+        # Timestamp del blocco in un'unica chiamata: i naive sono assunti UTC, poi conversione nel timezone locale
+        timestamps = pd.to_datetime(pd.Index(raw_timestamps), utc=True, errors='coerce', format='ISO8601')
+        timestamps = timestamps.tz_convert(self.timezone)
+
+        # Converte potenze quartorarie in energie per step (kWh); fmax porta a zero anche eventuali NaN
+        solar = np.fmax(np.asarray(solar, dtype=float), 0.0) * self.sample_time_hours / 1000
+        load = np.fmax(np.asarray(load, dtype=float), 0.0) * self.sample_time_hours / 1000
+
+        samples = []
+        for timestamp, s, l, (partition, offset), generator_id in zip(timestamps, solar.tolist(), load.tolist(),
+                                                                      kept_positions, generator_ids):
+            if timestamp is pd.NaT:                             # Timestamp non interpretabile
+                self.invalid_messages += 1
+                continue
+            samples.append(KafkaSample(timestamp, s, l, partition, offset, generator_id))
+
+        return samples
+
+
+    def _publish(self, sample):
+        """Aggiunge il campione ai buffer rolling e alla coda, applicando la backpressure (privato)"""
+
+        # Aggiungi a buffer
+        self.timestamps.append(sample.timestamp)      # Aggiungi timestamp
+        self.solar.append(sample.solar)               # Aggiungi solar
+        self.load.append(sample.load)                 # Aggiungi load
+
+        if self.on_full == 'block':
+            while self.running:                       # Attende spazio in coda senza bloccare lo stop()
+                try:
+                    self.samples.put(sample, timeout=0.1)
+                    break
+                except queue.Full:
+                    continue
+        else:
+            while True:
+                try:
+                    self.samples.put_nowait(sample)
+                    break
+                except queue.Full:
+                    try:
+                        self.samples.get_nowait()     # Scarta il campione piu' vecchio
+                        self.dropped_messages += 1
+                    except queue.Empty:
+                        pass
+
+        self.total_messages += 1                      # Incrementa contatore messaggi ricevuti
+
+
+    def get_sample(self, timeout=None):
+        """
+        Prossimo campione in ordine di arrivo; blocca finche' non e' disponibile.
+        Restituisce None allo scadere di `timeout` [s] o se il consumer e' fermo e la coda e' vuota.
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+
+        while True:
+            wait = 0.1 if deadline is None else min(0.1, max(0.0, deadline - time.monotonic()))
+            try:
+                return self.samples.get(timeout=wait)       # Consegna immediata appena il campione e' in coda
+            except queue.Empty:
+                if self._closed.is_set() and self.samples.empty():
+                    return None
+                if deadline is not None and time.monotonic() >= deadline:
+                    return None
+
+
+    def __iter__(self):
+        """Itera sui campioni in ordine finche' il consumer non viene fermato"""
+        while True:
+            sample = self.get_sample()
+            if sample is None:
+                return
+            yield sample
+
+
+    def __aiter__(self):
+        return self
+
+
+    async def __anext__(self):
+        sample = await asyncio.to_thread(self.get_sample)    # Attesa bloccante fuori dall'event loop
+        if sample is None:
+            raise StopAsyncIteration
+        return sample
     
     
     def get_data(self):
@@ -138,7 +363,8 @@ class KafkaConsumer:
         self.running = False                    # Imposta flag esecuzione a False per fermare il loop
         if self.thread and self.thread.is_alive():
             self.thread.join(timeout=3.0)       # Attendi che il thread termini
-        if self.consumer:                       # Se il consumer esiste
+        self._closed.set()                      # Nessun nuovo campione: get_sample() svuota la coda e termina
+        if self.consumer:                      # Se il consumer esiste
             self.consumer.close()               # Chiudi connessione Kafka
             self.consumer = None
 
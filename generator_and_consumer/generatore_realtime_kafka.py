@@ -3,18 +3,20 @@ Generatore Kafka - Invio Dati Real-Time
 
 1. Configura parametri
 2. Registra a ODA
-3. Carica CSV
-4. Invia dati a Kafka ogni 15 secondi
+3. Carica CSV e prepara tutti i pacchetti in anticipo (timestamp, conversione kWh e JSON vettoriali)
+4. Invia dati a Kafka ogni DELTA_T_SEC secondi (0 = il piu' velocemente possibile)
 """
 
 from pathlib import Path
+import sys
 from confluent_kafka import Producer
-import pandas as pd
 import time
-import json
 import requests
 import pytz  # Per gestire fusi orari
-from pytz import NonExistentTimeError, AmbiguousTimeError
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from generator_and_consumer.packets import build_packets, load_dataset
 
 
 # ============================================================================
@@ -25,10 +27,16 @@ API_GATEWAY_URL = "http://localhost:50005"    # Indirizzo API Gateway ODA
 TOPIC = "test_topic_661"                      # Topic Kafka
 GENERATOR_ID = "casa_661"                     # Identificatore univoco del generatore
 
-DELTA_T_SEC = 0.1  # Secondi tra un invio e l'altro (simula dati quartorari)
+DELTA_T_SEC = 0.1  # Secondi tra un invio e l'altro (simula dati quartorari); 0 = massima velocita' (replay)
 SAMPLE_TIME_HOURS = 0.25  # Durata dello step rappresentato dai campioni (15 minuti)
 DATA_FILE = Path(__file__).resolve().parent / 'data' / 'processed_data_661_formatted.csv'  # CSV con potenze medie (kW) per intervallo
 
+# PRODUCER: i messaggi vengono accumulati per LINGER_MS e inviati in blocchi da BATCH_NUM_MESSAGES
+LINGER_MS = 5 if DELTA_T_SEC > 0 else 50
+BATCH_NUM_MESSAGES = 10000
+QUEUE_MAX_MESSAGES = 200000             # Messaggi in attesa di invio nella coda locale del producer
+PRINT_EVERY = 1 if DELTA_T_SEC > 0 else 10000    # Stampa progresso ogni N messaggi
+
 # FUSO ORARIO 
 TIMEZONE_CHICAGO = pytz.timezone('America/Chicago')  
 #TIMEZONE_ITALIA = pytz.timezone('Europe/Rome')      # CET/CEST
@@ -57,59 +65,38 @@ print(f" Kafka endpoint: {kafka_endpoint}")
 
 
 # ============================================================================
-# CARICAMENTO CSV
+# CARICAMENTO CSV E PREPARAZIONE PACCHETTI
 # ============================================================================
 
 print(f"\n Caricamento dati da {DATA_FILE}...")
 
-df = pd.read_csv(DATA_FILE, parse_dates=['datetime'])         # Carica CSV in DataFrame con pandas e parse colonna timestamp
-
-
-def normalize_timestamp(ts):
-    if pd.isna(ts):
-        return pd.NaT
-    ts = pd.Timestamp(ts)
-    if ts.tzinfo is not None:
-        return ts.tz_convert(TIMEZONE_CHICAGO)
-    try:
-        return ts.tz_localize(TIMEZONE_CHICAGO, ambiguous=True, nonexistent='shift_forward')
-    except NonExistentTimeError:
-        adjusted = ts + pd.Timedelta(hours=1)
-        return adjusted.tz_localize(TIMEZONE_CHICAGO, ambiguous=True, nonexistent='shift_forward')
-    except AmbiguousTimeError:
-        return ts.tz_localize(TIMEZONE_CHICAGO, ambiguous=True)
-
+try:
+    df, invalid_datetimes, invalid_energy = load_dataset(DATA_FILE, TIMEZONE_CHICAGO)   # Timestamp localizzati e potenze kW
+except KeyError as exc:              # Colonne necessarie mancanti
+    print(f" ERRORE: {exc}")
+    exit(1)
 
-df['datetime'] = df['datetime'].apply(normalize_timestamp)
-invalid_datetimes = df['datetime'].isna().sum()
 if invalid_datetimes:
     print(f" ATTENZIONE: {invalid_datetimes} timestamp non validi saranno ignorati.")
-    df = df.dropna(subset=['datetime']).reset_index(drop=True)
-
-# Converte solar/load in numerici (potenze medie kW) e gestisce eventuali valori non validi
-df['solar'] = pd.to_numeric(df['solar'], errors='coerce')
-df['load'] = pd.to_numeric(df['load'], errors='coerce')
-invalid_energy = df[['solar', 'load']].isna().sum().sum()
 if invalid_energy:
-    print(f" ATTENZIONE: trovati {int(invalid_energy)} valori energy non validi (solar/load); verranno ignorati.")
-    df = df.dropna(subset=['solar', 'load']).reset_index(drop=True)
-
-# Verifica colonne
-required_columns = {'datetime', 'solar', 'load'}
-missing_columns = required_columns.difference(df.columns)   # Trova colonne mancanti nel file CSV rispetto a quelle richieste
-
-if missing_columns:           # Controlla colonne necessarie, altrimenti esci
-    print(f" ERRORE: CSV deve avere colonne {', '.join(sorted(required_columns))}!")
-    exit(1)
+    print(f" ATTENZIONE: trovati {invalid_energy} valori energy non validi (solar/load); verranno ignorati.")
 
-first_valid_idx = df['datetime'].first_valid_index()
-if first_valid_idx is None:
+if df.empty:
     print(" ERRORE: nessun timestamp valido nel CSV!")
     exit(1)
 
-start_timestamp = df.at[first_valid_idx, 'datetime']
+start_timestamp = df.at[0, 'datetime']
 print(f" Caricati {len(df)} record")
 
+prepare_start = time.perf_counter()
+packets = build_packets(df, SAMPLE_TIME_HOURS, GENERATOR_ID, TOPIC)      # Tutti i pacchetti serializzati in anticipo
+print(f" Pacchetti preparati in {time.perf_counter() - prepare_start:.2f} s")
+
+# Valori per la stampa del progresso
+timestamps = df['datetime'].tolist()
+solar_kw = df['solar'].clip(lower=0.0).tolist()
+load_kw = df['load'].clip(lower=0.0).tolist()
+
 
 # ============================================================================
 # CREAZIONE KAFKA PRODUCER
@@ -119,9 +106,26 @@ print(f"\n Connessione a Kafka...")
 
 producer = Producer({                             # Crea Kafka Producer 
     'bootstrap.servers': kafka_endpoint,          # Endpoint Kafka
-    'client.id': GENERATOR_ID                     # Identificatore univoco del generatore
+    'client.id': GENERATOR_ID,                    # Identificatore univoco del generatore
+    'linger.ms': LINGER_MS,                       # Attesa massima per riempire un blocco
+    'batch.num.messages': BATCH_NUM_MESSAGES,     # Messaggi per blocco
+    'queue.buffering.max.messages': QUEUE_MAX_MESSAGES,
 })
 
+delivered = 0           # Messaggi confermati dal broker
+failed = 0              # Messaggi non consegnati
+
+
+def on_delivery(err, msg):
+    """Callback di consegna (chiamata da poll/flush del producer)"""
+    global delivered, failed
+    if err is not None:
+        failed += 1
+        if failed <= 10:
+            print(f" ERRORE consegna: {err}")
+    else:
+        delivered += 1
+
 print(" Producer creato")
 
 
@@ -140,48 +144,33 @@ iteration = 0                # Contatore invii
 start_wallclock = time.time()     # Tempo inizio invio reale
 
 try:
-    
-    for idx, row in df.iterrows():        # Itera righe DataFrame
-
-        timestamp = row['datetime']       # Timestamp proveniente dal CSV
-        if pd.isna(timestamp):
-            print(f" ATTENZIONE: timestamp mancante alla riga {idx}, salto il record")
-            continue
-
-        # Leggi potenze medie (kW) e trasformale in energie per intervallo (kWh)
-        solar_kw = max(0.0, float(row['solar']))
-        load_kw = max(0.0, float(row['load']))
-        solar_kwh = solar_kw * SAMPLE_TIME_HOURS
-        load_kwh = load_kw * SAMPLE_TIME_HOURS
-
-        iteration += 1                    # Incrementa contatore solo se invio effettuato
-        
-        # Crea pacchetto dati
-        packet = {                                                          # Crea dizionario pacchetto come messaggio
-            "timestamp": timestamp.isoformat(),                        # Timestamp in formato ISO 8601 dal CSV
-            "generator_id": GENERATOR_ID,                                   # Identificatore generatore
-            "topic": TOPIC,                                                 # Topic
-            "data": json.dumps({                                            # Dati interni in JSON
-                "solar": {"value": float(solar_kwh), "unit": "kWh"},        # Energia solar per intervallo
-                "load": {"value": float(load_kwh), "unit": "kWh"}           # Energia load per intervallo
-            })
-        }
-        
-        # Invia a Kafka
-        producer.produce(                                  # Invia messaggio
-            TOPIC,                                         # Topic
-            value=json.dumps(packet).encode('utf-8')       # Messaggio in formato JSON codificato in UTF-8
-        )
-        
+
+    for timestamp, packet, s_kw, l_kw in zip(timestamps, packets, solar_kw, load_kw):
+
+        # Invia a Kafka (se la coda locale e' piena si attende che il producer svuoti i blocchi)
+        while True:
+            try:
+                producer.produce(TOPIC, value=packet, on_delivery=on_delivery)
+                break
+            except BufferError:
+                producer.poll(0.1)
+
         producer.poll(0)     # Processa callback (non blocca)
-        
+        iteration += 1
+
         # Stampa progresso
-        print(f"[{iteration:4d}] {timestamp.strftime('%Y-%m-%d %H:%M:%S')} | "
-              f"Solar: {solar_kw:6.2f} kW ({solar_kwh:5.2f} kWh) | "
-              f"Load: {load_kw:6.2f} kW ({load_kwh:5.2f} kWh)")
-        
-        # Aspetta prima di inviare il prossimo
-        time.sleep(DELTA_T_SEC)
+        if iteration % PRINT_EVERY == 0:
+            elapsed = time.time() - start_wallclock
+            print(f"[{iteration:4d}] {timestamp.strftime('%Y-%m-%d %H:%M:%S')} | "
+                  f"Solar: {s_kw:6.2f} kW ({s_kw * SAMPLE_TIME_HOURS:5.2f} kWh) | "
+                  f"Load: {l_kw:6.2f} kW ({l_kw * SAMPLE_TIME_HOURS:5.2f} kWh) | "
+                  f"{iteration / max(elapsed, 1e-9):8.0f} msg/s")
+
+        # Aspetta prima di inviare il prossimo (scadenze assolute: nessuna deriva sui tempi)
+        if DELTA_T_SEC > 0:
+            delay = start_wallclock + iteration * DELTA_T_SEC - time.time()
+            if delay > 0:
+                time.sleep(delay)
 
 
 except KeyboardInterrupt:                       # Gestione interruzione manuale con Ctrl+C
@@ -206,6 +195,7 @@ print("\n" + "=" * 70)
 print("   STATISTICHE")
 print("=" * 70)
 print(f"   Record inviati: {iteration}/{len(df)}")
+print(f"   Consegnati: {delivered} | Falliti: {failed}")
 print(f"   Timestamp iniziale (CSV): {start_timestamp.strftime('%Y-%m-%d %H:%M:%S %Z')}")
 print(f"   Tempo totale: {elapsed:.1f} secondi")
-print(f"   Throughput: {iteration/elapsed:.2f} record/sec")
\ No newline at end of file
+print(f"   Throughput: {iteration/elapsed:.2f} msg/sec (consegnati {delivered/elapsed:.2f} msg/sec)")
\ No newline at end of file
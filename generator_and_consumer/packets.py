@@ -0,0 +1,114 @@
+"""
+Preparazione vettoriale dei pacchetti Kafka del generatore.
+
+Tutte le operazioni per riga del generatore originale (normalize_timestamp con apply, iterrows, doppio
+json.dumps) sono sostituite da operazioni sull'intera colonna:
+
+1. localizzazione dei timestamp nel fuso del generatore in un'unica chiamata (ore inesistenti spostate avanti,
+   ambigue come ora legale, come normalize_timestamp)
+2. conversione potenze medie (kW) -> energie per intervallo (kWh) con numpy
+3. serializzazione dei pacchetti a blocchi con un template: i bytes prodotti sono identici a
+   json.dumps(packet).encode('utf-8') del generatore originale
+
+Uso:
+    df = load_dataset(DATA_FILE, TIMEZONE_CHICAGO)
+    packets = build_packets(df, SAMPLE_TIME_HOURS, GENERATOR_ID, TOPIC)
+"""
+
+import json
+
+import numpy as np
+import pandas as pd
+
+
+# Stesso testo di json.dumps(packet) con il campo data a sua volta serializzato con json.dumps
+_PACKET_TEMPLATE = (
+    '{{"timestamp": "{}", "generator_id": {}, "topic": {}, "data": '
+    '"{{\\"solar\\": {{\\"value\\": {!r}, \\"unit\\": \\"kWh\\"}}, '
+    '\\"load\\": {{\\"value\\": {!r}, \\"unit\\": \\"kWh\\"}}}}"}}'
+)
+
+
+def localize_timestamps(timestamps, timezone):
+    """
+    Timestamp nel fuso `timezone`: i naive vengono localizzati, i tz-aware convertiti.
+    Come normalize_timestamp del generatore, ma su tutta la colonna.
+    """
+    timestamps = pd.to_datetime(timestamps, errors='coerce')
+
+    if not pd.api.types.is_datetime64_any_dtype(timestamps):       # Offset misti: colonna di oggetti
+        timestamps = pd.to_datetime(timestamps, utc=True)
+
+    if timestamps.dt.tz is None:
+        return timestamps.dt.tz_localize(timezone, ambiguous=True, nonexistent='shift_forward')
+    return timestamps.dt.tz_convert(timezone)
+
+
+def load_dataset(data_file, timezone, rows=None):
+    """
+    Carica il CSV del generatore con timestamp localizzati e potenze numeriche (kW).
+
+    Restituisce (df, invalid_datetimes, invalid_energy): il DataFrame ripulito e il numero di righe scartate
+    per timestamp o valori solar/load non validi.
+    """
+    df = pd.read_csv(data_file, parse_dates=['datetime'], nrows=rows)
+
+    missing_columns = {'datetime', 'solar', 'load'}.difference(df.columns)
+    if missing_columns:
+        raise KeyError(f"Il CSV deve avere le colonne datetime, solar, load (mancano {sorted(missing_columns)})")
+
+    df['datetime'] = localize_timestamps(df['datetime'], timezone)
+    invalid_datetimes = int(df['datetime'].isna().sum())
+    df = df.dropna(subset=['datetime'])
+
+    df['solar'] = pd.to_numeric(df['solar'], errors='coerce')
+    df['load'] = pd.to_numeric(df['load'], errors='coerce')
+    invalid_energy = int(df[['solar', 'load']].isna().sum().sum())
+    df = df.dropna(subset=['solar', 'load']).reset_index(drop=True)
+
+    return df, invalid_datetimes, invalid_energy
+
+
+def energy_per_step(power_kw, sample_time_hours):
+    """Energie per intervallo (kWh) dalle potenze medie (kW); le potenze negative valgono zero."""
+    power_kw = np.asarray(power_kw, dtype=float)
+    return np.where(power_kw > 0.0, power_kw, 0.0) * sample_time_hours       # Come max(0.0, kw) * ore
+
+
+def isoformat_timestamps(timestamps):
+    """Stringhe ISO 8601 dei timestamp tz-aware, identiche a Timestamp.isoformat()."""
+    timestamps = pd.Series(timestamps)
+
+    if (timestamps.dt.microsecond != 0).any() or (timestamps.dt.nanosecond != 0).any():
+        return [timestamp.isoformat() for timestamp in timestamps]              # Frazioni di secondo: caso raro
+
+    local = timestamps.dt.tz_localize(None)
+    offset_minutes = ((local - timestamps.dt.tz_convert('UTC').dt.tz_localize(None)) // pd.Timedelta(minutes=1))
+
+    offsets = [
+        f"{'-' if minutes < 0 else '+'}{abs(minutes) // 60:02d}:{abs(minutes) % 60:02d}"
+        for minutes in offset_minutes.tolist()
+    ]
+    return [f"{wall}{offset}" for wall, offset in zip(local.dt.strftime('%Y-%m-%dT%H:%M:%S').tolist(), offsets)]
+
+
+def serialize_packets(timestamps_iso, solar_kwh, load_kwh, generator_id, topic):
+    """Pacchetti Kafka (bytes) serializzati a blocco con il template, senza json.dumps per messaggio."""
+    generator_id, topic = json.dumps(generator_id), json.dumps(topic)
+    template = _PACKET_TEMPLATE.format
+    return [
+        template(timestamp, generator_id, topic, solar, load).encode('utf-8')
+        for timestamp, solar, load in zip(timestamps_iso, np.asarray(solar_kwh, dtype=float).tolist(),
+                                          np.asarray(load_kwh, dtype=float).tolist())
+    ]
+
+
+def build_packets(df, sample_time_hours, generator_id, topic):
+    """Pacchetti Kafka (bytes) per tutte le righe di un DataFrame restituito da load_dataset."""
+    return serialize_packets(
+        isoformat_timestamps(df['datetime']),
+        energy_per_step(df['solar'], sample_time_hours),
+        energy_per_step(df['load'], sample_time_hours),
+        generator_id,
+        topic,
+    )
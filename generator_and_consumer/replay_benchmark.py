@@ -0,0 +1,117 @@
+"""
+Benchmark di replay locale della decodifica dei messaggi Kafka (senza broker).
+
+1. Carica il dataset CSV e costruisce i pacchetti esattamente come generatore_realtime_kafka.py
+2. Decodifica con il metodo per-messaggio originale (json.loads x2 + pd.to_datetime + pytz)
+3. Decodifica a blocchi con KafkaConsumer._parse_batch, per ogni decoder JSON disponibile
+4. Verifica che i campioni coincidano e stampa tempi e throughput
+
+Uso:
+    python -m generator_and_consumer.replay_benchmark [--rows N] [--batch-size 500]
+"""
+
+import argparse
+import json
+import time
+from pathlib import Path
+
+import pandas as pd
+import pytz
+
+from generator_and_consumer.consumer_class import KafkaConsumer, KafkaSample, get_json_decoder
+from generator_and_consumer.packets import build_packets as serialize_dataset, load_dataset
+
+
+DATA_FILE = Path(__file__).resolve().parent / 'data' / 'processed_data_661_formatted.csv'
+TIMEZONE_CHICAGO = pytz.timezone('America/Chicago')
+SAMPLE_TIME_HOURS = 0.25
+TOPIC = "test_topic_661"
+GENERATOR_ID = "casa_661"
+
+
+def build_packets(data_file=DATA_FILE, rows=None):
+    """Pacchetti Kafka (bytes) nello stesso formato inviato dal generatore"""
+
+    df, _, _ = load_dataset(data_file, TIMEZONE_CHICAGO, rows=rows)
+    return serialize_dataset(df, SAMPLE_TIME_HOURS, GENERATOR_ID, TOPIC)
+
+
+def parse_per_message(packets, timezone='Europe/Rome', sample_time_hours=SAMPLE_TIME_HOURS):
+    """Decodifica di riferimento, un messaggio alla volta come nel vecchio KafkaConsumer._loop"""
+
+    timezone = pytz.timezone(timezone)
+    samples = []
+
+    for raw in packets:
+        data = json.loads(raw.decode('utf-8'))
+        timestamp = pd.to_datetime(data['timestamp'])
+
+        if timestamp.tzinfo is None:
+            timestamp = pytz.utc.localize(timestamp).astimezone(timezone)
+        else:
+            timestamp = timestamp.astimezone(timezone)
+
+        dati = json.loads(data['data'])
+        s = max(0.0, float(dati['solar']['value'])) * sample_time_hours / 1000
+        l = max(0.0, float(dati['load']['value'])) * sample_time_hours / 1000
+        samples.append(KafkaSample(timestamp, s, l))
+
+    return samples
+
+
+def parse_batched(packets, batch_size=500, json_decoder='auto', timezone='Europe/Rome'):
+    """Decodifica a blocchi di batch_size messaggi, come nel loop del consumer"""
+
+    consumer = KafkaConsumer(timezone=timezone, batch_size=batch_size, json_decoder=json_decoder)
+    samples = []
+    for start in range(0, len(packets), batch_size):
+        samples.extend(consumer._parse_batch(packets[start:start + batch_size]))
+    return samples
+
+
+def _timed(func, *args, **kwargs):
+    start = time.perf_counter()
+    result = func(*args, **kwargs)
+    return result, time.perf_counter() - start
+
+
+def _same_samples(reference, samples):
+    return len(reference) == len(samples) and all(
+        a.timestamp == b.timestamp and a.solar == b.solar and a.load == b.load
+        for a, b in zip(reference, samples)
+    )
+
+
+def run_benchmark(rows=None, batch_size=500):
+    """Esegue il replay con tutti i decoder disponibili; restituisce un DataFrame con i tempi"""
+
+    packets = build_packets(rows=rows)
+    print(f" Pacchetti costruiti: {len(packets)}")
+
+    reference, elapsed = _timed(parse_per_message, packets)
+    results = [{'metodo': 'per-messaggio (json)', 'secondi': elapsed, 'identico': True}]
+
+    for name in ('json', 'orjson', 'msgspec'):
+        try:
+            get_json_decoder(name)
+        except ImportError:
+            print(f" Decoder {name} non installato, saltato")
+            continue
+
+        samples, elapsed = _timed(parse_batched, packets, batch_size=batch_size, json_decoder=name)
+        results.append({'metodo': f'batch {batch_size} ({name})', 'secondi': elapsed,
+                        'identico': _same_samples(reference, samples)})
+
+    results = pd.DataFrame(results)
+    results['msg/s'] = len(packets) / results['secondi']
+    results['speedup'] = results['secondi'].iloc[0] / results['secondi']
+    return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark di replay locale della decodifica Kafka")
+    parser.add_argument('--rows', type=int, default=None, help="Numero di righe del dataset (default tutte)")
+    parser.add_argument('--batch-size', type=int, default=500, help="Messaggi per blocco")
+    args = parser.parse_args()
+
+    print(run_benchmark(rows=args.rows, batch_size=args.batch_size).to_string(index=False))
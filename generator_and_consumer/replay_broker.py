@@ -0,0 +1,268 @@
+"""
+Broker Kafka simulato in memoria per replay e test di carico, senza ODA ne' Kafka.
+
+ReplayBroker contiene il log dei messaggi di un topic (una sola partizione), costruito dal CSV del
+generatore (stesso formato di generatore_realtime_kafka.py) oppure letto da un file JSONL salvato in
+precedenza. I messaggi diventano disponibili secondo il loro istante di pubblicazione: uno ogni
+`interval_sec / speedup` secondi dall'inizio del replay, oppure tutti subito con speedup=None (il piu'
+velocemente possibile).
+
+ReplayClient espone la parte dell'interfaccia confluent_kafka.Consumer usata da KafkaConsumer (subscribe
+con on_assign, assign, poll, consume, close) e ReplayKafkaConsumer e' un KafkaConsumer che si collega al
+broker simulato invece che a ODA: decodifica, coda, backpressure e offset restano quelli reali.
+
+Uso:
+    broker = ReplayBroker.from_csv(rows=2000, speedup=None)
+    consumer = ReplayKafkaConsumer(broker, timezone='Europe/Rome')
+    consumer.start_background()
+    for sample in consumer:
+        ...
+    print(broker.delivery_lag_summary())
+"""
+
+import threading
+import time
+from pathlib import Path
+
+import numpy as np
+
+from generator_and_consumer.consumer_class import KafkaConsumer
+from generator_and_consumer.packets import build_packets as serialize_dataset, load_dataset
+from generator_and_consumer.replay_benchmark import (DATA_FILE, GENERATOR_ID, SAMPLE_TIME_HOURS, TIMEZONE_CHICAGO,
+                                                     TOPIC, build_packets)
+
+
+OFFSET_BEGINNING = -2       # Stessi valori speciali di confluent_kafka
+OFFSET_END = -1
+
+
+class ReplayTopicPartition:
+    """Partizione assegnata al client (come confluent_kafka.TopicPartition)."""
+
+    def __init__(self, topic, partition=0, offset=OFFSET_BEGINNING):
+        self.topic = topic
+        self.partition = partition
+        self.offset = offset
+
+
+class ReplayMessage:
+    """Messaggio del broker simulato, con gli stessi metodi di confluent_kafka.Message usati dal consumer."""
+
+    __slots__ = ('_topic', '_partition', '_offset', '_value')
+
+    def __init__(self, topic, partition, offset, value):
+        self._topic = topic
+        self._partition = partition
+        self._offset = offset
+        self._value = value
+
+    def topic(self):
+        return self._topic
+
+    def partition(self):
+        return self._partition
+
+    def offset(self):
+        return self._offset
+
+    def value(self):
+        return self._value
+
+    def error(self):
+        return None
+
+
+class ReplayBroker:
+    """
+    Log in memoria dei messaggi di un topic, pubblicati a velocita' configurabile.
+
+    interval_sec: intervallo tra due messaggi nel tempo reale (900 s per i campioni quartorari)
+    speedup:      fattore di accelerazione del replay; None = tutti i messaggi disponibili subito
+    """
+
+    def __init__(self, packets, topic=TOPIC, interval_sec=900.0, speedup=None):
+        if speedup is not None and speedup <= 0:
+            raise ValueError(f"speedup deve essere positivo o None, ricevuto {speedup}")
+
+        self.topic = topic
+        self.packets = list(packets)
+        self.interval_sec = float(interval_sec)
+        self.speedup = speedup
+        self.period = 0.0 if speedup is None else self.interval_sec / speedup     # Secondi reali tra due messaggi
+
+        self.delivery_lag = []          # Ritardo consegna (s) rispetto all'istante di pubblicazione
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_csv(cls, data_file=DATA_FILE, rows=None, sites=1, **kwargs):
+        """
+        Broker con i pacchetti costruiti dal CSV del generatore.
+
+        Con sites > 1 simula `sites` generatori sullo stesso topic (generator_id casa_661_0, casa_661_1, ...)
+        con gli stessi dati: i pacchetti sono interleaved per istante e ogni intervallo contiene un messaggio
+        per sito (interval_sec viene diviso tra i siti).
+        """
+        if sites == 1:
+            return cls(build_packets(data_file, rows=rows), **kwargs)
+        if sites < 1:
+            raise ValueError(f"sites deve essere positivo, ricevuto {sites}")
+
+        df, _, _ = load_dataset(data_file, TIMEZONE_CHICAGO, rows=rows)
+        site_packets = [serialize_dataset(df, SAMPLE_TIME_HOURS, f"{GENERATOR_ID}_{site}", TOPIC)
+                        for site in range(sites)]
+        kwargs['interval_sec'] = kwargs.get('interval_sec', 900.0) / sites
+        return cls([packet for packets in zip(*site_packets) for packet in packets], **kwargs)
+
+    @classmethod
+    def from_file(cls, path, **kwargs):
+        """Broker con i pacchetti di un file JSONL (un messaggio per riga) scritto da save()."""
+        with open(path, 'rb') as packets_file:
+            packets = [line.rstrip(b'\n') for line in packets_file if line.strip()]
+        return cls(packets, **kwargs)
+
+    def save(self, path):
+        """Salva i pacchetti su file JSONL, da rileggere con from_file()."""
+        Path(path).write_bytes(b''.join(packet + b'\n' for packet in self.packets))
+
+    def __len__(self):
+        return len(self.packets)
+
+    def client(self):
+        """Nuovo client con l'interfaccia di confluent_kafka.Consumer."""
+        return ReplayClient(self)
+
+    def _record_lag(self, lags):
+        with self._lock:
+            self.delivery_lag.extend(lags)
+
+    def delivery_lag_summary(self):
+        """Percentili [ms] del ritardo tra pubblicazione e prelievo dei messaggi."""
+        with self._lock:
+            values = np.asarray(self.delivery_lag) * 1000.0
+        if not len(values):
+            return {}
+        return {
+            'count': len(values),
+            'mean_ms': values.mean(),
+            'p50_ms': np.percentile(values, 50),
+            'p95_ms': np.percentile(values, 95),
+            'p99_ms': np.percentile(values, 99),
+            'max_ms': values.max(),
+        }
+
+
+class ReplayClient:
+    """
+    Client del broker simulato con l'interfaccia di confluent_kafka.Consumer usata da KafkaConsumer.
+
+    Il replay inizia all'assegnazione della partizione: il messaggio con offset `start + i` viene pubblicato
+    `i * period` secondi dopo. Senza offset esplicito la lettura parte dall'inizio del log.
+    """
+
+    def __init__(self, broker):
+        self.broker = broker
+        self._position = None       # Prossimo offset da leggere
+        self._start_offset = 0
+        self._start_time = None
+        self._closed = False
+
+    def subscribe(self, topics, on_assign=None):
+        if self.broker.topic not in topics:
+            raise ValueError(f"Topic {topics} non presente nel broker simulato (topic: '{self.broker.topic}')")
+
+        partitions = [ReplayTopicPartition(self.broker.topic)]
+        if on_assign is not None:
+            on_assign(self, partitions)
+        else:
+            self.assign(partitions)
+
+    def assign(self, partitions):
+        for partition in partitions:
+            if partition.partition != 0:
+                raise ValueError(f"Il broker simulato ha una sola partizione, richiesta {partition.partition}")
+            if partition.offset == OFFSET_END:
+                offset = len(self.broker)
+            elif partition.offset < 0:
+                offset = 0
+            else:
+                offset = min(partition.offset, len(self.broker))
+
+            self._position = self._start_offset = offset
+            self._start_time = time.perf_counter()
+
+    def _published(self, now):
+        """Offset successivo all'ultimo messaggio gia' pubblicato all'istante `now`."""
+        if self.broker.period == 0.0:
+            return len(self.broker)
+        published = self._start_offset + int((now - self._start_time) / self.broker.period) + 1
+        return min(published, len(self.broker))
+
+    def consume(self, num_messages=1, timeout=-1):
+        """Fino a num_messages messaggi gia' pubblicati; attende al massimo `timeout` s il primo (-1 = senza limite)."""
+        if self._closed:
+            raise RuntimeError("Client del broker simulato chiuso")
+        if self._position is None:
+            raise RuntimeError("Nessuna partizione assegnata: chiamare subscribe() o assign()")
+
+        deadline = None if timeout is None or timeout < 0 else time.perf_counter() + timeout
+        now = time.perf_counter()
+
+        while self._published(now) <= self._position:
+            if self._position >= len(self.broker):                      # Fine del log: come un topic inattivo
+                wait = None if deadline is None else deadline - now
+            else:
+                publish_at = self._start_time + (self._position - self._start_offset) * self.broker.period
+                wait = publish_at - now if deadline is None else min(publish_at, deadline) - now
+
+            if deadline is not None and now >= deadline:
+                return []
+            time.sleep(0.1 if wait is None else max(wait, 0.0))
+            now = time.perf_counter()
+
+        end = min(self._published(now), self._position + num_messages)
+        messages = [
+            ReplayMessage(self.broker.topic, 0, offset, self.broker.packets[offset])
+            for offset in range(self._position, end)
+        ]
+
+        publish_start = self._start_time + (self._position - self._start_offset) * self.broker.period
+        self.broker._record_lag([now - (publish_start + i * self.broker.period) for i in range(len(messages))])
+        self._position = end
+        return messages
+
+    def poll(self, timeout=-1):
+        messages = self.consume(1, timeout)
+        return messages[0] if messages else None
+
+    def close(self):
+        self._closed = True
+
+
+class ReplayKafkaConsumer(KafkaConsumer):
+    """KafkaConsumer collegato a un ReplayBroker invece che a ODA/Kafka."""
+
+    def __init__(self, broker, **kwargs):
+        kwargs.setdefault('topic', broker.topic)
+        super().__init__(**kwargs)
+        self.broker = broker
+
+    def connect(self, start_offsets=None):
+        """Collega il consumer al broker simulato (start_offsets come in KafkaConsumer.connect)."""
+        self.consumer = self.broker.client()
+        self._subscribe(start_offsets)
+        speed = "massima velocita'" if self.broker.speedup is None else f"x{self.broker.speedup:g}"
+        print(f" Connesso al broker simulato: {len(self.broker)} messaggi, {speed}")
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Salva i pacchetti del generatore in un file JSONL per il replay")
+    parser.add_argument('output', help="File JSONL di destinazione")
+    parser.add_argument('--rows', type=int, default=None, help="Numero di righe del dataset (default tutte)")
+    parser.add_argument('--sites', type=int, default=1, help="Generatori simulati sullo stesso topic (default 1)")
+    args = parser.parse_args()
+
+    broker = ReplayBroker.from_csv(rows=args.rows, sites=args.sites)
+    broker.save(args.output)
+    print(f" Salvati {len(broker)} pacchetti in {args.output}")
@@ -0,0 +1,162 @@
+"""
+Batteria live disaccoppiata dal loop di controllo.
+
+Il loop EMS scrive SOC e timestamp in un ring buffer in shared memory (SocRing.push, costo O(1) senza
+matplotlib); un processo separato legge solo l'ultimo valore e ridisegna la finestra al massimo
+`max_fps` volte al secondo, scartando gli aggiornamenti intermedi.
+
+In modalita' headless non viene creato ne' il processo ne' la shared memory e push() non fa nulla.
+
+Uso:
+    display = LiveBatteryDisplay(timezone='Europe/Rome', max_fps=5)
+    display.start(initial_soc, initial_timestamp)
+    display.push(soc_pct, timestamp)        # ad ogni step
+    display.close()
+"""
+import multiprocessing as mp
+import time
+from multiprocessing import shared_memory
+
+import numpy as np
+import pandas as pd
+
+
+class SocRing:
+    """
+    Ring buffer in shared memory di coppie (SOC [%], timestamp [s epoch UTC]).
+
+    Layout: contatore delle scritture (int64) seguito da `capacity` righe float64. Lo scrittore aggiorna
+    prima la riga e poi il contatore, quindi il lettore vede sempre righe complete.
+    """
+
+    def __init__(self, capacity=256, name=None):
+        self.capacity = int(capacity)
+        size = 8 + self.capacity * 2 * 8
+
+        if name is None:
+            self._shm = shared_memory.SharedMemory(create=True, size=size)
+            self._owner = True
+        else:
+            self._shm = shared_memory.SharedMemory(name=name)
+            self._owner = False
+
+        self._count = np.ndarray((1,), dtype=np.int64, buffer=self._shm.buf)
+        self._rows = np.ndarray((self.capacity, 2), dtype=np.float64, buffer=self._shm.buf, offset=8)
+        if self._owner:
+            self._count[0] = 0
+
+    @property
+    def name(self):
+        return self._shm.name
+
+    def push(self, soc_pct, timestamp_s):
+        """Scrive un nuovo stato (chiamato dal loop di controllo)."""
+        count = int(self._count[0])
+        row = self._rows[count % self.capacity]
+        row[0] = soc_pct
+        row[1] = timestamp_s
+        self._count[0] = count + 1
+
+    def latest(self):
+        """Restituisce (numero di scritture, SOC, timestamp) dell'ultimo stato; (0, nan, nan) se vuoto."""
+        count = int(self._count[0])
+        if count == 0:
+            return 0, np.nan, np.nan
+        soc_pct, timestamp_s = self._rows[(count - 1) % self.capacity]
+        return count, float(soc_pct), float(timestamp_s)
+
+    def close(self):
+        # Le viste numpy vanno rilasciate prima di chiudere il blocco di memoria
+        self._count = None
+        self._rows = None
+        self._shm.close()
+        if self._owner:
+            self._shm.unlink()
+
+
+def _format_timestamp(timestamp_s, timezone):
+    timestamp = pd.Timestamp(timestamp_s, unit='s', tz='UTC')
+    return str(timestamp.tz_convert(timezone) if timezone else timestamp)
+
+
+def _display_process(ring_name, capacity, max_fps, timezone, stop_event):
+    """Processo di disegno: legge l'ultimo stato dal ring e ridisegna a frequenza limitata."""
+    import matplotlib.pyplot as plt
+    from tools import init_live_battery_display, update_live_battery_display
+
+    ring = SocRing(capacity=capacity, name=ring_name)
+    period = 1.0 / max_fps
+    display = None
+    drawn = 0
+
+    try:
+        while not stop_event.is_set():
+            count, soc_pct, timestamp_s = ring.latest()
+
+            if count != drawn:                          # Solo l'ultimo stato: gli intermedi vengono saltati
+                label = _format_timestamp(timestamp_s, timezone)
+                if display is None:
+                    display = init_live_battery_display(soc_pct, label)
+                else:
+                    update_live_battery_display(display, soc_pct, label)
+                drawn = count
+
+            if display:
+                display['fig'].canvas.start_event_loop(period)      # Mantiene la finestra reattiva fino al prossimo frame
+            else:
+                time.sleep(period)
+    finally:
+        if display:
+            plt.close(display['fig'])
+        ring.close()
+
+
+class LiveBatteryDisplay:
+    """Batteria live in un processo separato, alimentata da un SocRing e ridisegnata al massimo a `max_fps`."""
+
+    def __init__(self, timezone=None, max_fps=5.0, headless=False, capacity=256):
+        if max_fps <= 0:
+            raise ValueError(f"max_fps deve essere positivo, ricevuto {max_fps}")
+
+        self.timezone = timezone
+        self.max_fps = float(max_fps)
+        self.headless = bool(headless)
+        self.capacity = int(capacity)
+
+        self._ring = None
+        self._process = None
+        self._stop_event = None
+
+    def start(self, initial_soc, timestamp):
+        """Crea il ring, pubblica lo stato iniziale e avvia il processo di disegno."""
+        if self.headless or self._process is not None:
+            return
+
+        self._ring = SocRing(capacity=self.capacity)
+        self.push(initial_soc, timestamp)
+
+        self._stop_event = mp.Event()
+        self._process = mp.Process(
+            target=_display_process,
+            args=(self._ring.name, self.capacity, self.max_fps, self.timezone, self._stop_event),
+            daemon=True,
+        )
+        self._process.start()
+
+    def push(self, soc_pct, timestamp):
+        """Pubblica un nuovo stato; non attende il disegno."""
+        if self._ring is None:
+            return
+        self._ring.push(soc_pct, pd.Timestamp(timestamp).timestamp())
+
+    def close(self, timeout=3.0):
+        """Ferma il processo di disegno e libera la shared memory."""
+        if self._process is not None:
+            self._stop_event.set()
+            self._process.join(timeout=timeout)
+            if self._process.is_alive():
+                self._process.terminate()
+            self._process = None
+        if self._ring is not None:
+            self._ring.close()
+            self._ring = None
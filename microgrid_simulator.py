@@ -11,6 +11,8 @@ from src.pymgrid.modules.battery.transition_models import (
     NmcTransitionModel,
 )
 
+from fast_offline import simulate_rule_based
+
 from pandasgui import show
 import yaml
 
@@ -39,6 +41,7 @@ class MicrogridSimulator():
         # Chimica batteria o modello di transizione esplicito
         self.battery_chemistry = battery_chemistry or battery_cfg.get('chemistry') or battery_cfg.get('type') or 'generic'
         self.battery_transition_model = battery_cfg.get('transition_model')
+        self.battery_interpolation = battery_cfg.get('interpolation', 'scipy')
 
         self.nominal_capacity = capacity
         self.max_charge_per_step = power_max * sample_time
@@ -53,6 +56,9 @@ class MicrogridSimulator():
 
         self.present_grid_prices = np.array(grid_cfg['prices'])
 
+        # Storico massimo trattenuto dai moduli online (None = illimitato)
+        self.online_max_history = self.config.get('ems', {}).get('online_max_history')
+
 
     def build_microgrid(self):
 
@@ -60,11 +66,11 @@ class MicrogridSimulator():
         if transition_model is None:
             chemistry_upper = str(self.battery_chemistry).upper()
             if chemistry_upper == 'LFP':
-                transition_model = LfpTransitionModel()
+                transition_model = LfpTransitionModel(interpolation=self.battery_interpolation)
             elif chemistry_upper == 'NMC':
-                transition_model = NmcTransitionModel()
+                transition_model = NmcTransitionModel(interpolation=self.battery_interpolation)
             elif chemistry_upper == 'NCA':
-                transition_model = NcaTransitionModel()
+                transition_model = NcaTransitionModel(interpolation=self.battery_interpolation)
             # Otherwise, leave `transition_model` as None to use the default BatteryTransitionModel
 
         battery = BatteryModule(
@@ -81,12 +87,14 @@ class MicrogridSimulator():
         time_series=self.load_time_series,
         online=self.online,
         initial_time_series_value=0.0,
+        online_max_history=self.online_max_history,
         )
 
         pv_module = RenewableModule(
             time_series=self.pv_time_series,
             online=self.online,
             initial_time_series_value=0.0,
+            online_max_history=self.online_max_history,
         )
 
         grid_module = GridModule(
@@ -95,6 +103,7 @@ class MicrogridSimulator():
                                     time_series=self.grid_time_series,
                                     online=self.online,
                                     initial_time_series_value=self.present_grid_prices,
+                                    online_max_history=self.online_max_history,
                                     normalized_action_bounds=( -self.max_grid_import_power, self.max_grid_import_power ))
         
 
@@ -110,10 +119,17 @@ class MicrogridSimulator():
 
     def get_simulation_log(self, microgrid):
 
-        log = microgrid.log.copy()
+        return self.split_simulation_log(microgrid.log)
+
+
+    def split_simulation_log(self, microgrid_log):
+        """
+        Divide il log completo della microgrid nel DataFrame delle colonne principali e in una copia con colonne piatte.
+        """
+        log = microgrid_log.copy()
         log.columns = ['{}_{}_{}'.format(*col) for col in log.columns]
 
-        microgrid_df = microgrid.log[
+        microgrid_df = microgrid_log[
             [
                 ('load', 0, 'load_met'),
                 ('pv', 0, 'renewable_used'),
@@ -137,6 +153,24 @@ class MicrogridSimulator():
         ]
 
         return microgrid_df, log
+
+
+    def run_fast_offline(self, steps=None, bands=None, allow_night_grid_charge=False):
+        """
+        Simula l'EMS a regole su tutta la traiettoria con il kernel di fast_offline, senza fare step sulla microgrid.
+        Restituisce (microgrid_df, log) come get_simulation_log.
+        """
+        microgrid = self.build_microgrid()
+        microgrid.reset()
+
+        microgrid_log = simulate_rule_based(
+            microgrid,
+            steps=steps,
+            bands=bands,
+            allow_night_grid_charge=allow_night_grid_charge
+        )
+
+        return self.split_simulation_log(microgrid_log)
     
 
     def sum_module_info(self, info_dict, module_name, key):
@@ -0,0 +1,182 @@
+"""
+Sink incrementale su disco per i risultati dell'EMS real-time, con checkpoint e ripresa.
+
+Le righe dei risultati vengono accumulate in memoria e scritte ogni `flush_every` step in un nuovo file
+(chunk) della cartella di output: Parquet se pyarrow e' installato, altrimenti CSV. Ad ogni flush viene
+scritto anche un checkpoint con lo stato della Microgrid (Microgrid.snapshot), il numero di step eseguiti e
+l'ultimo offset Kafka processato per ogni partizione.
+
+Chunk e checkpoint sono scritti su file temporanei e poi rinominati, quindi un crash non lascia file
+parziali. In ripresa (resume=True) i chunk scritti dopo l'ultimo checkpoint vengono rimossi, cosi' gli
+step corrispondenti vengono rieseguiti una sola volta.
+
+Lo snapshot della Microgrid viene preso al momento del flush (stato coerente con le righe scritte), mentre la
+scrittura su disco avviene in un thread dedicato e non blocca il loop di controllo. In ripresa lo snapshot va
+ripristinato in una microgrid costruita con la stessa configurazione.
+
+Uso:
+    sink = ResultsSink('outputs/realtime', flush_every=96, resume=True)
+    microgrid = simulator.build_microgrid()
+    if sink.checkpoint:                                     # Ripresa di una run interrotta
+        microgrid.restore(sink.checkpoint['microgrid'])
+        start_offsets = sink.next_offsets()
+    ...
+    sink.append(row, microgrid, sample)                     # Ad ogni step
+    ...
+    sink.close(microgrid)
+    results_df = sink.read_results()
+"""
+import os
+import pickle
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+import pandas as pd
+
+try:
+    import pyarrow
+except ImportError:
+    pyarrow = None
+
+
+CHECKPOINT_NAME = 'checkpoint.pkl'
+CHUNK_PREFIX = 'results_'
+
+
+def _atomic_write(path, write):
+    """Scrive tramite `write(tmp_path)` su un file temporaneo e lo rinomina in `path`."""
+    tmp_path = path.with_name(path.name + '.tmp')
+    write(tmp_path)
+    os.replace(tmp_path, path)
+
+
+class ResultsSink:
+    """Sink a chunk append-only dei risultati con checkpoint (snapshot) della Microgrid e degli offset Kafka."""
+
+    def __init__(self, directory, flush_every=96, file_format='auto', resume=False):
+        if flush_every < 1:
+            raise ValueError(f"flush_every deve essere >= 1, ricevuto {flush_every}")
+
+        if file_format == 'auto':
+            file_format = 'parquet' if pyarrow is not None else 'csv'
+        if file_format == 'parquet' and pyarrow is None:
+            raise ImportError("pyarrow non installato: pip install pyarrow (oppure file_format='csv')")
+        if file_format not in ('parquet', 'csv'):
+            raise ValueError(f"Formato non supportato: '{file_format}' (usa 'auto', 'parquet' o 'csv')")
+
+        self.directory = Path(directory)
+        self.flush_every = int(flush_every)
+        self.file_format = file_format
+
+        self.steps = 0                  # Step scritti (inclusi quelli ancora in buffer)
+        self.offsets = {}               # Ultimo offset processato per partizione
+        self.checkpoint = None          # Checkpoint caricato in ripresa
+        self._rows = []
+        self._chunks = 0
+        self._writer = ThreadPoolExecutor(max_workers=1)    # Un solo worker: chunk e checkpoint scritti in ordine
+        self._pending = []
+
+        self.directory.mkdir(parents=True, exist_ok=True)
+
+        if resume:
+            self._resume()
+        elif self._chunk_paths() or (self.directory / CHECKPOINT_NAME).exists():
+            raise FileExistsError(f"La cartella {self.directory} contiene gia' risultati: usa resume=True o un'altra cartella.")
+
+    def _chunk_paths(self):
+        return sorted(self.directory.glob(f'{CHUNK_PREFIX}*.*'))
+
+    def _resume(self):
+        """Carica l'ultimo checkpoint e rimuove i chunk scritti dopo di esso."""
+        checkpoint_path = self.directory / CHECKPOINT_NAME
+        if checkpoint_path.exists():
+            with open(checkpoint_path, 'rb') as checkpoint_file:
+                self.checkpoint = pickle.load(checkpoint_file)
+            self.steps = self.checkpoint['steps']
+            self.offsets = dict(self.checkpoint['offsets'])
+            self._chunks = self.checkpoint['chunks']
+
+        for path in self._chunk_paths():
+            if path.suffix == '.tmp' or int(path.stem[len(CHUNK_PREFIX):]) >= self._chunks:
+                path.unlink()
+
+    def next_offsets(self):
+        """Offset da cui riprendere la lettura Kafka: il successivo all'ultimo processato per ogni partizione."""
+        return {partition: offset + 1 for partition, offset in self.offsets.items() if offset >= 0}
+
+    def append(self, row, microgrid=None, sample=None):
+        """Aggiunge la riga di uno step; ogni `flush_every` step scrive un chunk e il checkpoint."""
+        self._rows.append(row)
+        self.steps += 1
+
+        partition = getattr(sample, 'partition', -1)
+        if partition >= 0:
+            self.offsets[partition] = sample.offset
+
+        if len(self._rows) >= self.flush_every:
+            self.flush(microgrid)
+
+    def flush(self, microgrid=None):
+        """Scrive le righe in buffer in un nuovo chunk, seguito dal checkpoint."""
+        self._raise_writer_errors()
+        if not self._rows:
+            return
+
+        rows, self._rows = self._rows, []
+        chunk_path = self.directory / f'{CHUNK_PREFIX}{self._chunks:06d}.{self.file_format}'
+        self._chunks += 1
+
+        # Lo stato va copiato ora: il loop di controllo continua a modificare la microgrid
+        checkpoint = pickle.dumps({
+            'steps': self.steps,
+            'chunks': self._chunks,
+            'offsets': dict(self.offsets),
+            'microgrid': microgrid.snapshot() if microgrid is not None else None,
+        }, protocol=pickle.HIGHEST_PROTOCOL)
+
+        self._pending.append(self._writer.submit(self._write, rows, chunk_path, checkpoint))
+
+    def _write(self, rows, chunk_path, checkpoint):
+        """Scrittura nel thread dedicato: prima il chunk, poi il checkpoint che lo include."""
+        df = pd.DataFrame(rows)
+        if self.file_format == 'parquet':
+            _atomic_write(chunk_path, lambda path: df.to_parquet(path, index=False))
+        else:
+            _atomic_write(chunk_path, lambda path: df.to_csv(path, index=False))
+
+        _atomic_write(self.directory / CHECKPOINT_NAME, lambda path: path.write_bytes(checkpoint))
+
+    def _raise_writer_errors(self):
+        """Propaga eventuali errori di scrittura del thread dedicato."""
+        still_pending = []
+        for future in self._pending:
+            if future.done():
+                future.result()
+            else:
+                still_pending.append(future)
+        self._pending = still_pending
+
+    def close(self, microgrid=None):
+        """Scrive le righe rimaste e attende il completamento delle scritture."""
+        try:
+            self.flush(microgrid)
+            for future in self._pending:
+                future.result()
+            self._pending = []
+        finally:
+            self._writer.shutdown(wait=True)
+
+    def read_results(self):
+        """Concatena tutti i chunk scritti in un unico DataFrame."""
+        paths = self._chunk_paths()
+        if not paths:
+            return pd.DataFrame()
+
+        read = pd.read_parquet if self.file_format == 'parquet' else pd.read_csv
+        results = pd.concat([read(path) for path in paths], ignore_index=True)
+
+        if self.file_format == 'csv' and 'timestamp' in results.columns:
+            # Nel CSV i timestamp sono stringhe con offset (variabile con l'ora legale): riportati a UTC
+            results['timestamp'] = pd.to_datetime(results['timestamp'], utc=True)
+
+        return results
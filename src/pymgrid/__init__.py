@@ -4,7 +4,7 @@ from .version import __version__
 PROJECT_PATH = Path(__file__).parent
 
 from ._deprecated.non_modular_microgrid import NonModularMicrogrid
-from .microgrid import Microgrid
+from .microgrid import Microgrid, BatchedMicrogrid
 from .MicrogridGenerator import MicrogridGenerator
 
 from .utils import add_pymgrid_yaml_representers, dry_run
@@ -13,6 +13,7 @@ from src.pymgrid import envs, modules
 
 __all__ = [
     'add_pymgrid_yaml_representers',
+    'BatchedMicrogrid',
     'dry_run',
     'Microgrid',
     'MicrogridGenerator',
@@ -1,2 +1,4 @@
 from .mpc.mpc import ModelPredictiveControl
+from .mpc.stochastic_mpc import StochasticModelPredictiveControl
+from .mpc.unipi_mpc import UnipiModelPredictiveControl
 from .rbc.rbc import RuleBasedControl
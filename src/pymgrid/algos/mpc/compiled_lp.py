@@ -0,0 +1,153 @@
+import numpy as np
+import scipy.sparse as sp
+
+try:
+    import highspy
+except ImportError:
+    highspy = None
+
+
+class CompiledLinearProgram:
+    """
+    MPC linear program compiled once into a persistent HiGHS model.
+
+    The constraint matrices are passed to HiGHS a single time. At each receding-horizon step only the cost vector
+    and the row bounds (the right-hand sides) change; they are patched in place and the model is re-solved, with the
+    simplex starting from the basis of the previous step. This skips the CVXPY pipeline entirely.
+
+    The program solved is
+
+    .. math::
+        \\min_{p \\geq 0} c^T p \\quad \\text{s.t.} \\quad A p = b, \\; C p \\leq d
+
+    plus, if ``genset_bounds`` is given, binary genset status variables :math:`u` with
+    :math:`p_{min} u_j \\leq p_{genset, j} \\leq p_{max} u_j`.
+
+    Parameters
+    ----------
+    equality_matrix : scipy.sparse matrix
+        Equality constraint matrix :math:`A`.
+    inequality_matrix : scipy.sparse matrix
+        Inequality constraint matrix :math:`C`.
+    genset_bounds : tuple of float or None, default None
+        ``(p_genset_min, p_genset_max)`` if the microgrid has a genset.
+    genset_columns : array-like of int or None, default None
+        Columns of the genset production variables, one per status variable; required if ``genset_bounds`` is
+        given.
+
+    Raises
+    ------
+    ImportError
+        If highspy is not installed.
+
+    """
+    def __init__(self, equality_matrix, inequality_matrix, genset_bounds=None, genset_columns=None):
+        if highspy is None:
+            raise ImportError("The compiled MPC backend requires highspy: pip install highspy")
+
+        equality_matrix, inequality_matrix = sp.csr_matrix(equality_matrix), sp.csr_matrix(inequality_matrix)
+
+        self.n_vars = equality_matrix.shape[1]
+        self.n_equality = equality_matrix.shape[0]
+        self.n_inequality = inequality_matrix.shape[0]
+        self.genset_columns = None if genset_bounds is None else np.asarray(genset_columns, dtype=np.int64)
+        self.n_genset = 0 if genset_bounds is None else len(self.genset_columns)
+
+        matrix = sp.vstack((equality_matrix, inequality_matrix))
+        if genset_bounds is not None:
+            matrix = sp.hstack((matrix, sp.csr_matrix((matrix.shape[0], self.n_genset))))
+            matrix = sp.vstack((matrix, self._genset_rows(*genset_bounds)))
+
+        self._model = self._pass_model(matrix.tocsc())
+
+        self._cost_indices = np.arange(self.n_vars, dtype=np.int32)
+        self._rhs_indices = np.arange(self.n_equality + self.n_inequality, dtype=np.int32)
+        self._row_lower = np.full(self.n_equality + self.n_inequality, -highspy.kHighsInf)
+
+    def _genset_rows(self, p_genset_min, p_genset_max):
+        genset = sp.csr_matrix(
+            (np.ones(self.n_genset), (np.arange(self.n_genset), self.genset_columns)),
+            shape=(self.n_genset, self.n_vars)
+        )
+        status = sp.identity(self.n_genset, format='csr')
+
+        # p_genset_min * u - p <= 0 and p - p_genset_max * u <= 0
+        return sp.vstack((
+            sp.hstack((-genset, p_genset_min * status)),
+            sp.hstack((genset, -p_genset_max * status))
+        ))
+
+    def _pass_model(self, matrix):
+        n_cols, n_rows = self.n_vars + self.n_genset, matrix.shape[0]
+        n_bounded = self.n_equality + self.n_inequality
+
+        lp = highspy.HighsLp()
+        lp.num_col_ = n_cols
+        lp.num_row_ = n_rows
+        lp.col_cost_ = np.zeros(n_cols)
+        lp.col_lower_ = np.zeros(n_cols)
+        lp.col_upper_ = np.concatenate((np.full(self.n_vars, highspy.kHighsInf), np.ones(self.n_genset)))
+        lp.row_lower_ = np.concatenate((np.zeros(self.n_equality), np.full(n_rows - self.n_equality, -highspy.kHighsInf)))
+        lp.row_upper_ = np.concatenate((np.zeros(n_bounded), np.zeros(n_rows - n_bounded)))
+
+        lp.a_matrix_.format_ = highspy.MatrixFormat.kColwise
+        lp.a_matrix_.start_ = matrix.indptr
+        lp.a_matrix_.index_ = matrix.indices
+        lp.a_matrix_.value_ = matrix.data
+
+        if self.n_genset:
+            lp.integrality_ = [highspy.HighsVarType.kContinuous] * self.n_vars + \
+                              [highspy.HighsVarType.kInteger] * self.n_genset
+
+        model = highspy.Highs()
+        model.setOptionValue('output_flag', False)
+        model.passModel(lp)
+        return model
+
+    def solve(self, costs, equality_rhs, inequality_rhs):
+        """
+        Patch the costs and right-hand sides and re-solve.
+
+        Parameters
+        ----------
+        costs : np.ndarray
+            Cost vector :math:`c`.
+        equality_rhs : np.ndarray
+            Equality right-hand side :math:`b`.
+        inequality_rhs : np.ndarray
+            Inequality right-hand side :math:`d`.
+
+        Returns
+        -------
+        p : np.ndarray or None
+            Optimal values of the continuous variables; None if the problem was not solved to optimality.
+        u : np.ndarray or None
+            Genset status at each timestep if the program has a genset, otherwise None.
+
+        """
+        model = self._model
+        model.changeColsCost(self.n_vars, self._cost_indices, np.asarray(costs, dtype=float))
+
+        self._row_lower[:self.n_equality] = equality_rhs
+        row_upper = np.concatenate((equality_rhs, inequality_rhs)).astype(float)
+        model.changeRowsBounds(len(self._rhs_indices), self._rhs_indices, self._row_lower, row_upper)
+
+        model.run()
+        if model.getModelStatus() != highspy.HighsModelStatus.kOptimal:
+            return None, None
+
+        values = np.asarray(model.getSolution().col_value)
+        p = np.maximum(values[:self.n_vars], 0.0)
+        u = (values[self.n_vars:] > 0.5).astype(float) if self.n_genset else None
+        return p, u
+
+    @property
+    def objective_value(self):
+        """
+        Objective value of the last solve.
+
+        Returns
+        -------
+        float
+        """
+        return self._model.getInfo().objective_function_value
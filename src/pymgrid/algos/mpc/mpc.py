@@ -6,7 +6,7 @@ import cvxpy as cp
 import numpy as np
 import pandas as pd
 from warnings import warn
-from scipy.sparse import csr_matrix
+import scipy.sparse as sp
 
 try:
     import mosek
@@ -14,6 +14,7 @@ except ImportError:
     mosek = None
 
 from src.pymgrid.algos.Control import ControlOutput, HorizonOutput
+from src.pymgrid.algos.mpc.compiled_lp import CompiledLinearProgram
 from src.pymgrid.utils.DataGenerator import return_underlying_data
 import logging
 
@@ -85,29 +86,49 @@ class ModelPredictiveControl:
     microgrid : :class:`pymgrid.Microgrid`
         Microgrid on which to run model predictive control.
 
+    solver : str or None, default None
+        CVXPY solver to try first. Used by the ``'cvxpy'`` backend and as a fallback by the ``'highs'`` backend.
+
+    backend : {'cvxpy', 'highs'}, default 'cvxpy'
+        How the problem is solved at each step.
+
+        * ``'cvxpy'``: set the parameters of the CVXPY problem and solve it through CVXPY.
+
+        * ``'highs'``: compile the problem once into a persistent HiGHS model (see :class:`.CompiledLinearProgram`);
+          each step only patches the costs and right-hand sides and warm-starts from the previous basis. Much
+          faster for long runs. Requires highspy. Falls back to CVXPY if a step is not solved to optimality.
+
     """
-    def __init__(self, microgrid, solver=None):
+    def __init__(self, microgrid, solver=None, backend='cvxpy'):
         self.microgrid, self.is_modular, self.microgrid_module_names = self._verify_microgrid(microgrid)
         self.horizon = self._get_horizon()
 
+        self._create_variables()
+
+        parameters = self._parse_microgrid()
+
+        self.problem = self._create_problem(*parameters)
+        self._solver, self._all_solvers = self._solvers(solver, require_mixed_integer=backend != 'highs')
+
+        self.backend = backend
+        self._compiled_problem = self._compile(backend, *parameters[5:7])
+
+    def _create_variables(self, n_scenarios=1):
+        n_steps = n_scenarios * self.horizon
+
         if self.has_genset:
-            self.p_vars = cp.Variable((8*self.horizon,), pos=True)
-            self.u_genset = cp.Variable((self.horizon,), boolean=True)
-            self.costs = cp.Parameter(8 * self.horizon)
-            self.inequality_rhs = cp.Parameter(9 * self.horizon)
+            self.p_vars = cp.Variable((8*n_steps,), pos=True)
+            self.u_genset = cp.Variable((n_steps,), boolean=True)
+            self.costs = cp.Parameter(8 * n_steps)
+            self.inequality_rhs = cp.Parameter(9 * n_steps)
 
         else:
-            self.p_vars = cp.Variable((7*self.horizon,), pos=True)
+            self.p_vars = cp.Variable((7*n_steps,), pos=True)
             self.u_genset = None
-            self.costs = cp.Parameter(7 * self.horizon, nonneg=True)
-            self.inequality_rhs = cp.Parameter(8 * self.horizon)
-
-        self.equality_rhs = cp.Parameter(2 * self.horizon)  # rhs
+            self.costs = cp.Parameter(7 * n_steps, nonneg=True)
+            self.inequality_rhs = cp.Parameter(8 * n_steps)
 
-        parameters = self._parse_microgrid()
-
-        self.problem = self._create_problem(*parameters)
-        self._solver, self._all_solvers = self._solvers(solver)
+        self.equality_rhs = cp.Parameter(2 * n_steps)  # rhs
 
     @property
     def has_genset(self):
@@ -263,79 +284,52 @@ class ModelPredictiveControl:
                 The constrainted optimization problem to be solved at each step of the MPC.
         """
 
-        delta_t = 1
-
-        # Define matrix Y
-        if self.has_genset:
-            Y = np.zeros((self.horizon, self.horizon * 8))
-
-            Y[0, 3] = -1.0 * eta * delta_t/battery_capacity
-            Y[0, 4] = delta_t / (eta * battery_capacity)
-            Y[0, 7] = 1
-
-            gamma = np.zeros(16)
-            gamma[7] = -1
-            gamma[11] = -1.0 * eta * delta_t/battery_capacity
-            gamma[12] = delta_t / (eta * battery_capacity)
-            gamma[15] = 1
+        A, C = self._constraint_matrices_over_horizon(eta, battery_capacity)
+        self._constraint_matrices = A, C
 
-            for j in range(1, self.horizon):
-                start = (j - 1) * 8
-
-                Y[j, start:start + 16] = gamma
-        else:
-            Y = np.zeros((self.horizon, self.horizon * 7))
-            Y[0, 2] = -1.0 * eta * delta_t / battery_capacity
-            Y[0, 3] = delta_t / (eta * battery_capacity)
-            Y[0, 6] = 1
-
-            gamma = np.zeros(14)
-            gamma[6] = -1
-            gamma[9] = -1.0 * eta * delta_t/battery_capacity
-            gamma[10] = delta_t / (eta * battery_capacity)
-            gamma[13] = 1
-
-            for j in range(1, self.horizon):
-                start = (j - 1) * 7
-
-                Y[j, start:start + 14] = gamma
+        constraints = [A @ self.p_vars == self.equality_rhs, C @ self.p_vars <= self.inequality_rhs]
 
-        # done with Y
         if self.has_genset:
-            X = np.zeros((self.horizon, self.horizon * 8))
+            constraints.extend((p_genset_min * self.u_genset <= self.p_vars[:: 8],
+                                self.p_vars[:: 8] <= p_genset_max * self.u_genset))
 
-            alpha = np.ones(8)
-            alpha[2] = -1
-            alpha[3] = -1
-            alpha[5] = -1
-            alpha[7] = 0
+        # Define  objective
+        self.costs.value = self._cost_vector(fuel_cost, cost_battery_cycle, cost_loss_load, cost_co2, genset_co2)
 
-            for j in range(self.horizon):
-                start = j * 8
-                X[j, start:start + 8] = alpha
+        objective = cp.Minimize(self.costs @ self.p_vars)
 
-        else:
+        return cp.Problem(objective, constraints)
 
-            X = np.zeros((self.horizon, self.horizon * 7))
+    def _constraint_matrices_over_horizon(self, eta, battery_capacity):
+        """
+        Sparse constraint matrices of a single trajectory over the horizon.
 
-            alpha = np.ones(7)
-            alpha[1] = -1
-            alpha[2] = -1
-            alpha[4] = -1
-            alpha[6] = 0
+        Returns
+        -------
+        A : scipy.sparse.csr_matrix
+            Equality lhs: energy balance and battery dynamics.
+        C : scipy.sparse.csr_matrix
+            Inequality lhs: bounds on each variable.
+        """
+        delta_t = 1
 
-            for j in range(self.horizon):
-                start = j * 7
-                X[j, start:start + 7] = alpha
+        # Variables at one timestep: [genset], import, export, charge, discharge, curtailment, loss load, soc.
+        # All constraint matrices are block-banded, so they are assembled directly in sparse form from the
+        # single-timestep blocks below; dense assembly grows quadratically with the horizon.
 
-        A = np.concatenate((X, Y))  # lhs
-        A = csr_matrix(A)
+        # Equality constraints: energy balance (X) and battery dynamics (Y).
+        alpha = np.array([1, 1, -1, -1, 1, -1, 1, 0], dtype=float)
 
-        # Define inequality constraints
+        # soc_j - soc_{j-1} - eta * charge_j * delta_t / capacity + discharge_j * delta_t / (eta * capacity) = 0
+        y_block = np.zeros(8)
+        y_block[3] = -1.0 * eta * delta_t / battery_capacity
+        y_block[4] = delta_t / (eta * battery_capacity)
+        y_block[7] = 1
 
-        # Inequality lhs
-        # This is for one timestep
+        soc_block = np.zeros(8)
+        soc_block[7] = -1
 
+        # Inequality lhs, for one timestep
         C_block = np.zeros((9, 8))
         C_block[0, 0] = 1
         C_block[1, 7] = 1
@@ -347,24 +341,24 @@ class ModelPredictiveControl:
         C_block[7, 5] = 1
         C_block[8, 6] = 1
 
-        if not self.has_genset:             # drop the first column if no genset
-            C_block = C_block[1:, 1:]
+        if not self.has_genset:             # drop the genset column (and its bound) if no genset
+            alpha, y_block, soc_block, C_block = alpha[1:], y_block[1:], soc_block[1:], C_block[1:, 1:]
 
-        # For all timesteps
-        block_lists = [[C_block if i == j else np.zeros(C_block.shape) for i in range(self.horizon)] for j in
-                       range(self.horizon)]
-        C = np.block(block_lists)
-        C = csr_matrix(C)
+        identity = sp.identity(self.horizon, format='csr')
+        previous_step = sp.eye(self.horizon, k=-1, format='csr')   # couples each soc to the previous one
 
-        # Inequality rhs
+        X = sp.kron(identity, alpha.reshape(1, -1))
+        Y = sp.kron(identity, y_block.reshape(1, -1)) + sp.kron(previous_step, soc_block.reshape(1, -1))
 
-        constraints = [A @ self.p_vars == self.equality_rhs, C @ self.p_vars <= self.inequality_rhs]
+        A = sp.vstack((X, Y), format='csr')  # lhs
+        C = sp.kron(identity, C_block, format='csr')
 
-        if self.has_genset:
-            constraints.extend((p_genset_min * self.u_genset <= self.p_vars[:: 8],
-                                self.p_vars[:: 8] <= p_genset_max * self.u_genset))
+        return A, C
 
-        # Define  objective
+    def _cost_vector(self, fuel_cost, cost_battery_cycle, cost_loss_load, cost_co2, genset_co2):
+        """
+        Static costs of a single trajectory over the horizon; grid prices are set at each step by _set_parameters.
+        """
         if self.has_genset:
             cost_vector = np.array([fuel_cost + cost_co2 * genset_co2, 0, 0,
                                 cost_battery_cycle, cost_battery_cycle, 0, cost_loss_load, 0])
@@ -372,15 +366,20 @@ class ModelPredictiveControl:
             cost_vector = np.array([0, 0,
                                     cost_battery_cycle, cost_battery_cycle, 0, cost_loss_load, 0])
 
-        costs_vector = np.concatenate([cost_vector] * self.horizon)
-
-        self.costs.value = costs_vector
+        return np.concatenate([cost_vector] * self.horizon)
 
-        objective = cp.Minimize(self.costs @ self.p_vars)
+    def _compile(self, backend, p_genset_min, p_genset_max):
+        if backend == 'cvxpy':
+            return None
+        elif backend == 'highs':
+            genset_bounds = (p_genset_min, p_genset_max) if self.has_genset else None
+            genset_columns = 8 * np.arange(self.u_genset.size) if self.has_genset else None
+            return CompiledLinearProgram(*self._constraint_matrices, genset_bounds=genset_bounds,
+                                         genset_columns=genset_columns)
 
-        return cp.Problem(objective, constraints)
+        raise ValueError(f"Unrecognized backend '{backend}'. Must be one of 'cvxpy', 'highs'.")
 
-    def _solvers(self, solver=None):
+    def _solvers(self, solver=None, require_mixed_integer=True):
         solvers = []
 
         if solver is not None:
@@ -393,7 +392,11 @@ class ModelPredictiveControl:
             solvers.append(cp.GLPK_MI)
 
         if self.problem.is_mixed_integer():
-            if not solvers:
+            if not solvers and not require_mixed_integer:
+                # The compiled backend solves the mixed integer problem itself; cvxpy only picks a default solver
+                # if it ever has to fall back.
+                solvers.append(None)
+            elif not solvers:
                 raise RuntimeError(
                     "If microgrid has a genset, the cvxpy problem becomes mixed integer. Either MOSEK or "
                     "CVXOPT must be installed.\n"
@@ -440,6 +443,20 @@ class ModelPredictiveControl:
         :return:
             None
         """
+        equality_rhs_vals, inequality_rhs_vals = self._right_hand_sides(
+            load_vector, pv_vector, grid_vector, import_price, export_price, e_max, e_min, p_max_charge,
+            p_max_discharge, p_max_import, p_max_export, soc_0, p_genset_max)
+
+        self.equality_rhs.value = equality_rhs_vals
+        self.inequality_rhs.value = inequality_rhs_vals
+
+        self._set_grid_costs(self.costs.value, import_price, export_price, cost_co2, grid_co2)
+
+    def _right_hand_sides(self, load_vector, pv_vector, grid_vector, import_price, export_price,
+                          e_max, e_min, p_max_charge, p_max_discharge, p_max_import, p_max_export, soc_0, p_genset_max):
+        """
+        Right-hand sides b and d of a single trajectory over the horizon. See _set_parameters.
+        """
         vector_dict = dict(load_vector=load_vector,
                            pv_vector=pv_vector,
                            grid_vector=grid_vector,
@@ -454,10 +471,9 @@ class ModelPredictiveControl:
                 raise ValueError(f'Invalid {name} shape {vector.shape}, must have shape ({self.horizon}, ).')
 
         # Set equality rhs
-        equality_rhs_vals = np.zeros(self.equality_rhs.shape)
+        equality_rhs_vals = np.zeros(2 * self.horizon)
         equality_rhs_vals[:self.horizon] = load_vector-pv_vector
         equality_rhs_vals[self.horizon] = soc_0
-        self.equality_rhs.value = equality_rhs_vals
 
         # Set inequality rhs
         if self.has_genset:
@@ -485,18 +501,21 @@ class ModelPredictiveControl:
         if np.isnan(inequality_rhs_vals).any():
             raise RuntimeError('There are still nan values in inequality_rhs_vals, something is wrong')
 
-        self.inequality_rhs.value = inequality_rhs_vals
+        return equality_rhs_vals, inequality_rhs_vals
 
-        # Set costs
+    def _set_grid_costs(self, costs, import_price, export_price, cost_co2, grid_co2):
+        """
+        Set the grid import and export costs of a single trajectory in place.
+        """
         if self.has_genset:
-            self.costs.value[1::8] = import_price.reshape(-1) + grid_co2.reshape(-1) * cost_co2
-            self.costs.value[2::8] = export_price.reshape(-1)
+            costs[1::8] = import_price.reshape(-1) + grid_co2.reshape(-1) * cost_co2
+            costs[2::8] = export_price.reshape(-1)
         else:
-            self.costs.value[0::7] = import_price.reshape(-1) + grid_co2.reshape(-1) * cost_co2
-            self.costs.value[1::7] = export_price.reshape(-1)
+            costs[0::7] = import_price.reshape(-1) + grid_co2.reshape(-1) * cost_co2
+            costs[1::7] = export_price.reshape(-1)
 
-        if np.isnan(self.costs.value).any():
-            raise RuntimeError('There are still nan values in self.costs.value, something is wrong')
+        if np.isnan(costs).any():
+            raise RuntimeError('There are still nan values in costs, something is wrong')
 
     def reset(self):
         """
@@ -797,16 +816,31 @@ class ModelPredictiveControl:
                              e_max, e_min, p_max_charge, p_max_discharge,
                              p_max_import, p_max_export, soc_0, p_genset_max, cost_co2, grid_co2, genset_co2,)
 
-        while True:
-            with self.solver_context() as solver:
-                self.problem.solve(warm_start=True, solver=solver)
-                break
+        if self._compiled_problem is None or not self._solve_compiled():
+            while True:
+                with self.solver_context() as solver:
+                    self.problem.solve(warm_start=True, solver=solver)
+                    break
 
         if self.is_modular:
             return self._extract_modular_control(load_vector, verbose)
         else:
             return self._extract_control_dict(return_steps, pv_vector, load_vector)
 
+    def _solve_compiled(self):
+        p_vars, u_genset = self._compiled_problem.solve(
+            self.costs.value, self.equality_rhs.value, self.inequality_rhs.value)
+
+        if p_vars is None:
+            logger.warning('Compiled MPC problem was not solved to optimality. Falling back to cvxpy.')
+            return False
+
+        self.p_vars.value = p_vars
+        if self.u_genset is not None:
+            self.u_genset.value = u_genset
+
+        return True
+
     @contextmanager
     def solver_context(self):
         try:
@@ -1009,6 +1043,42 @@ class ModelPredictiveControl:
 
         # baseline_linprog_update_status = pd.DataFrame(previous_output['status'].iloc[-1].squeeze()).transpose()
 
+        window = slice(current_step, current_step + self.microgrid.horizon)
+        soc_0 = previous_output['status']['battery_soc'][-1]
+
+        control_dicts = self.solve_sample_step(sample['load'].values[window],
+                                               sample['pv'].values[window],
+                                               sample['grid'].values[window],
+                                               current_step,
+                                               soc_0)
+
+        return HorizonOutput(control_dicts, self.microgrid, current_step)
+
+    def solve_sample_step(self, load_vector, pv_vector, grid_vector, current_step, soc_0):
+        """
+        :meta private:
+
+        Solve one step of MPC on a (nonmodular) sample, given as arrays.
+
+        Parameters
+        ----------
+        load_vector : np.ndarray, shape (horizon,)
+            Sampled load over the horizon starting at ``current_step``.
+        pv_vector : np.ndarray, shape (horizon,)
+            Sampled pv over the horizon.
+        grid_vector : np.ndarray, shape (horizon,)
+            Sampled grid status over the horizon. Ignored if the microgrid has no grid.
+        current_step : int
+            Step of the microgrid's data at which the horizon starts.
+        soc_0 : float
+            State of charge of the battery at the start of the horizon.
+
+        Returns
+        -------
+        control_dicts : list of dict
+            Controls at each step of the horizon.
+
+        """
         horizon = self.microgrid.horizon
 
         if self.microgrid.architecture['grid'] == 0:
@@ -1019,7 +1089,7 @@ class ModelPredictiveControl:
             p_max_import = 0
             p_max_export = 0
         else:
-            temp_grid = sample.loc[current_step:current_step + horizon - 1, 'grid'].values
+            temp_grid = grid_vector
             price_import = self.microgrid._grid_price_import.iloc[current_step:current_step + horizon].values
             price_export = self.microgrid._grid_price_export.iloc[current_step:current_step + horizon].values
             grid_co2 = self.microgrid._grid_co2.iloc[current_step:current_step + horizon].values
@@ -1033,7 +1103,6 @@ class ModelPredictiveControl:
         e_max = self.microgrid.parameters['battery_soc_max'].values[0]
         p_max_charge = self.microgrid.parameters['battery_power_charge'].values[0]
         p_max_discharge = self.microgrid.parameters['battery_power_discharge'].values[0]
-        soc_0 = previous_output['status']['battery_soc'][-1]
 
         cost_co2 = self.microgrid.parameters['cost_co2'].values[0]
 
@@ -1046,14 +1115,14 @@ class ModelPredictiveControl:
             genset_co2 = 0
 
         # Solve one step of MPC
-        control_dicts = self._set_and_solve(sample.loc[current_step:current_step + horizon - 1, 'load'].values,
-                                          sample.loc[current_step:current_step + horizon - 1, 'pv'].values, temp_grid, price_import,
-                                          price_export, e_max, e_min, p_max_charge, p_max_discharge, p_max_import,
-                                          p_max_export, soc_0, p_genset_max, cost_co2, grid_co2, genset_co2, iteration=current_step, return_steps=self.microgrid.horizon)
+        control_dicts = self._set_and_solve(load_vector, pv_vector, temp_grid, price_import,
+                                            price_export, e_max, e_min, p_max_charge, p_max_discharge, p_max_import,
+                                            p_max_export, soc_0, p_genset_max, cost_co2, grid_co2, genset_co2,
+                                            return_steps=horizon)
 
         if any([d is None for d in control_dicts]):
             for j, d in enumerate(control_dicts):
                 if d is None:
                     raise TypeError('control_dict number {} is None'.format(j))
 
-        return HorizonOutput(control_dicts, self.microgrid, current_step)
\ No newline at end of file
+        return control_dicts
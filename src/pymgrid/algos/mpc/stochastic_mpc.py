@@ -0,0 +1,176 @@
+import cvxpy as cp
+import numpy as np
+import scipy.sparse as sp
+
+from src.pymgrid.algos.mpc.mpc import ModelPredictiveControl
+
+
+class StochasticModelPredictiveControl(ModelPredictiveControl):
+    """
+    Scenario-based stochastic model predictive control.
+
+    Instead of solving one deterministic problem per scenario and picking one of the solutions, all scenarios are
+    formulated into a single sparse program: each scenario has its own trajectory over the horizon, the objective is
+    the expected cost over the (equiprobable) scenarios, and non-anticipativity constraints force the first-step
+    decisions -- genset production, grid import and export, battery charge and discharge -- to be identical across
+    scenarios. The first-step decision is therefore the one that is best on average, found with one solver call per
+    step.
+
+    Module parsing, constraints of a single trajectory and backends are shared with
+    :class:`.ModelPredictiveControl`.
+
+    Parameters
+    ----------
+    microgrid : :class:`pymgrid.Microgrid`
+        Microgrid on which to run model predictive control.
+
+    n_scenarios : int
+        Number of scenarios in each step's program.
+
+    solver : str or None, default None
+        See :class:`.ModelPredictiveControl`.
+
+    backend : {'cvxpy', 'highs'}, default 'cvxpy'
+        See :class:`.ModelPredictiveControl`.
+
+    Notes
+    -----
+    The controls returned (and the values of ``p_vars`` read by the control extraction) are those of the first
+    scenario; their first step is shared by all scenarios.
+
+    """
+    def __init__(self, microgrid, n_scenarios, solver=None, backend='cvxpy'):
+        if n_scenarios < 1:
+            raise ValueError(f'n_scenarios must be positive, is {n_scenarios}.')
+
+        self.n_scenarios = n_scenarios
+        super().__init__(microgrid, solver=solver, backend=backend)
+
+    @property
+    def _n_decisions(self):
+        # Decisions at one timestep: [genset], import, export, charge, discharge.
+        return 4 + self.has_genset
+
+    @property
+    def _n_nonanticipativity(self):
+        return (self.n_scenarios - 1) * self._n_decisions
+
+    def _create_variables(self, n_scenarios=None):
+        super()._create_variables(n_scenarios=self.n_scenarios)
+        self.equality_rhs = cp.Parameter(2 * self.n_scenarios * self.horizon + self._n_nonanticipativity)
+
+    def _create_problem(self, eta, battery_capacity, fuel_cost, cost_battery_cycle, cost_loss_load,
+                        p_genset_min, p_genset_max, cost_co2, genset_co2):
+        A, C = self._constraint_matrices_over_horizon(eta, battery_capacity)
+        scenarios = sp.identity(self.n_scenarios, format='csr')
+
+        A = sp.vstack((sp.kron(scenarios, A), self._nonanticipativity_matrix(A.shape[1])), format='csr')
+        C = sp.kron(scenarios, C, format='csr')
+        self._constraint_matrices = A, C
+
+        constraints = [A @ self.p_vars == self.equality_rhs, C @ self.p_vars <= self.inequality_rhs]
+
+        if self.has_genset:
+            constraints.extend((p_genset_min * self.u_genset <= self.p_vars[:: 8],
+                                self.p_vars[:: 8] <= p_genset_max * self.u_genset))
+
+            if self.n_scenarios > 1:
+                constraints.append(self.u_genset[self.horizon:: self.horizon] == self.u_genset[0])
+
+        self._scenario_costs = self._cost_vector(fuel_cost, cost_battery_cycle, cost_loss_load, cost_co2, genset_co2)
+        self.costs.value = self._expected_costs()
+
+        objective = cp.Minimize(self.costs @ self.p_vars)
+
+        return cp.Problem(objective, constraints)
+
+    def _nonanticipativity_matrix(self, n_trajectory_vars):
+        """
+        Rows ``p_s[:n_decisions] - p_0[:n_decisions] = 0`` for each scenario ``s > 0``.
+        """
+        if self.n_scenarios == 1:
+            return sp.csr_matrix((0, n_trajectory_vars))
+
+        first_decisions = sp.hstack((sp.identity(self._n_decisions),
+                                     sp.csr_matrix((self._n_decisions, n_trajectory_vars - self._n_decisions))))
+        others = sp.hstack((-np.ones((self.n_scenarios - 1, 1)), sp.identity(self.n_scenarios - 1)))
+        return sp.kron(others, first_decisions, format='csr')
+
+    def _expected_costs(self):
+        return np.tile(self._scenario_costs, self.n_scenarios) / self.n_scenarios
+
+    def _scenario_matrix(self, name, vector):
+        vector = np.asarray(vector, dtype=float)
+
+        if vector.ndim == 1:
+            vector = vector[None, :]
+
+        try:
+            return np.broadcast_to(vector, (self.n_scenarios, self.horizon))
+        except ValueError:
+            raise ValueError(f'Invalid {name} shape {vector.shape}, '
+                             f'must have shape ({self.n_scenarios}, {self.horizon}) or ({self.horizon}, ).')
+
+    def _set_parameters(self, load_vector, pv_vector, grid_vector, import_price, export_price,
+                        e_max, e_min, p_max_charge, p_max_discharge,
+                        p_max_import, p_max_export, soc_0, p_genset_max, cost_co2, grid_co2, genset_co2,):
+        """
+        Protected, called by _set_and_solve.
+
+        Same as :meth:`.ModelPredictiveControl._set_parameters`, except that ``load_vector``, ``pv_vector`` and
+        ``grid_vector`` may have shape (n_scenarios, horizon), one row per scenario. One-dimensional vectors are shared
+        by all scenarios.
+        """
+        load_matrix = self._scenario_matrix('load_vector', load_vector)
+        pv_matrix = self._scenario_matrix('pv_vector', pv_vector)
+        grid_matrix = self._scenario_matrix('grid_vector', grid_vector)
+
+        right_hand_sides = [
+            self._right_hand_sides(load, pv, grid, import_price, export_price, e_max, e_min, p_max_charge,
+                                   p_max_discharge, p_max_import, p_max_export, soc_0, p_genset_max)
+            for load, pv, grid in zip(load_matrix, pv_matrix, grid_matrix)
+        ]
+
+        self.equality_rhs.value = np.concatenate([equality for equality, _ in right_hand_sides] +
+                                                 [np.zeros(self._n_nonanticipativity)])
+        self.inequality_rhs.value = np.concatenate([inequality for _, inequality in right_hand_sides])
+
+        self._set_grid_costs(self._scenario_costs, import_price, export_price, cost_co2, grid_co2)
+        self.costs.value = self._expected_costs()
+
+    def _extract_control_dict(self, return_steps, pv_vector, load_vector):
+        return super()._extract_control_dict(return_steps,
+                                             self._scenario_matrix('pv_vector', pv_vector)[0],
+                                             self._scenario_matrix('load_vector', load_vector)[0])
+
+    def get_action(self, load_scenarios=None, pv_scenarios=None, grid_scenarios=None, verbose=0):
+        """
+        Compute the first-step controls of the stochastic program at the microgrid's current step.
+
+        Parameters
+        ----------
+        load_scenarios : array-like, shape (n_scenarios, horizon), or None, default None
+            Load over the horizon in each scenario. If None, the load module's forecast is used in every scenario.
+
+        pv_scenarios : array-like, shape (n_scenarios, horizon), or None, default None
+            Renewable production over the horizon in each scenario. If None, uses the renewable module's forecast.
+
+        grid_scenarios : array-like, shape (n_scenarios, horizon), or None, default None
+            Grid status over the horizon in each scenario. If None, uses the grid module's forecast.
+
+        verbose : int, default 0
+            Verbosity.
+
+        Returns
+        -------
+        control : dict
+            Control to pass to :meth:`pymgrid.Microgrid.step` with ``normalized=False``.
+
+        """
+        state_values = list(self._get_modular_state_values())
+
+        for j, scenarios in enumerate((load_scenarios, pv_scenarios, grid_scenarios)):
+            if scenarios is not None:
+                state_values[j] = scenarios
+
+        return self._set_and_solve(*state_values, verbose=verbose > 1)
@@ -0,0 +1,266 @@
+import cvxpy as cp
+import numpy as np
+import scipy.sparse as sp
+from scipy.spatial import ConvexHull
+
+from src.pymgrid.algos.mpc.mpc import ModelPredictiveControl
+from src.pymgrid.modules.battery.transition_models import UnipiChemistryTransitionModel
+
+
+# Nominal cost of the losses. The losses are otherwise free whenever the energy they waste has no value (e.g. when
+# the battery does not empty within the horizon), and the solver may then return losses above the lower bound.
+_LOSS_COST = 1e-6
+
+
+class UnipiModelPredictiveControl(ModelPredictiveControl):
+    """
+    Model predictive control of a microgrid whose battery uses a :class:`.UnipiChemistryTransitionModel`.
+
+    :class:`.ModelPredictiveControl` models the battery with a constant efficiency, while the UNIPI models lose
+    energy in the internal resistance: the loss grows with the power and depends on the state of charge through the
+    open-circuit voltage (Voc) and resistance (R0) tables of the model. Here the battery is modelled as lossless and
+    the losses are separate variables, bounded from below by a piecewise-linear convex approximation of the losses of
+    the transition model. The problem remains a linear program (or mixed integer, with a genset), solved by the same
+    backends.
+
+    The losses are tabulated once, on a grid of state of charge and charged (discharged) energy, for the temperature
+    and state of health of the model at construction. Each table is replaced by its lower convex hull, whose facets
+    become the constraints
+
+    .. math::
+        loss_t \\geq a \\, soc_{t-1} + b \\, p_t + c
+
+    for the charge and discharge ``p_t`` at each step of the horizon. Since the losses reduce the state of charge, the
+    optimal losses lie on the hull.
+
+    Parameters
+    ----------
+    microgrid : :class:`pymgrid.Microgrid`
+        Modular microgrid on which to run model predictive control. Its battery must use a
+        :class:`.UnipiChemistryTransitionModel`.
+
+    n_soc_points : int, default 11
+        Number of state of charge values in the loss tables, between the bounds of the battery.
+
+    n_energy_points : int, default 11
+        Number of energy values in each loss table, between zero and the maximum charge (discharge) per step.
+
+    solver : str or None, default None
+        See :class:`.ModelPredictiveControl`.
+
+    backend : {'cvxpy', 'highs'}, default 'cvxpy'
+        See :class:`.ModelPredictiveControl`.
+
+    Notes
+    -----
+    The losses are those of the model at constant power, with the terminal voltage at its steady-state value, and
+    the tables are indexed by the state of charge of the battery module, which is the state of energy of the model.
+    The planned state of charge thus differs slightly from the simulated one at the start of a charge or discharge
+    and at the ends of the Voc table.
+
+    """
+    def __init__(self, microgrid, n_soc_points=11, n_energy_points=11, solver=None, backend='cvxpy'):
+        if n_soc_points < 2 or n_energy_points < 2:
+            raise ValueError('n_soc_points and n_energy_points must be at least 2.')
+
+        self.n_soc_points = n_soc_points
+        self.n_energy_points = n_energy_points
+        super().__init__(microgrid, solver=solver, backend=backend)
+
+    def _verify_microgrid(self, microgrid):
+        microgrid, is_modular, module_names = super()._verify_microgrid(microgrid)
+
+        if not is_modular:
+            raise TypeError('UnipiModelPredictiveControl requires a modular microgrid.')
+
+        transition_model = microgrid.battery.item().battery_transition_model
+        if not isinstance(transition_model, UnipiChemistryTransitionModel):
+            raise TypeError(f'Battery transition model must be a UnipiChemistryTransitionModel, '
+                            f'is {type(transition_model).__name__}.')
+
+        return microgrid, is_modular, module_names
+
+    @property
+    def _n_trajectory_vars(self):
+        return (7 + self.has_genset) * self.horizon
+
+    @property
+    def _n_loss_rows(self):
+        return (len(self.charge_planes) + len(self.discharge_planes)) * self.horizon
+
+    def _create_variables(self, n_scenarios=1):
+        # The number of loss constraints depends on the tables, which are therefore built first.
+        self.charge_planes, self.discharge_planes = self._loss_planes()
+
+        super()._create_variables(n_scenarios=n_scenarios)
+
+        # Losses while charging and discharging at each step, after the variables of the trajectory.
+        self.p_vars = cp.Variable((self._n_trajectory_vars + 2 * self.horizon,), pos=True)
+        self.costs = cp.Parameter(self.p_vars.size)
+        self.inequality_rhs = cp.Parameter(self.inequality_rhs.size + self._n_loss_rows)
+
+    def _loss_planes(self):
+        """
+        Lower convex hulls of the charge and discharge losses of the transition model.
+
+        Returns
+        -------
+        charge_planes, discharge_planes : np.ndarray, shape (n_planes, 3)
+            Coefficients ``(a, b, c)`` of the planes ``loss >= a * soc + b * energy + c``.
+        """
+        battery = self.microgrid.battery.item()
+        soc = np.linspace(battery.min_soc, battery.max_soc, self.n_soc_points)
+
+        return tuple(
+            _lower_hull_planes(*_steady_state_losses(battery.battery_transition_model, soc,
+                                                     np.linspace(0, max_energy, self.n_energy_points), charge))
+            for max_energy, charge in ((battery.max_charge, True), (battery.max_discharge, False))
+        )
+
+    def _create_problem(self, eta, battery_capacity, fuel_cost, cost_battery_cycle, cost_loss_load,
+                        p_genset_min, p_genset_max, cost_co2, genset_co2):
+        """
+        Protected, automatically called on initialization.
+
+        Same as :meth:`.ModelPredictiveControl._create_problem`, with a lossless battery plus the loss variables and
+        their constraints. ``eta`` is ignored.
+        """
+        A, C = self._constraint_matrices_over_horizon(1.0, battery_capacity)
+        A, C = self._add_losses(A, C, battery_capacity)
+        self._constraint_matrices = A, C
+
+        constraints = [A @ self.p_vars == self.equality_rhs, C @ self.p_vars <= self.inequality_rhs]
+
+        if self.has_genset:
+            genset = self.p_vars[:self._n_trajectory_vars:8]
+            constraints.extend((p_genset_min * self.u_genset <= genset, genset <= p_genset_max * self.u_genset))
+
+        self.costs.value = np.concatenate((
+            self._cost_vector(fuel_cost, cost_battery_cycle, cost_loss_load, cost_co2, genset_co2),
+            np.full(2 * self.horizon, _LOSS_COST)
+        ))
+
+        objective = cp.Minimize(self.costs @ self.p_vars)
+
+        return cp.Problem(objective, constraints)
+
+    def _add_losses(self, A, C, battery_capacity):
+        """
+        Add the loss columns to the battery dynamics and the loss constraints to the inequalities.
+        """
+        width = 7 + self.has_genset
+        charge, discharge, soc = width - 5, width - 4, width - 1
+
+        identity = sp.identity(self.horizon, format='csr')
+        previous_step = sp.eye(self.horizon, k=-1, format='csr')
+
+        # soc_j - soc_{j-1} - (charge_j - discharge_j - loss_charge_j - loss_discharge_j) / capacity = 0
+        dynamics = sp.hstack((identity, identity)) / battery_capacity
+        A = sp.hstack((A, sp.vstack((sp.csr_matrix((self.horizon, 2 * self.horizon)), dynamics))), format='csr')
+
+        # a * soc_{j-1} + b * energy_j - loss_j <= -c; soc_{-1} is soc_0, moved to the rhs by _loss_rhs.
+        loss_rows = []
+        for planes, column, position in ((self.charge_planes, charge, 0), (self.discharge_planes, discharge, 1)):
+            n_rows = len(planes) * self.horizon
+            current_block = np.zeros((len(planes), width))
+            current_block[:, column] = planes[:, 1]
+
+            previous_block = np.zeros((len(planes), width))
+            previous_block[:, soc] = planes[:, 0]
+
+            losses = [sp.csr_matrix((n_rows, self.horizon))] * 2
+            losses[position] = sp.kron(identity, -np.ones((len(planes), 1)))
+
+            loss_rows.append(sp.hstack((
+                sp.kron(identity, current_block) + sp.kron(previous_step, previous_block),
+                *losses
+            )))
+
+        C = sp.vstack((sp.hstack((C, sp.csr_matrix((C.shape[0], 2 * self.horizon)))), *loss_rows), format='csr')
+
+        return A, C
+
+    def _loss_rhs(self, soc_0):
+        rhs = []
+        for planes in (self.charge_planes, self.discharge_planes):
+            plane_rhs = np.tile(-planes[:, 2], self.horizon)
+            plane_rhs[:len(planes)] -= planes[:, 0] * soc_0
+            rhs.append(plane_rhs)
+
+        return np.concatenate(rhs)
+
+    def _set_parameters(self, load_vector, pv_vector, grid_vector, import_price, export_price,
+                        e_max, e_min, p_max_charge, p_max_discharge,
+                        p_max_import, p_max_export, soc_0, p_genset_max, cost_co2, grid_co2, genset_co2,):
+        """
+        Protected, called by _set_and_solve.
+
+        Same as :meth:`.ModelPredictiveControl._set_parameters`, plus the right-hand sides of the loss constraints,
+        which depend on ``soc_0``.
+        """
+        equality_rhs_vals, inequality_rhs_vals = self._right_hand_sides(
+            load_vector, pv_vector, grid_vector, import_price, export_price, e_max, e_min, p_max_charge,
+            p_max_discharge, p_max_import, p_max_export, soc_0, p_genset_max)
+
+        self.equality_rhs.value = equality_rhs_vals
+        self.inequality_rhs.value = np.concatenate((inequality_rhs_vals, self._loss_rhs(soc_0)))
+
+        self._set_grid_costs(self.costs.value[:self._n_trajectory_vars], import_price, export_price,
+                             cost_co2, grid_co2)
+
+
+def _steady_state_losses(transition_model, soc, energy, charge):
+    """
+    Losses of a UNIPI transition model over one step at constant external energy, on a grid of soc and energy.
+
+    At constant power ``P`` the terminal voltage ``v`` solves ``v = Voc -/+ R0 * P / v``, and the internal energy
+    change is the external one times ``Voc / v``, as in :meth:`.UnipiChemistryTransitionModel.transition`. Beyond the
+    maximum discharge power of the cell, ``v`` is held at ``Voc / 2``.
+
+    Returns
+    -------
+    soc, energy, loss : np.ndarray, shape (len(soc), len(energy))
+    """
+    delta_t = max(transition_model.delta_t_hours, 1e-9)
+    voc, r0 = np.array([transition_model._interp_voc_r0(value, transition_model.temperature_c, transition_model.soh)
+                        for value in soc]).T
+
+    soc, energy = np.meshgrid(soc, energy, indexing='ij')
+    voc, r0 = voc[:, None], r0[:, None]
+    power = 1000.0 * energy / delta_t   # [W]
+
+    if charge:
+        voltage = (voc + np.sqrt(voc ** 2 + 4 * r0 * power)) / 2
+        loss = energy * (1 - voc / voltage)
+    else:
+        voltage = (voc + np.sqrt(np.maximum(voc ** 2 - 4 * r0 * power, 0.0))) / 2
+        loss = energy * (voc / voltage - 1)
+
+    return soc, energy, loss
+
+
+def _lower_hull_planes(soc, energy, loss):
+    """
+    Facets of the lower convex hull of the points ``(soc, energy, loss)``.
+
+    Returns
+    -------
+    planes : np.ndarray, shape (n_planes, 3)
+        Coefficients ``(a, b, c)`` with ``loss >= a * soc + b * energy + c`` on the hull.
+    """
+    points = np.column_stack((soc.ravel(), energy.ravel(), loss.ravel()))
+
+    if np.ptp(points[:, 2]) < 1e-12 or np.ptp(points[:, 1]) == 0:
+        # Lossless battery (R0 = 0) or no energy range: the hull is flat.
+        return np.array([[0.0, 0.0, points[:, 2].min()]])
+
+    scale = np.ptp(points, axis=0)
+    scale[scale == 0] = 1.0
+
+    equations = ConvexHull(points / scale).equations
+    equations = equations[equations[:, 2] < -1e-9]
+
+    normals = equations[:, :3] / scale
+    planes = -np.column_stack((normals[:, 0], normals[:, 1], equations[:, 3])) / normals[:, 2:]
+
+    return np.unique(planes.round(12), axis=0)
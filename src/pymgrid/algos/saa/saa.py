@@ -2,9 +2,11 @@ import time
 
 import numpy as np
 import pandas as pd
-from src.pymgrid.algos.Control import ControlOutput
+from src.pymgrid.algos.Control import ControlOutput, HorizonOutput
 from src.pymgrid.utils.DataGenerator import SampleGenerator
 from src.pymgrid.algos import ModelPredictiveControl
+from src.pymgrid.algos.mpc.stochastic_mpc import StochasticModelPredictiveControl
+from src.pymgrid.algos.saa.scenario_pool import ScenarioPool, SAMPLE_COLUMNS
 
 
 class SampleAverageApproximation(SampleGenerator):
@@ -17,6 +19,11 @@ class SampleAverageApproximation(SampleGenerator):
             the underlying microgrid
         control_duration: int
             number of iterations to learn over
+        n_workers: int or None, default None
+            number of processes solving the samples at each step. None uses the number of CPUs; 0 or 1 solves
+            in-process. See ScenarioPool.
+        backend: str, default 'cvxpy'
+            backend of the MPC models, 'cvxpy' or 'highs'. See ModelPredictiveControl.
 
     Attributes:
 
@@ -38,7 +45,7 @@ class SampleAverageApproximation(SampleGenerator):
             list of samples created from sampling from distributions defined in forecasts.
                 See sample_from_forecasts for details. None if sample_from_forecasts hasn't been called
     """
-    def __init__(self, microgrid, control_duration=8760, **forecast_args):
+    def __init__(self, microgrid, control_duration=8760, n_workers=None, backend='cvxpy', **forecast_args):
         if control_duration > 8760:
             raise ValueError('control_duration must be less than 8760')
 
@@ -47,9 +54,12 @@ class SampleAverageApproximation(SampleGenerator):
 
         super().__init__(microgrid, **forecast_args)
         self.control_duration = control_duration
-        self.mpc = ModelPredictiveControl(self.microgrid)
+        self.n_workers = n_workers
+        self.backend = backend
+        self.mpc = ModelPredictiveControl(self.microgrid, backend=backend)
 
-    def run(self, n_samples=10, forecast_steps=None, optimal_percentile=0.5, use_previous_samples=True, verbose=False, **kwargs):
+    def run(self, n_samples=10, forecast_steps=None, optimal_percentile=0.5, use_previous_samples=True, verbose=False,
+            seed=None, stochastic=False, **kwargs):
         """
         Runs MPC over a number of samples for to average out for SAA
         :param n_samples: int, default 25
@@ -60,19 +70,28 @@ class SampleAverageApproximation(SampleGenerator):
             whether to use previous previous stored in self.samples if they are available
         :param verbose: bool, default False
             verbosity
+        :param seed: int or None, default None
+            seed used to generate the samples. Each sample gets its own seed derived from it, so the samples
+            (and therefore the outputs) are reproducible for any number of workers.
+        :param stochastic: bool, default False
+            whether to solve all samples as one stochastic program at each step (see run_stochastic_on_group)
+            instead of one MPC per sample and picking the output at optimal_percentile.
         :return:
             outputs, list of ControlOutput
                 list of ControlOutputs for each sample. See ControlOutput or run_mpc_on_sample for details.
         """
         if self.samples is None or not use_previous_samples:
-            self.samples = self.sample_from_forecasts(n_samples=n_samples, **kwargs)
+            self.samples = self.sample_from_forecasts(n_samples=n_samples, seed=seed, **kwargs)
 
         outputs = []
 
         t0 = time.time()
 
-        output = self.run_mpc_on_group(self.samples, forecast_steps=forecast_steps,
-                                        optimal_percentile=optimal_percentile, verbose=verbose)
+        if stochastic:
+            output = self.run_stochastic_on_group(self.samples, forecast_steps=forecast_steps, verbose=verbose)
+        else:
+            output = self.run_mpc_on_group(self.samples, forecast_steps=forecast_steps,
+                                            optimal_percentile=optimal_percentile, verbose=verbose)
 
         if verbose:
             print('Running time: {}'.format(round(time.time()-t0)))
@@ -110,7 +129,14 @@ class SampleAverageApproximation(SampleGenerator):
         return partition[partition_val]
 
     def run_mpc_on_group(self, samples, forecast_steps=None, optimal_percentile=0.5, verbose=False):
-        columns_needed = ('pv', 'load', 'grid')
+        columns_needed = SAMPLE_COLUMNS
+
+        for sample in samples:
+            if not isinstance(sample, pd.DataFrame):
+                raise TypeError('samples must be pd.DataFrame')
+            if not all([needed in sample.columns.values for needed in columns_needed]):
+                raise KeyError('samples must contain columns {}, currently contains {}'.format(
+                    columns_needed, sample.columns.values))
 
         output = ControlOutput(alg_name='saa', empty=True, microgrid=self.microgrid)
 
@@ -120,32 +146,82 @@ class SampleAverageApproximation(SampleGenerator):
         elif forecast_steps>T-self.microgrid.horizon:
             raise ValueError('forecast steps must be less than length of samples minus horizon')
 
-        for j in range(forecast_steps):
-            if verbose:
-                print('iter {}'.format(j))
+        actual_data = self.underlying_data[list(columns_needed)].to_numpy(dtype=np.float64)
 
-            horizon_outputs = []
+        with ScenarioPool(self.microgrid, samples, n_workers=self.n_workers, backend=self.backend) as pool:
+            for j in range(forecast_steps):
+                if verbose:
+                    print('iter {}'.format(j))
 
-            for sample in samples:
-                if not isinstance(sample, pd.DataFrame):
-                    raise TypeError('samples must be pd.DataFrame')
-                if not all([needed in sample.columns.values for needed in columns_needed]):
-                    raise KeyError('samples must contain columns {}, currently contains {}'.format(
-                        columns_needed, sample.columns.values))
+                pool.set_actual(j, actual_data[j])  # overwrite with actual data
 
-                sample.iloc[j] = self.underlying_data.iloc[j]  # overwrite with actual data
+                soc_0 = output['status']['battery_soc'][-1]
+                horizon_outputs = [HorizonOutput(control_dicts, self.microgrid, j)
+                                   for control_dicts in pool.solve(j, soc_0)]
 
-                horizon_output = self.mpc.mpc_single_step(sample, output, j)
+                optimal_output = self.determine_optimal_actions(outputs=horizon_outputs, percentile=optimal_percentile)
+                output.append(optimal_output, actual_load=self.underlying_data.loc[j,'load'],
+                              actual_pv=self.underlying_data.loc[j,'pv'],
+                              actual_grid=self.underlying_data.loc[j,'grid'])
+
+        for sample in samples:
+            sample.loc[sample.index[:forecast_steps], list(columns_needed)] = actual_data[:forecast_steps]
 
-                horizon_outputs.append(horizon_output)
+        return output
 
-            # return horizon_outputs
+    def run_stochastic_on_group(self, samples, forecast_steps=None, verbose=False):
+        """
+        Runs stochastic MPC with the samples as scenarios: at each step, all samples are solved as one program with
+        identical first-step decisions (see StochasticModelPredictiveControl), with one solver call per step.
 
-            optimal_output = self.determine_optimal_actions(outputs=horizon_outputs, percentile=optimal_percentile)
-            output.append(optimal_output, actual_load=self.underlying_data.loc[j,'load'],
+        :param samples: list of pd.DataFrame
+            samples with columns 'pv', 'load' and 'grid'
+        :param forecast_steps: int or None, default None
+            number of steps to run. If None, uses the length of the samples minus the horizon
+        :param verbose: bool, default False
+            verbosity
+        :return:
+            output, ControlOutput
+        """
+        columns_needed = SAMPLE_COLUMNS
+
+        for sample in samples:
+            if not isinstance(sample, pd.DataFrame):
+                raise TypeError('samples must be pd.DataFrame')
+            if not all([needed in sample.columns.values for needed in columns_needed]):
+                raise KeyError('samples must contain columns {}, currently contains {}'.format(
+                    columns_needed, sample.columns.values))
+
+        output = ControlOutput(alg_name='saa', empty=True, microgrid=self.microgrid)
+
+        T = min([len(sample) for sample in samples])
+        if forecast_steps is None:
+            forecast_steps = T-self.microgrid.horizon
+        elif forecast_steps>T-self.microgrid.horizon:
+            raise ValueError('forecast steps must be less than length of samples minus horizon')
+
+        mpc = StochasticModelPredictiveControl(self.microgrid, n_scenarios=len(samples), backend=self.backend)
+
+        actual_data = self.underlying_data[list(columns_needed)].to_numpy(dtype=np.float64)
+        scenarios = np.stack([sample[list(columns_needed)].to_numpy(dtype=np.float64)[:T] for sample in samples])
+
+        for j in range(forecast_steps):
+            if verbose:
+                print('iter {}'.format(j))
+
+            scenarios[:, j] = actual_data[j]  # overwrite with actual data
+
+            pv, load, grid = scenarios[:, j:j + self.microgrid.horizon].transpose(2, 0, 1)
+            control_dicts = mpc.solve_sample_step(load, pv, grid, j, output['status']['battery_soc'][-1])
+
+            output.append(HorizonOutput(control_dicts, self.microgrid, j),
+                          actual_load=self.underlying_data.loc[j,'load'],
                           actual_pv=self.underlying_data.loc[j,'pv'],
                           actual_grid=self.underlying_data.loc[j,'grid'])
 
+        for sample in samples:
+            sample.loc[sample.index[:forecast_steps], list(columns_needed)] = actual_data[:forecast_steps]
+
         return output
 
     def run_deterministic_on_forecast(self, forecast_steps=None, verbose=False):
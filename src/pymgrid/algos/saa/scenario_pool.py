@@ -0,0 +1,225 @@
+import multiprocessing as mp
+import os
+from multiprocessing import shared_memory
+
+import numpy as np
+
+from src.pymgrid.algos.mpc.mpc import ModelPredictiveControl
+
+
+SAMPLE_COLUMNS = ('pv', 'load', 'grid')
+
+
+class _ScenarioSolver:
+    """
+    MPC models for a fixed subset of the samples, reading the samples from shared memory.
+
+    One model is kept per sample, so each model is only ever warm-started from the previous step of its own sample.
+    """
+    def __init__(self, microgrid, backend, indices, memory_name, shape):
+        self._memory = shared_memory.SharedMemory(name=memory_name)
+        self.samples = np.ndarray(shape, dtype=np.float64, buffer=self._memory.buf)
+        self.indices = indices
+        self.horizon = microgrid.horizon
+        self.mpcs = [ModelPredictiveControl(microgrid, backend=backend) for _ in indices]
+
+    def solve(self, current_step, soc_0):
+        window = slice(current_step, current_step + self.horizon)
+        control_dicts = []
+
+        for index, mpc in zip(self.indices, self.mpcs):
+            pv_vector, load_vector, grid_vector = self.samples[index, window].T
+            control_dicts.append(mpc.solve_sample_step(load_vector, pv_vector, grid_vector, current_step, soc_0))
+
+        return control_dicts
+
+    def close(self):
+        self.samples = None
+        self._memory.close()
+
+
+def _serve(connection, *solver_args):
+    try:
+        solver = _ScenarioSolver(*solver_args)
+    except Exception as e:
+        connection.send(e)
+        connection.close()
+        return
+
+    connection.send(None)
+
+    try:
+        while True:
+            message = connection.recv()
+            if message is None:
+                break
+
+            try:
+                connection.send(solver.solve(*message))
+            except Exception as e:
+                connection.send(e)
+    finally:
+        solver.close()
+        connection.close()
+
+
+class ScenarioPool:
+    """
+    Persistent pool of processes solving one step of MPC on every sample of a Sample Average Approximation.
+
+    The samples are copied once into shared memory; at each step only the step index and the initial state of charge
+    are sent to the workers, which return the controls over the horizon of each of their samples.
+
+    Each sample is assigned to a fixed worker, which keeps one :class:`.ModelPredictiveControl` per sample for the
+    whole run. The controls are therefore identical for any number of workers, including solving in-process.
+
+    Parameters
+    ----------
+    microgrid : :class:`pymgrid._deprecated.non_modular_microgrid.NonModularMicrogrid`
+        Microgrid on which to run MPC.
+
+    samples : list of pd.DataFrame
+        Samples, with columns 'pv', 'load' and 'grid'. Truncated to the length of the shortest sample.
+
+    n_workers : int or None, default None
+        Number of worker processes. If None, uses the number of CPUs, up to one per sample.
+        If 0 or 1, the samples are solved in the calling process.
+
+    backend : {'cvxpy', 'highs'}, default 'cvxpy'
+        Backend of each :class:`.ModelPredictiveControl`.
+
+    Examples
+    --------
+    >>> with ScenarioPool(microgrid, samples, n_workers=4, backend='highs') as pool:
+    >>>     for step in range(forecast_steps):
+    >>>         pool.set_actual(step, actual_data[step])
+    >>>         control_dicts = pool.solve(step, soc_0)
+
+    """
+    def __init__(self, microgrid, samples, n_workers=None, backend='cvxpy'):
+        length = min(len(sample) for sample in samples)
+        array = np.stack([sample[list(SAMPLE_COLUMNS)].to_numpy(dtype=np.float64)[:length] for sample in samples])
+
+        if n_workers is None:
+            n_workers = os.cpu_count() or 1
+
+        self.n_workers = max(min(n_workers, len(samples)), 1)
+
+        self._memory = shared_memory.SharedMemory(create=True, size=array.nbytes)
+        self.samples = np.ndarray(array.shape, dtype=np.float64, buffer=self._memory.buf)
+        self.samples[:] = array
+
+        self._local = None
+        self._workers = []
+
+        try:
+            self._start(microgrid, backend)
+        except Exception:
+            self.close()
+            raise
+
+    def _start(self, microgrid, backend):
+        all_indices = np.array_split(np.arange(len(self.samples)), self.n_workers)
+
+        if self.n_workers == 1:
+            self._local = _ScenarioSolver(microgrid, backend, all_indices[0], self._memory.name, self.samples.shape)
+            return
+
+        for indices in all_indices:
+            connection, worker_connection = mp.Pipe()
+            process = mp.Process(target=_serve,
+                                 args=(worker_connection, microgrid, backend, indices, self._memory.name,
+                                       self.samples.shape),
+                                 daemon=True)
+            process.start()
+            worker_connection.close()
+            self._workers.append((process, connection))
+
+        for _, connection in self._workers:
+            self._receive(connection)
+
+    @staticmethod
+    def _receive(connection):
+        result = connection.recv()
+        if isinstance(result, Exception):
+            raise result
+        return result
+
+    def set_actual(self, current_step, values):
+        """
+        Overwrite one step of every sample with the actual data.
+
+        Parameters
+        ----------
+        current_step : int
+            Step to overwrite.
+
+        values : array-like, shape (3,)
+            Actual pv, load and grid values at ``current_step``.
+
+        """
+        self.samples[:, current_step] = values
+
+    def solve(self, current_step, soc_0):
+        """
+        Solve one step of MPC on every sample.
+
+        Parameters
+        ----------
+        current_step : int
+            Step at which the horizon starts.
+
+        soc_0 : float
+            State of charge of the battery at the start of the horizon.
+
+        Returns
+        -------
+        control_dicts : list of list of dict
+            Controls over the horizon of each sample, in the order of the samples.
+
+        """
+        if self._local is not None:
+            return self._local.solve(current_step, soc_0)
+
+        for _, connection in self._workers:
+            connection.send((current_step, soc_0))
+
+        control_dicts = []
+        for _, connection in self._workers:
+            control_dicts.extend(self._receive(connection))
+
+        return control_dicts
+
+    def close(self):
+        """
+        Stop the workers and release the shared memory.
+        """
+        for process, connection in self._workers:
+            try:
+                connection.send(None)
+            except (BrokenPipeError, OSError):
+                pass
+            connection.close()
+
+        for process, _ in self._workers:
+            process.join(timeout=5)
+            if process.is_alive():
+                process.terminate()
+
+        self._workers = []
+
+        if self._local is not None:
+            self._local.close()
+            self._local = None
+
+        if self._memory is not None:
+            self.samples = None
+            self._memory.close()
+            self._memory.unlink()
+            self._memory = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
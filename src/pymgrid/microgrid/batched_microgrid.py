@@ -0,0 +1,702 @@
+import numpy as np
+import pandas as pd
+
+from src.pymgrid.modules import BatteryModule, GridModule, LoadModule, RenewableModule, UnbalancedEnergyModule
+from src.pymgrid.modules.battery.transition_models import BatteryTransitionModel
+
+
+class BatchedMicrogrid:
+    """
+    Vectorized simulation of many microgrids that share the same module layout.
+
+    Every module of the wrapped microgrids is stored as a set of NumPy arrays with one entry per instance (battery
+    charge, limits, prices, time series, ...), and :meth:`.step` advances all instances with a single vectorized
+    call per module. The energy balancing semantics are the ones of :meth:`.Microgrid.step`: fixed modules are
+    stepped first, then controllable modules with the passed control, then flex modules absorb any excess or
+    provide any shortfall in the order in which they appear in the microgrid.
+
+    Parameters
+    ----------
+    microgrids : list of :class:`.Microgrid`
+        Microgrids to batch. All microgrids must contain the same module names, module counts and module classes,
+        and must share their ``initial_step``, ``final_step`` and current step. Parameters (capacities, limits,
+        efficiencies, costs) and time series may differ between instances.
+
+    Notes
+    -----
+    Supported modules are :class:`.LoadModule`, :class:`.RenewableModule`, :class:`.GridModule` (controllable or
+    flex), :class:`.UnbalancedEnergyModule` and :class:`.BatteryModule` with the default
+    :class:`.BatteryTransitionModel`. Forecasters, reward shaping functions and trajectory functions are not
+    supported. The passed microgrids are only read during construction; the batch holds its own state.
+
+    Examples
+    --------
+    >>> microgrids = [Microgrid.from_scenario(0) for _ in range(1000)]
+    >>> batch = BatchedMicrogrid(microgrids)
+    >>> batch.reset()
+    >>> obs, reward, done, info = batch.step({'battery': np.zeros(len(batch))}, normalized=False)
+    >>> reward.shape
+    (1000,)
+    >>> batch.get_log(0)  # Same columns as microgrids[0].get_log() would have.
+
+    """
+
+    def __init__(self, microgrids):
+        microgrids = list(microgrids)
+        if not microgrids:
+            raise ValueError('microgrids must contain at least one microgrid.')
+
+        self._check_microgrids(microgrids)
+
+        self._n_instances = len(microgrids)
+        self._initial_step = microgrids[0].initial_step
+        self._final_step = microgrids[0].final_step
+        self._current_step = microgrids[0].current_step
+
+        n_log_steps = self._final_step - self._initial_step if np.isfinite(self._final_step) else 0
+
+        self._modules = {}
+        for name, _ in microgrids[0].modules.iterdict():
+            module_lists = [microgrid.modules[name] for microgrid in microgrids]
+            self._modules[name] = [
+                _get_batched_module(name, [module_list[j] for module_list in module_lists], n_log_steps)
+                for j in range(len(module_lists[0]))
+            ]
+
+        self._balance_logger = _BatchedLog(self._n_instances, n_log_steps)
+
+    @staticmethod
+    def _check_microgrids(microgrids):
+        reference = microgrids[0]
+        layout = [(name, [type(module) for module in modules]) for name, modules in reference.modules.iterdict()]
+
+        for j, microgrid in enumerate(microgrids):
+            if microgrid.reward_shaping_func is not None or microgrid.trajectory_func is not None:
+                raise ValueError(f'Microgrid {j} defines a reward_shaping_func or trajectory_func; '
+                                 f'these are not supported by {BatchedMicrogrid.__name__}.')
+
+            other_layout = [(name, [type(module) for module in modules]) for name, modules in microgrid.modules.iterdict()]
+            if other_layout != layout:
+                raise ValueError(f'Microgrid {j} has module layout {other_layout}, expected {layout}.')
+
+            steps = (microgrid.initial_step, microgrid.final_step, microgrid.current_step)
+            reference_steps = (reference.initial_step, reference.final_step, reference.current_step)
+            if steps != reference_steps:
+                raise ValueError(f'Microgrid {j} has (initial_step, final_step, current_step)={steps}, '
+                                 f'expected {reference_steps}.')
+
+    def reset(self):
+        """
+        Reset all instances to the initial step and flush the logs.
+
+        As with :meth:`.Microgrid.reset`, module states such as battery charge are not reset.
+
+        Returns
+        -------
+        dict[str, list[np.ndarray]]
+            Normalized observations of each module, with shape ``(n_instances, obs_dim)``.
+        """
+        self._current_step = self._initial_step
+        for module in self._iter_modules():
+            module.reset()
+
+        self._balance_logger.flush()
+        return self._observations()
+
+    def step(self, control, normalized=True):
+        """
+        Run all microgrid instances for a single step.
+
+        Parameters
+        ----------
+        control : dict[str, array-like]
+            Actions to pass to each controllable module. Values are lists containing one array of shape
+            ``(n_instances, )`` per module with that name, mirroring :meth:`.Microgrid.step`. For names with a single
+            module, the array may be passed directly. Scalars are broadcast to all instances.
+        normalized : bool, default True
+            Whether ``control`` is a normalized value or not.
+
+        Returns
+        -------
+        observation : dict[str, list[np.ndarray]]
+            Normalized observations of each module after the step, each with shape ``(n_instances, obs_dim)``.
+        reward : np.ndarray, shape (n_instances, )
+            Reward of each instance.
+        done : bool
+            Whether the microgrids terminate.
+        info : dict[str, list[dict[str, np.ndarray]]]
+            Energy provided and absorbed by each module, as well as additional module information.
+
+        """
+        control_copy = dict(control)
+        current_step = self._current_step
+        n = self._n_instances
+
+        provided, absorbed, reward = np.zeros(n), np.zeros(n), np.zeros(n)
+        info = {}
+        done = False
+
+        def _step_module(module, action, _normalized):
+            nonlocal provided, absorbed, reward, done
+            module_provided, module_absorbed, module_reward, module_info, module_done = module.step(
+                action, current_step, normalized=_normalized
+            )
+            provided = provided + module_provided
+            absorbed = absorbed + module_absorbed
+            reward = reward + module_reward
+            done = done or module_done
+            info.setdefault(module.name, []).append(module_info)
+
+        zeros = np.zeros(n)
+
+        for module in self._iter_modules('fixed'):
+            _step_module(module, zeros, False)
+
+        fixed_provided, fixed_absorbed = provided, absorbed
+
+        for name, modules in self._iter_named_modules('controllable'):
+            try:
+                module_controls = control_copy.pop(name)
+            except KeyError:
+                raise ValueError(f'Control for module "{name}" not found. Available controls:\n\t{control.keys()}')
+
+            for module, module_control in zip(modules, self._split_control(name, module_controls, len(modules))):
+                _step_module(module, module_control, normalized)
+
+        controllable_provided, controllable_absorbed = provided, absorbed
+
+        if len(control_copy) > 0:
+            from warnings import warn
+            warn(f'\nIgnoring the following keys in passed control:\n {list(control_copy.keys())}')
+
+        difference = controllable_provided - controllable_absorbed
+        excess = difference > 0
+        energy_excess = np.where(excess, difference, 0.0)
+        energy_needed = np.where(excess, 0.0, -difference)
+
+        for module in self._iter_modules('flex'):
+            if module.is_sink:
+                sink_amt = -1.0 * np.minimum(module.max_consumption(current_step), energy_excess)
+            else:
+                sink_amt = zeros
+
+            if module.is_source:
+                source_amt = np.minimum(module.max_production(current_step), energy_needed)
+            else:
+                source_amt = zeros
+
+            sink_amt = np.where(excess, sink_amt, 0.0)
+            source_amt = np.where(excess, 0.0, source_amt)
+
+            _step_module(module, sink_amt + source_amt, False)
+
+            energy_excess = energy_excess + sink_amt
+            energy_needed = energy_needed - source_amt
+
+        self._reconcile_load_met(info)
+
+        self._balance_logger.log(
+            reward=reward,
+            shaped_reward=reward,
+            overall_provided_to_microgrid=provided,
+            overall_absorbed_from_microgrid=absorbed,
+            flex_provided_to_microgrid=provided - controllable_provided,
+            flex_absorbed_from_microgrid=absorbed - controllable_absorbed,
+            controllable_provided_to_microgrid=controllable_provided - fixed_provided,
+            controllable_absorbed_from_microgrid=controllable_absorbed - fixed_absorbed,
+            fixed_provided_to_microgrid=fixed_provided,
+            fixed_absorbed_from_microgrid=fixed_absorbed
+        )
+
+        self._current_step += 1
+
+        unbalanced = ~np.isclose(provided, absorbed)
+        if unbalanced.any():
+            raise RuntimeError('Microgrid modules unable to balance energy production with consumption in '
+                               f'instances {np.flatnonzero(unbalanced).tolist()}.')
+
+        return self._observations(), reward, done, info
+
+    def _split_control(self, name, module_controls, n_modules):
+        if n_modules == 1 and not (isinstance(module_controls, (list, tuple)) and len(module_controls) == 1):
+            module_controls = [module_controls]
+
+        if len(module_controls) != n_modules:
+            raise ValueError(f'Expected {n_modules} controls for module "{name}" but received {len(module_controls)}.')
+
+        split = []
+        for module_control in module_controls:
+            module_control = np.broadcast_to(np.asarray(module_control, dtype=float).reshape(-1),
+                                             (self._n_instances, ))
+            split.append(module_control)
+
+        return split
+
+    def _reconcile_load_met(self, info):
+        loads = [module for module in self._iter_modules() if module.module_type[0] == 'load']
+        if not loads:
+            return
+
+        demands = [module_info['absorbed_energy'] for name, infos in info.items() for module_info in infos
+                   if name in {load.name for load in loads}]
+        total_demand = np.sum(demands, axis=0)
+
+        loss_load_total = np.zeros(self._n_instances)
+        for module in self._iter_modules():
+            if module.module_type[0] == 'balancing':
+                loss_load_total = loss_load_total + module.logger.last('loss_load_energy')
+
+        has_demand = total_demand > 0.0
+        served_total = np.maximum(total_demand - loss_load_total, 0.0)
+        ratio = np.clip(np.divide(served_total, total_demand, out=np.ones_like(total_demand), where=has_demand),
+                        0.0, 1.0)
+
+        for load in loads:
+            load_info = info[load.name][self._modules[load.name].index(load)]
+            demand = load_info['absorbed_energy']
+            served = np.where(has_demand, demand * ratio, demand)
+            load_info['absorbed_energy'] = served
+            load_info['unserved_energy'] = demand - served
+            load.logger.last('load_met')[:] = served
+
+    def _observations(self):
+        return {name: [module.observation(self._current_step) for module in modules]
+                for name, modules in self._modules.items()}
+
+    def _iter_modules(self, module_kind=None):
+        for _, modules in self._iter_named_modules(module_kind):
+            for module in modules:
+                yield module
+
+    def _iter_named_modules(self, module_kind=None):
+        for name, modules in self._modules.items():
+            if module_kind is None or modules[0].module_type[-1] == module_kind:
+                yield name, modules
+
+    def get_log(self, instance, as_frame=True, drop_singleton_key=False):
+        """
+        Collect the log of a single microgrid instance.
+
+        Parameters
+        ----------
+        instance : int
+            Index of the microgrid, in the order passed to the constructor.
+        as_frame : bool, default True
+            Whether to return the log as a pd.DataFrame. If False, returns a nested dict.
+        drop_singleton_key : bool, default False
+            Whether to drop index level enumerating the modules by name if each module name has only one module.
+
+        Returns
+        -------
+        pd.DataFrame or dict
+            Log with the same columns as :meth:`.Microgrid.get_log`.
+
+        """
+        if not -self._n_instances <= instance < self._n_instances:
+            raise IndexError(f'instance {instance} out of range for {self._n_instances} instances.')
+
+        _log_dict = dict()
+        for name, modules in self._modules.items():
+            for j, module in enumerate(modules):
+                for key in module.logger.keys():
+                    _log_dict[(name, j, key)] = module.logger.column(key, instance)
+
+        _log_dict = dict(sorted(_log_dict.items(), key=lambda k: k[0]))
+
+        for key in self._balance_logger.keys():
+            _log_dict[('balance', 0, key)] = self._balance_logger.column(key, instance)
+
+        df = pd.DataFrame(_log_dict, index=pd.RangeIndex(start=self._initial_step, stop=self._current_step))
+        df.columns = pd.MultiIndex.from_tuples(df.columns.to_list(), names=['module_name', 'module_number', 'field'])
+
+        if drop_singleton_key:
+            cols = df.columns
+            df.columns = pd.MultiIndex.from_arrays([
+                cols.get_level_values(j) for j in range(cols.nlevels) if cols.get_level_values(j).nunique() > 1])
+
+        if as_frame:
+            return df
+
+        return df.to_dict()
+
+    @property
+    def n_instances(self):
+        """
+        Number of batched microgrids.
+
+        Returns
+        -------
+        int
+        """
+        return self._n_instances
+
+    @property
+    def current_step(self):
+        """
+        Current step of all instances.
+
+        Returns
+        -------
+        int
+        """
+        return self._current_step
+
+    @property
+    def initial_step(self):
+        """
+        Step to which :attr:`.current_step` is reset when calling :meth:`.reset`.
+
+        Returns
+        -------
+        int
+        """
+        return self._initial_step
+
+    @property
+    def final_step(self):
+        """
+        Final step of the underlying time series.
+
+        Returns
+        -------
+        int
+        """
+        return self._final_step
+
+    @property
+    def modules(self):
+        """
+        Batched modules by name.
+
+        Returns
+        -------
+        dict[str, list]
+        """
+        return self._modules
+
+    def __len__(self):
+        return self._n_instances
+
+    def __repr__(self):
+        module_str = ', '.join(f'{name} x {len(modules)}' for name, modules in self._modules.items())
+        return f'{self.__class__.__name__}([{module_str}], n_instances={self._n_instances})'
+
+
+class _BatchedLog:
+    """
+    Column store of per-step arrays of shape ``(n_instances, )``, grown geometrically as needed.
+    """
+    def __init__(self, n_instances, n_steps=0):
+        self._n_instances = n_instances
+        self._capacity = max(int(n_steps), 1)
+        self._length = 0
+        self._columns = {}
+
+    def log(self, **log_items):
+        if self._length == self._capacity:
+            self._grow()
+
+        for key, value in log_items.items():
+            try:
+                column = self._columns[key]
+            except KeyError:
+                column = self._columns[key] = np.zeros((self._capacity, self._n_instances))
+
+            column[self._length] = value
+
+        self._length += 1
+
+    def _grow(self):
+        self._capacity *= 2
+        for key, column in self._columns.items():
+            grown = np.zeros((self._capacity, self._n_instances))
+            grown[:self._length] = column[:self._length]
+            self._columns[key] = grown
+
+    def flush(self):
+        self._length = 0
+
+    def keys(self):
+        return self._columns.keys()
+
+    def column(self, key, instance):
+        return self._columns[key][:self._length, instance]
+
+    def last(self, key):
+        return self._columns[key][self._length - 1]
+
+    def __len__(self):
+        return self._length
+
+
+def _get_batched_module(name, modules, n_log_steps):
+    module = modules[0]
+
+    for cls in (_BatchedBattery, _BatchedGrid, _BatchedLoad, _BatchedRenewable, _BatchedUnbalanced):
+        if isinstance(module, cls.module_cls):
+            return cls(name, modules, n_log_steps)
+
+    raise TypeError(f'Module {module.__class__.__name__} is not supported by {BatchedMicrogrid.__name__}.')
+
+
+class _BatchedModule:
+    module_cls = None
+
+    def __init__(self, name, modules, n_log_steps):
+        module = modules[0]
+
+        self.name = name
+        self.module_type = module.module_type
+        self.is_source, self.is_sink = module.is_source, module.is_sink
+        self.provided_energy_name = module.provided_energy_name
+        self.absorbed_energy_name = module.absorbed_energy_name
+        self.raise_errors = np.array([m.raise_errors for m in modules], dtype=bool)
+
+        if module.action_space.shape[0]:
+            self._act_low, self._act_high, self._act_norm_low, self._act_norm_high = self._stack_bounds(
+                [m.action_space for m in modules])
+        else:
+            self._act_low = self._act_high = self._act_norm_low = self._act_norm_high = None
+
+        self._obs_low, self._obs_high, self._obs_norm_low, self._obs_norm_high = self._stack_bounds(
+            [m.observation_space for m in modules])
+
+        self.logger = _BatchedLog(len(modules), n_log_steps)
+
+    @staticmethod
+    def _stack_bounds(spaces):
+        def stack(attr):
+            return np.stack([getattr(getattr(space, kind), 'low' if attr.endswith('low') else 'high').astype(float)
+                             for space in spaces for kind in [attr.split('_')[0]]])
+
+        return stack('unnormalized_low'), stack('unnormalized_high'), stack('normalized_low'), stack('normalized_high')
+
+    @staticmethod
+    def _spread(low, high):
+        spread = high - low
+        return np.where(spread == 0, 1.0, spread)
+
+    def reset(self):
+        self.logger.flush()
+
+    def step(self, action, current_step, normalized=True):
+        if self._act_low is not None:
+            if normalized:
+                norm_low, norm_high = self._act_norm_low[:, 0], self._act_norm_high[:, 0]
+                low, high = self._act_low[:, 0], self._act_high[:, 0]
+                action = low + (self._spread(low, high) / self._spread(norm_low, norm_high)) * \
+                    (np.clip(action, norm_low, norm_high) - norm_low)
+            else:
+                action = np.clip(action, self._act_low[:, 0], self._act_high[:, 0])
+
+        state = self.state_dict(current_step)
+        provided, absorbed, reward, info = self._unnormalized_step(np.asarray(action, dtype=float), current_step)
+
+        energy_info = dict()
+        if self.provided_energy_name is not None:
+            energy_info[self.provided_energy_name] = provided
+        if self.absorbed_energy_name is not None:
+            energy_info[self.absorbed_energy_name] = absorbed
+
+        self.logger.log(reward=reward, **info, **energy_info, **state)
+
+        return provided, absorbed, reward, {'provided_energy': provided, 'absorbed_energy': absorbed, **info}, \
+            self._done(current_step)
+
+    def _unnormalized_step(self, action, current_step):
+        as_source = (action > 0) | ((action == 0) & self.is_source)
+
+        if (as_source & (action > 0)).any() and not self.is_source:
+            raise AssertionError(f'Module {self.name} is not a source.')
+        if (~as_source).any() and not self.is_sink:
+            raise AssertionError(f'Module {self.name} is not a sink.')
+
+        energy_demand = np.where(as_source, action, 0.0)
+        energy_excess = np.where(as_source, 0.0, -1.0 * action)
+
+        zeros = np.zeros_like(action)
+        max_production = self.max_production(current_step) if self.is_source else zeros
+        max_consumption = self.max_consumption(current_step) if self.is_sink else zeros
+
+        self._check_errors(as_source & (energy_demand > max_production), 'supply', max_production)
+        self._check_errors(~as_source & (energy_excess > max_consumption), 'absorb', max_consumption)
+
+        provided = np.where(as_source, np.minimum(energy_demand, max_production), 0.0)
+        absorbed = np.where(as_source, 0.0, np.minimum(energy_excess, max_consumption))
+
+        reward, info = self.update(provided, absorbed, as_source, current_step)
+        return provided, absorbed, reward, info
+
+    def _check_errors(self, violations, verb, available):
+        violations = violations & self.raise_errors
+        if violations.any():
+            idx = np.flatnonzero(violations)
+            raise ValueError(f'Module {self.name} unable to {verb} requested value in instances {idx.tolist()}. '
+                             f'Max currently available: {available[idx].round(2).tolist()}.')
+
+    def update(self, provided, absorbed, as_source, current_step):
+        raise NotImplementedError
+
+    def state_dict(self, current_step):
+        raise NotImplementedError
+
+    def state(self, current_step):
+        return np.column_stack(list(self.state_dict(current_step).values())) if self._obs_low.shape[1] else \
+            np.zeros((len(self.raise_errors), 0))
+
+    def observation(self, current_step):
+        low, high = self._obs_low, self._obs_high
+        value = np.clip(self.state(current_step), low, high)
+        return self._obs_norm_low + (self._spread(self._obs_norm_low, self._obs_norm_high) /
+                                     self._spread(low, high)) * (value - low)
+
+    def max_production(self, current_step):
+        return np.zeros(len(self.raise_errors))
+
+    def max_consumption(self, current_step):
+        return np.zeros(len(self.raise_errors))
+
+    def _done(self, current_step):
+        return False
+
+
+class _BatchedTimeSeriesModule(_BatchedModule):
+    def __init__(self, name, modules, n_log_steps):
+        super().__init__(name, modules, n_log_steps)
+
+        if any(m.forecast_horizon > 0 for m in modules):
+            raise ValueError(f'Module {name} has a forecaster; forecasters are not supported by '
+                             f'{BatchedMicrogrid.__name__}.')
+
+        length = min(len(m) for m in modules)
+        self.time_series = np.stack([m.time_series[:length] for m in modules]).astype(float)
+        self.state_components = modules[0].state_components
+        self.final_step = modules[0].final_step
+
+    def row(self, current_step):
+        return self.time_series[:, current_step, :]
+
+    def state_dict(self, current_step):
+        try:
+            row = self.row(current_step)
+        except IndexError:
+            row = (self._obs_low + self._obs_high) / 2
+
+        return {f'{component}_current': row[:, j] for j, component in enumerate(self.state_components)}
+
+    def _done(self, current_step):
+        return current_step >= self.final_step - 1
+
+
+class _BatchedLoad(_BatchedTimeSeriesModule):
+    module_cls = LoadModule
+
+    def current_load(self, current_step):
+        return -1.0 * self.row(current_step)[:, 0]
+
+    def _unnormalized_step(self, action, current_step):
+        absorbed = self.current_load(current_step)
+        return np.zeros_like(absorbed), absorbed, np.zeros_like(absorbed), {}
+
+    def max_consumption(self, current_step):
+        return self.current_load(current_step)
+
+
+class _BatchedRenewable(_BatchedTimeSeriesModule):
+    module_cls = RenewableModule
+
+    def current_renewable(self, current_step):
+        return self.row(current_step)[:, 0]
+
+    def update(self, provided, absorbed, as_source, current_step):
+        return np.zeros_like(provided), {'curtailment': self.current_renewable(current_step) - provided}
+
+    def max_production(self, current_step):
+        return self.current_renewable(current_step)
+
+
+class _BatchedGrid(_BatchedTimeSeriesModule):
+    module_cls = GridModule
+
+    def __init__(self, name, modules, n_log_steps):
+        super().__init__(name, modules, n_log_steps)
+        self.max_import = np.array([m.max_import for m in modules], dtype=float)
+        self.max_export = np.array([m.max_export for m in modules], dtype=float)
+        self.cost_per_unit_co2 = np.array([m.cost_per_unit_co2 for m in modules], dtype=float)
+
+    def update(self, provided, absorbed, as_source, current_step):
+        row = self.row(current_step)
+        co2_production = np.where(as_source, provided * row[:, 2], 0.0)
+        co2_cost = -1.0 * self.cost_per_unit_co2 * co2_production
+        reward = np.where(as_source, -1.0 * row[:, 0] * provided, row[:, 1] * absorbed) + co2_cost
+        return reward, {'co2_production': co2_production}
+
+    def max_production(self, current_step):
+        return self.max_import * self.row(current_step)[:, 3]
+
+    def max_consumption(self, current_step):
+        return self.max_export * self.row(current_step)[:, 3]
+
+
+class _BatchedUnbalanced(_BatchedModule):
+    module_cls = UnbalancedEnergyModule
+
+    def __init__(self, name, modules, n_log_steps):
+        super().__init__(name, modules, n_log_steps)
+        self.loss_load_cost = np.array([m.loss_load_cost for m in modules], dtype=float)
+        self.overgeneration_cost = np.array([m.overgeneration_cost for m in modules], dtype=float)
+
+    def update(self, provided, absorbed, as_source, current_step):
+        reward = -1.0 * np.where(as_source, self.loss_load_cost * provided, self.overgeneration_cost * absorbed)
+        return reward, {'loss_load_energy': provided, 'overgeneration_energy': absorbed}
+
+    def state_dict(self, current_step):
+        return dict()
+
+    def max_production(self, current_step):
+        return np.full(len(self.raise_errors), np.inf)
+
+    def max_consumption(self, current_step):
+        return np.full(len(self.raise_errors), np.inf)
+
+
+class _BatchedBattery(_BatchedModule):
+    module_cls = BatteryModule
+
+    def __init__(self, name, modules, n_log_steps):
+        super().__init__(name, modules, n_log_steps)
+
+        for module in modules:
+            if type(module.battery_transition_model) is not BatteryTransitionModel:
+                raise TypeError(f'Battery transition model {module.battery_transition_model.__class__.__name__} '
+                                f'is not supported by {BatchedMicrogrid.__name__}; only '
+                                f'{BatteryTransitionModel.__name__} is.')
+
+        def stack(attr):
+            return np.array([getattr(m, attr) for m in modules], dtype=float)
+
+        self.min_capacity = stack('min_capacity')
+        self.max_capacity = stack('max_capacity')
+        self.max_charge = stack('max_charge')
+        self.max_discharge = stack('max_discharge')
+        self.efficiency = stack('efficiency')
+        self.battery_cost_cycle = stack('battery_cost_cycle')
+        self.current_charge = stack('current_charge')
+        self.soc = stack('soc')
+
+    def update(self, provided, absorbed, as_source, current_step):
+        internal_energy_change = np.where(as_source, -1.0 * provided / self.efficiency, absorbed * self.efficiency)
+
+        self.current_charge = np.maximum(self.current_charge + internal_energy_change, self.min_capacity)
+        self.soc = self.current_charge / self.max_capacity
+
+        return -1.0 * np.abs(internal_energy_change) * self.battery_cost_cycle, {}
+
+    def state_dict(self, current_step):
+        return {'soc': self.soc.copy(), 'current_charge': self.current_charge.copy()}
+
+    def max_production(self, current_step):
+        return np.minimum(self.max_discharge, self.current_charge - self.min_capacity) * self.efficiency
+
+    def max_consumption(self, current_step):
+        return np.minimum(self.max_charge, self.max_capacity - self.current_charge) / self.efficiency
@@ -1,5 +1,6 @@
 import numpy as np
 import pandas as pd
+import pickle
 import yaml
 
 from copy import deepcopy
@@ -9,11 +10,13 @@ from src.pymgrid.microgrid import DEFAULT_HORIZON
 from src.pymgrid.modules import ModuleContainer, UnbalancedEnergyModule
 from src.pymgrid.microgrid.utils.step import MicrogridStep
 from src.pymgrid.utils.eq import verbose_eq
-from src.pymgrid.utils.logger import ModularLogger
+from src.pymgrid.utils.logger import ModularLogger, ColumnarLogger
 from src.pymgrid.utils.serialize import add_numpy_pandas_representers, add_numpy_pandas_constructors, dump_data
 from src.pymgrid.utils.space import MicrogridSpace
 from src.pymgrid.utils.deprecation import deprecation_err
 
+_SNAPSHOT_VERSION = 1
+
 
 class Microgrid(yaml.YAMLObject):
     """
@@ -58,6 +61,12 @@ class Microgrid(yaml.YAMLObject):
 
         If None, :attr:`.initial_step` and :attr:`.final_step` are used to define every episode.
 
+    columnar_log : bool, default False
+        Whether to store the logs of the microgrid and its modules in preallocated float64 arrays
+        (see :class:`.ColumnarLogger`) instead of lists. The arrays are sized from
+        ``final_step - initial_step`` and grown as needed, e.g. in online mode. Reduces the memory footprint and
+        time spent logging long simulations; all logged values must be numeric scalars.
+
 
     Examples
     --------
@@ -106,7 +115,8 @@ class Microgrid(yaml.YAMLObject):
                  loss_load_cost=10.,
                  overgeneration_cost=2.,
                  reward_shaping_func=None,
-                 trajectory_func=None):
+                 trajectory_func=None,
+                 columnar_log=False):
 
         self._modules = self._get_module_container(modules,
                                                    add_unbalanced_module,
@@ -128,6 +138,19 @@ class Microgrid(yaml.YAMLObject):
 
         self._balance_logger = ModularLogger()
         self._microgrid_logger = ModularLogger()  # log additional information.
+        self._log_offset = 0  # steps dropped from the logs by restoring a snapshot with a log tail.
+
+        if columnar_log:
+            self._set_columnar_loggers()
+
+    def _set_columnar_loggers(self):
+        n_steps = self._final_step - self._initial_step
+        capacity = int(n_steps) if np.isfinite(n_steps) and n_steps > 0 else 1024
+
+        for module in self._modules.iterlist():
+            module.logger = ColumnarLogger(module.logger.to_dict(), capacity=capacity)
+
+        self._balance_logger = ColumnarLogger(self._balance_logger.to_dict(), capacity=capacity)
 
     def _get_unbalanced_energy_module(self,
                                       loss_load_cost,
@@ -214,6 +237,7 @@ class Microgrid(yaml.YAMLObject):
             Observations from resetting the modules as well as the flushed balance log.
         """
         self._set_trajectory()
+        self._log_offset = 0
         return {
             **{name: [module.reset() for module in module_list] for name, module_list in self.modules.iterdict()},
             **{"balance": self._balance_logger.flush(),
@@ -536,6 +560,61 @@ class Microgrid(yaml.YAMLObject):
                     raise AttributeError(f'Module "{module_name}" does not support online ingestion.')
                 module.ingest_online_data(value, step=step)
 
+    def ingest_real_time_batch(self, data, start_step=None):
+        """Ingest blocks of consecutive real-time measurements for online modules.
+
+        Equivalent to calling :meth:`ingest_real_time_data` once per step, starting at ``start_step``,
+        but each module is updated once for the whole block. Use it to absorb a backlog of samples
+        (e.g. after a reconnect) and then call :meth:`step` once per ingested sample.
+
+        Parameters
+        ----------
+        data : dict[str, np.ndarray or list[np.ndarray]]
+            Mapping from module name to a block of shape ``(n_steps, n_components)`` or ``(n_steps, )``.
+            If several modules are registered under the name, pass a list with one block per module.
+            All blocks must have the same number of steps.
+        start_step : int or None, default None
+            Time-step of the first row of each block. If None, each module's current step is used.
+
+        Returns
+        -------
+        n_steps : int
+            Number of steps ingested.
+        """
+
+        n_steps = None
+        blocks = []
+
+        for module_name, modules in self._modules.iterdict():
+            if module_name not in data:
+                continue
+
+            module_blocks = data[module_name]
+            if not isinstance(module_blocks, (list, tuple)):
+                module_blocks = [module_blocks]
+
+            if len(module_blocks) != len(modules):
+                raise ValueError(f'Expected {len(modules)} blocks for module "{module_name}" but '
+                                 f'received {len(module_blocks)}.')
+
+            for module, block in zip(modules, module_blocks):
+                if not hasattr(module, 'ingest_online_batch'):
+                    raise AttributeError(f'Module "{module_name}" does not support online ingestion.')
+
+                block = np.asarray(block, dtype=float)
+                if n_steps is None:
+                    n_steps = len(block)
+                elif len(block) != n_steps:
+                    raise ValueError(f'All blocks must have the same number of steps; module "{module_name}" '
+                                     f'received {len(block)} but expected {n_steps}.')
+
+                blocks.append((module, block))
+
+        for module, block in blocks:
+            module.ingest_online_batch(block, start_step=start_step)
+
+        return n_steps or 0
+
     def fetch_real_time_data(self, module_names=None):
         """Fetch the latest real-time measurements from online modules.
 
@@ -621,7 +700,7 @@ class Microgrid(yaml.YAMLObject):
 
         col_names = ['module_name', 'module_number', 'field']
 
-        initial_step = self._modules.get_attrs('initial_step', unique=True)
+        initial_step = self._modules.get_attrs('initial_step', unique=True) + getattr(self, '_log_offset', 0)
 
         try:
 
@@ -1094,6 +1173,132 @@ class Microgrid(yaml.YAMLObject):
         """
         return yaml.safe_load(stream)
 
+    def snapshot(self, log_tail=None):
+        """
+        Compact binary snapshot of the current state of the microgrid.
+
+        Contains the state of each module -- including battery transition model internals and, for online
+        modules, the ingested data -- as well as the tail of the module and balance logs. Class parameters and
+        offline time series are not included, making a snapshot much smaller and faster to produce than
+        :meth:`dump`; it can only be restored with :meth:`restore` into a microgrid with the same configuration.
+
+        Parameters
+        ----------
+        log_tail : int or None, default None
+            Number of log entries to keep for each module, the balance log and the transition histories.
+            If None, keeps the whole logs. After restoring a truncated log, :meth:`get_log` starts at the first
+            retained step.
+
+        Returns
+        -------
+        bytes
+            The snapshot.
+
+        Examples
+        --------
+        >>> snapshot = microgrid.snapshot(log_tail=96)
+        >>> same_microgrid = build_microgrid().restore(snapshot)
+
+        """
+        modules = self._modules.to_tuples()
+        state = {
+            "version": _SNAPSHOT_VERSION,
+            "modules": [(name, type(module).__name__) for name, module in modules],
+            "module_states": [module.snapshot_state(log_tail=log_tail) for _, module in modules],
+            "initial_step": self._initial_step,
+            "final_step": self._final_step,
+            "balance_log": self._balance_logger.tail(log_tail),
+            "microgrid_log": self._microgrid_logger.tail(log_tail)
+        }
+
+        return pickle.dumps(state, protocol=pickle.HIGHEST_PROTOCOL)
+
+    def restore(self, snapshot):
+        """
+        Restore a state returned by :meth:`snapshot`, in place.
+
+        The microgrid must have the same modules, with the same parameters, as the one the snapshot was taken
+        from; e.g. a microgrid built from the same configuration.
+
+        Parameters
+        ----------
+        snapshot : bytes
+            Output of :meth:`snapshot`.
+
+        Returns
+        -------
+        Microgrid
+            The microgrid, with the restored state.
+
+        Raises
+        ------
+        ValueError
+            If the snapshot was produced by an incompatible version or the modules do not match.
+
+        """
+        state = pickle.loads(snapshot)
+
+        if state.get("version") != _SNAPSHOT_VERSION:
+            raise ValueError(f'Unsupported snapshot version {state.get("version")}, expected {_SNAPSHOT_VERSION}.')
+
+        modules = self._modules.to_tuples()
+        module_types = [(name, type(module).__name__) for name, module in modules]
+        if module_types != state["modules"]:
+            raise ValueError(f'Snapshot modules do not match the microgrid:\n\tsnapshot: {state["modules"]}'
+                             f'\n\tmicrogrid: {module_types}')
+
+        for (_, module), module_state in zip(modules, state["module_states"]):
+            module.restore_state(module_state)
+
+        self._initial_step = state["initial_step"]
+        self._final_step = state["final_step"]
+        self._balance_logger.restore(state["balance_log"])
+        self._microgrid_logger.restore(state["microgrid_log"])
+
+        self._update_log_offset()
+        return self
+
+    def trim_logs(self, log_tail):
+        """
+        Drop all but the last ``log_tail`` entries of the module and balance logs, in place.
+
+        Battery transition histories are trimmed as well. Long-running online microgrids can call this
+        periodically to keep their memory bounded; :meth:`get_log` then starts at the first retained step.
+
+        Parameters
+        ----------
+        log_tail : int
+            Number of log entries to keep.
+
+        Returns
+        -------
+        Microgrid
+            The microgrid, with the trimmed logs.
+
+        Examples
+        --------
+        >>> for j in range(steps):
+        ...     microgrid.step(control)
+        ...     if j % 96 == 0:
+        ...         microgrid.trim_logs(96)
+
+        """
+        if log_tail < 0:
+            raise ValueError(f'log_tail must be non-negative, received {log_tail}.')
+
+        for _, module in self._modules.to_tuples():
+            module.trim_log(log_tail)
+
+        self._balance_logger.restore(self._balance_logger.tail(log_tail))
+        self._microgrid_logger.restore(self._microgrid_logger.tail(log_tail))
+
+        self._update_log_offset()
+        return self
+
+    def _update_log_offset(self):
+        n_steps = self.current_step - self._modules.get_attrs('initial_step', unique=True)
+        self._log_offset = max(n_steps - len(self._balance_logger), 0)
+
     @classmethod
     def to_yaml(cls, dumper, data):
         """
@@ -4,6 +4,7 @@ import logging
 import yaml
 import numpy as np
 
+from copy import deepcopy
 from warnings import warn
 
 from src.pymgrid.utils.eq import verbose_eq
@@ -1048,6 +1049,73 @@ class BaseMicrogridModule(yaml.YAMLObject):
             warn(f"Unused keys in serialized_dict: {list(serialized_dict.keys())}")
         return self
 
+    def snapshot_state(self, log_tail=None):
+        """
+        Copy of the module's current state, as restored by :meth:`restore_state`.
+
+        Unlike :meth:`serialize`, class parameters are not included: the snapshot can only be restored into a
+        module built with the same parameters. Used by :meth:`.Microgrid.snapshot`.
+
+        :meta private:
+
+        Parameters
+        ----------
+        log_tail : int or None, default None
+            Number of log entries to keep. If None, keeps the whole log.
+
+        Returns
+        -------
+        dict
+            The module's state and log tail.
+
+        """
+        return {
+            "state": {attr_name: deepcopy(getattr(self, attr_name)) for attr_name in self._snapshot_attributes()},
+            "log": self._logger.tail(log_tail)
+        }
+
+    def restore_state(self, snapshot):
+        """
+        Restore a state returned by :meth:`snapshot_state`.
+
+        :meta private:
+
+        Parameters
+        ----------
+        snapshot : dict
+            Output of :meth:`snapshot_state` of a module with the same parameters.
+
+        Returns
+        -------
+        BaseMicrogridModule or child of BaseMicrogridModule
+            The module instance.
+
+        """
+        for attr_name, value in snapshot["state"].items():
+            setattr(self, attr_name, deepcopy(value))
+
+        self._logger.restore(snapshot["log"])
+        return self
+
+    def trim_log(self, log_tail):
+        """
+        Drop all but the last ``log_tail`` entries of the module's log, in place.
+
+        Used by :meth:`.Microgrid.trim_logs` to bound the memory of long-running microgrids.
+
+        :meta private:
+
+        Parameters
+        ----------
+        log_tail : int
+            Number of log entries to keep.
+
+        """
+        self._logger.restore(self._logger.tail(log_tail))
+
+    def _snapshot_attributes(self):
+        return self.serializable_state_attributes()
+
     def verbose_eq(self, other, indent=0):
         return verbose_eq(self, other, self.__dict__.keys(), indent=indent)
 
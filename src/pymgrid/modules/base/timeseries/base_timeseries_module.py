@@ -33,13 +33,22 @@ class BaseTimeSeriesMicrogridModule(BaseMicrogridModule):
                  absorbed_energy_name='absorbed_energy',
                  normalize_pos=...,
                  online=False,
-                 initial_time_series_value=0.0):
+                 initial_time_series_value=0.0,
+                 online_max_history=None):
+
+        if online_max_history is not None and online_max_history < 1:
+            raise ValueError('online_max_history must be a positive integer or None.')
 
         self._online_mode = online
         self._online_fill_value = None
         self._final_step_dynamic = False
         self.online = online
         self.initial_time_series_value = initial_time_series_value
+        self.online_max_history = online_max_history
+
+        self._online_buffer = None
+        self._online_buffer_start = 0
+        self._time_series_offset = 0
 
         self._time_series = self._set_time_series(time_series, initial_time_series_value)
         self._min_obs, self._max_obs, self._min_act, self._max_act = self._get_bounds()
@@ -112,9 +121,12 @@ class BaseTimeSeriesMicrogridModule(BaseMicrogridModule):
         else:
             return -np.abs(time_series)
 
-    def _get_bounds(self):
-        if self._time_series.size:
-            _min, _max = np.min(self._time_series), np.max(self._time_series)
+    def _get_bounds(self, time_series=None):
+        if time_series is None:
+            time_series = self._time_series
+
+        if time_series.size:
+            _min, _max = np.min(time_series), np.max(time_series)
         else:
             _min = _max = 0.0
 
@@ -125,6 +137,30 @@ class BaseTimeSeriesMicrogridModule(BaseMicrogridModule):
 
         return _min, _max, _min, _max
 
+    def _extend_bounds(self, rows):
+        """
+        Widen the observation and action bounds to contain ``rows`` without rescanning the time series.
+
+        Returns
+        -------
+        changed : bool
+            Whether any bound was widened.
+        """
+        old_bounds = self._min_obs, self._max_obs, self._min_act, self._max_act
+        bounds = self._get_bounds(rows)
+        new_bounds = (
+            np.minimum(old_bounds[0], bounds[0]),
+            np.maximum(old_bounds[1], bounds[1]),
+            np.minimum(old_bounds[2], bounds[2]),
+            np.maximum(old_bounds[3], bounds[3])
+        )
+
+        if all(np.array_equal(old, new) for old, new in zip(old_bounds, new_bounds)):
+            return False
+
+        self._min_obs, self._max_obs, self._min_act, self._max_act = new_bounds
+        return True
+
     def _set_state_dict_keys(self):
         return {
             "current": [f"{component}_current" for component in self.state_components],
@@ -147,7 +183,9 @@ class BaseTimeSeriesMicrogridModule(BaseMicrogridModule):
         forecast : None or np.ndarray, shape (n, len(self.state_components))
             The forecasted time series.
         """
-        val_c_n = self.time_series[1+self.current_step:1+self.current_step+self.forecast_horizon, :]
+        start = 1 + self.current_step - self._time_series_offset
+        # Copy: forecasters clip their output in place, which must not write into the time series.
+        val_c_n = self.time_series[start:start+self.forecast_horizon, :].copy()
         try:
             val_c = self._get_timeseries_row(self.current_step)
         except RuntimeError:
@@ -186,9 +224,12 @@ class BaseTimeSeriesMicrogridModule(BaseMicrogridModule):
         """
         View of the module's time series.
 
+        If ``online_max_history`` is set, only the retained rows are returned; the first of them
+        corresponds to step :attr:`time_series_offset`.
+
         Returns
         -------
-        time_series : np.ndarray, shape (len(self), len(self.state_components))
+        time_series : np.ndarray, shape (len(self) - self.time_series_offset, len(self.state_components))
             The underlying time series.
 
         """
@@ -196,6 +237,9 @@ class BaseTimeSeriesMicrogridModule(BaseMicrogridModule):
 
     @time_series.setter
     def time_series(self, value):
+        self._online_buffer = None
+        self._online_buffer_start = 0
+        self._time_series_offset = 0
         self._time_series = self._set_time_series(value, self._online_fill_value)
         self._min_obs, self._max_obs, self._min_act, self._max_act = self._get_bounds()
         self._action_space = self._get_action_spaces(self.normalized_action_bounds)
@@ -390,16 +434,36 @@ class BaseTimeSeriesMicrogridModule(BaseMicrogridModule):
     def serializable_state_attributes(self):
         return ["_current_step"]
 
+    def _snapshot_attributes(self):
+        attrs = ["_current_step", "_current_forecast"]
+        if self._online_mode:
+            # Ingested data are part of the state; only the retained rows are copied, not the buffer.
+            attrs.extend(["_time_series", "_time_series_offset", "_online_fill_value",
+                          "_min_obs", "_max_obs", "_min_act", "_max_act"])
+        return attrs
+
+    def restore_state(self, snapshot):
+        super().restore_state(snapshot)
+        if self._online_mode:
+            self._online_buffer = None
+            self._online_buffer_start = 0
+            self._sync_online_time_series()
+        return self
+
     def __len__(self):
-        return self._time_series.shape[0]
+        return self._time_series_offset + self._time_series.shape[0]
 
     def _update_dynamic_final_step(self):
         if getattr(self, '_final_step_dynamic', False):
             self._final_step = len(self)
 
     def _get_timeseries_row(self, step):
+        row = step - self._time_series_offset
+        if row < 0:
+            raise RuntimeError(f'Step {step} is no longer retained (online_max_history={self.online_max_history}).')
+
         try:
-            return self._time_series[step, :]
+            return self._time_series[row, :]
         except IndexError:
             if self._online_mode:
                 raise RuntimeError(f'No data ingested for step {step}. Call ingest_online_data before stepping.')
@@ -409,48 +473,178 @@ class BaseTimeSeriesMicrogridModule(BaseMicrogridModule):
     def online_mode(self):
         return self._online_mode
 
+    @property
+    def time_series_offset(self):
+        """
+        Step corresponding to the first row of :attr:`time_series`.
+
+        Always zero unless ``online_max_history`` is set and older rows have been dropped.
+
+        Returns
+        -------
+        offset : int
+            Number of dropped steps.
+
+        """
+        return self._time_series_offset
+
     def ingest_online_data(self, value, step=None):
-        if not self._online_mode:
-            raise RuntimeError('Module is not configured for online ingestion.')
+        """
+        Write a measurement for ``step`` into the module's time series.
 
-        if step is None:
-            step = self.current_step
+        Values are stored in a growable buffer, so appending is amortized O(1). Bounds are widened
+        with the new values only and the action and observation spaces are updated in place; as a
+        consequence, bounds never shrink when a value is overwritten. If ``online_max_history``
+        is set, rows older than the current step are dropped beyond that many retained rows.
 
-        if step < 0:
-            raise ValueError('step must be non-negative.')
+        Parameters
+        ----------
+        value : float or array-like, shape (len(self.state_components), )
+            Measurement for a single step.
+
+        step : int or None, default None
+            Step to write. If None, writes :attr:`current_step`. Steps past the end of the time
+            series are padded with the last ingested value.
 
+        """
         n_components = len(self.state_components) if self.state_components is not None else 1
         new_value = np.array(value, dtype=float).reshape((-1, n_components))
 
         if new_value.shape[0] != 1:
             raise ValueError('value must define a single time step.')
 
-        signed_value = self._sign_check(new_value)
+        self.ingest_online_batch(new_value, start_step=step)
+
+    def ingest_online_batch(self, values, start_step=None):
+        """
+        Write measurements for consecutive steps into the module's time series.
+
+        Equivalent to calling :meth:`ingest_online_data` once per row, starting at ``start_step``,
+        but bounds, spaces and the forecast are updated once for the whole block.
+
+        Parameters
+        ----------
+        values : array-like, shape (n_steps, len(self.state_components)) or (n_steps, )
+            Measurements, one row per step.
+
+        start_step : int or None, default None
+            Step of the first row. If None, :attr:`current_step`.
+
+        """
+        if not self._online_mode:
+            raise RuntimeError('Module is not configured for online ingestion.')
+
+        if start_step is None:
+            start_step = self.current_step
+
+        if start_step < 0:
+            raise ValueError('step must be non-negative.')
+
+        if start_step < self._time_series_offset:
+            raise ValueError(f'step {start_step} is no longer retained '
+                             f'(online_max_history={self.online_max_history}).')
+
+        n_components = len(self.state_components) if self.state_components is not None else 1
+        new_values = np.array(values, dtype=float).reshape((-1, n_components))
+
+        if new_values.shape[0] == 0:
+            return
+
+        signed_values = self._sign_check_rows(new_values)
+
+        first_row = start_step - self._time_series_offset
+        last_row = first_row + len(signed_values) - 1
         current_len = len(self._time_series)
+        new_len = max(current_len, last_row + 2)
 
-        if current_len == 0:
-            filler = self._online_fill_value if self._online_fill_value is not None else signed_value
-            padding = np.repeat(filler, step, axis=0) if step > 0 else np.empty((0, filler.shape[1]))
-            self._time_series = np.vstack([padding, signed_value])
-        elif step >= current_len:
-            filler = self._online_fill_value if self._online_fill_value is not None else self._time_series[-1:]
-            padding = np.repeat(filler, step + 1 - current_len, axis=0)
-            self._time_series = np.vstack([self._time_series, padding])
+        self._reserve_online_rows(new_len)
+        buffer_rows = self._online_buffer[self._online_buffer_start:self._online_buffer_start + new_len]
 
-        self._time_series[step, :] = signed_value.reshape((-1, n_components))[0]
-        self._online_fill_value = signed_value.copy()
+        bounds_changed = False
+        if first_row > current_len:
+            filler = self._online_fill_value if self._online_fill_value is not None else signed_values[:1]
+            buffer_rows[current_len:first_row] = filler
+            bounds_changed = self._extend_bounds(filler)
 
-        if len(self._time_series) <= step + 1:
-            self._time_series = np.vstack([self._time_series, self._online_fill_value])
+        buffer_rows[first_row:last_row + 1] = signed_values
+        if last_row + 1 >= current_len:
+            buffer_rows[last_row + 1] = signed_values[-1]
+        self._online_fill_value = signed_values[-1:].copy()
+        self._time_series = buffer_rows
 
-        self._min_obs, self._max_obs, self._min_act, self._max_act = self._get_bounds()
-        self._action_space = self._get_action_spaces(self.normalized_action_bounds)
-        self._observation_space = self._get_observation_spaces()
+        self._trim_online_history()
+
+        bounds_changed = self._extend_bounds(signed_values) or bounds_changed
+        self._sync_online_time_series(bounds_changed)
+        self._current_forecast = self.forecast()
+
+    def _sync_online_time_series(self, bounds_changed=True):
+        """
+        Propagate a change of the online time series to the spaces, the final step and the forecaster.
+        """
+        if bounds_changed:
+            self._action_space.update_bounds(*self._as_bound_arrays(self.min_act, self.max_act))
+            self._observation_space.update_bounds(*self._as_bound_arrays(self.min_obs, self.max_obs))
+            self._forecaster.observation_space = self._observation_space
         self._update_dynamic_final_step()
 
         try:
-            self._forecaster.time_series = self.time_series[self.initial_step:self.final_step, :]
+            start = max(self.initial_step - self._time_series_offset, 0)
+            self._forecaster.time_series = self.time_series[start:self.final_step - self._time_series_offset, :]
         except AttributeError:
             pass
 
-        self._current_forecast = self.forecast()
+    def _sign_check_rows(self, rows):
+        """
+        Apply :meth:`_sign_check` to each row of ``rows`` independently.
+        """
+        if self.is_source and self.is_sink:
+            return rows
+
+        if ((rows > 0).any(axis=1) & (rows < 0).any(axis=1)).any():
+            raise ValueError('time_series cannot contain both positive and negative values unless it is both '
+                             'a source and a sink.')
+
+        if self.is_source:
+            return np.abs(rows)
+        else:
+            return -np.abs(rows)
+
+    def _reserve_online_rows(self, n_rows):
+        """
+        Make room for ``n_rows`` retained rows in the online buffer, doubling its capacity when full.
+        """
+        start = self._online_buffer_start
+
+        if self._online_buffer is not None and start + n_rows <= len(self._online_buffer):
+            return
+
+        n_retained = len(self._time_series)
+
+        if self._online_buffer is None or len(self._online_buffer) < 2 * n_rows:
+            buffer = np.empty((max(2 * n_rows, 64), self._time_series.shape[1]))
+        else:
+            # Enough capacity, but the retained rows have drifted to the end: move them back to the front.
+            buffer = self._online_buffer
+
+        buffer[:n_retained] = self._time_series
+        self._online_buffer = buffer
+        self._online_buffer_start = 0
+        self._time_series = buffer[:n_retained]
+
+    def _trim_online_history(self):
+        if self.online_max_history is None:
+            return
+
+        n_drop = min(len(self._time_series) - self.online_max_history, self.current_step - self._time_series_offset)
+
+        if n_drop > 0:
+            self._online_buffer_start += n_drop
+            self._time_series_offset += n_drop
+            self._time_series = self._time_series[n_drop:]
+
+    @staticmethod
+    def _as_bound_arrays(low, high):
+        low = low if isinstance(low, np.ndarray) else np.array([low])
+        high = high if isinstance(high, np.ndarray) else np.array([high])
+        return low, high
@@ -95,6 +95,8 @@ class BatteryModule(BaseMicrogridModule):
                  normalized_action_bounds=(0, 1),
                  raise_errors=False):
         assert 0 < efficiency <= 1
+        self._limits_cache, self._limits_cache_key = {}, None
+        self._transition_calls = 0
         self.min_capacity = min_capacity
         self.max_capacity = max_capacity
         self.max_charge = max_charge
@@ -152,6 +154,8 @@ class BatteryModule(BaseMicrogridModule):
             assert np.isclose(self._current_charge, self.min_capacity)
             self._current_charge = self.min_capacity
         self._soc = self._current_charge/self.max_capacity
+        # The transition model may have changed state even if the charge did not.
+        self._limits_cache.clear()
 
     def get_cost(self, energy_change):
         """
@@ -212,6 +216,7 @@ class BatteryModule(BaseMicrogridModule):
             Amount of energy that the battery must use or will retain given the external amount of energy.
 
         """
+        self._transition_calls += 1
         return self.battery_transition_model(
             external_energy_change=energy,
             state_update=state_update,
@@ -266,29 +271,141 @@ class BatteryModule(BaseMicrogridModule):
                     )
 
     def _set_min_max_act(self):
+        return self._cached_limit('min_max_act', self._compute_min_max_act)
+
+    def _compute_min_max_act(self):
         min_act = self.model_transition(-1 * self.max_charge, state_update=False)
         max_act = self.model_transition(self.max_discharge, state_update=False)
 
         return min_act, max_act
 
+    def _cached_limit(self, name, func):
+        """
+        Value of ``func()``, computed at most once per battery state.
+
+        Limits derived from the transition model depend on the current step, the charge, the battery parameters and
+        the state of health of the transition model (if any). The cache is dropped whenever any of these change and
+        after every call to :meth:`_update_state`.
+        """
+        key = (getattr(self, '_current_step', 0),
+               self._current_charge,
+               self.min_capacity,
+               self.max_capacity,
+               self.max_charge,
+               self.max_discharge,
+               self.efficiency,
+               getattr(self._battery_transition_model, 'soh', None))
+
+        if key != self._limits_cache_key:
+            self._limits_cache.clear()
+            self._limits_cache_key = key
+
+        try:
+            return self._limits_cache[name]
+        except KeyError:
+            value = self._limits_cache[name] = func()
+            return value
+
+    def snapshot_state(self, log_tail=None):
+        snapshot = super().snapshot_state(log_tail=log_tail)
+        transition_model = self._battery_transition_model
+        if hasattr(transition_model, 'snapshot_state'):
+            snapshot["transition_model"] = transition_model.snapshot_state(history_tail=log_tail)
+        return snapshot
+
+    def restore_state(self, snapshot):
+        super().restore_state(snapshot)
+        if "transition_model" in snapshot:
+            self._battery_transition_model.restore_state(snapshot["transition_model"])
+
+        self._limits_cache.clear()
+        self._limits_cache_key = None
+        return self
+
+    def trim_log(self, log_tail):
+        super().trim_log(log_tail)
+        if hasattr(self._battery_transition_model, 'trim_transition_history'):
+            self._battery_transition_model.trim_transition_history(log_tail)
+
+    def _snapshot_attributes(self):
+        return ['_current_step', '_current_charge', '_soc', '_min_act', '_max_act', '_transition_calls']
+
     def _state_dict(self):
         return dict(zip(('soc', 'current_charge'), [self._soc, self._current_charge]))
 
     @property
     def max_production(self):
         # Max discharge
-        return self.model_transition(
+        return self._cached_limit('max_production', lambda: self.model_transition(
             min(self.max_discharge, self._current_charge-self.min_capacity),
             state_update=False,
-        )
+        ))
 
     @property
     def max_consumption(self):
         # Max charge
-        return -1 * self.model_transition(
+        return self._cached_limit('max_consumption', lambda: -1 * self.model_transition(
             -1 * min(self.max_charge, self.max_capacity - self._current_charge),
             state_update=False,
-        )
+        ))
+
+    def limits(self, soc=None):
+        """
+        Bounds on charging and discharging the battery.
+
+        Uses the closed-form :meth:`.BatteryTransitionModel.limits` of the battery transition model.
+
+        Parameters
+        ----------
+        soc : float, np.ndarray or None, default None
+            State(s) of charge at which to evaluate the bounds. If None, the current state is used.
+
+        Returns
+        -------
+        limits : dict[str, float or np.ndarray]
+            Internal and external charge and discharge bounds. See :meth:`.BatteryTransitionModel.limits`.
+
+        Raises
+        ------
+        NotImplementedError
+            If the battery transition model does not define ``limits`` and ``soc`` is passed.
+
+        """
+        kwargs = self.transition_kwargs()
+        if soc is not None:
+            soc = np.asarray(soc, dtype=float)
+            kwargs['state_dict'] = {'soc': soc, 'current_charge': soc * self.max_capacity}
+
+        try:
+            limits = self.battery_transition_model.limits
+        except AttributeError:
+            if soc is not None:
+                raise NotImplementedError(f'{self.battery_transition_model.__class__.__name__} does not define '
+                                          f'limits; bounds are only available in the current state.')
+
+            return dict(internal_charge=min(self.max_charge, self.max_capacity - self._current_charge),
+                        internal_discharge=min(self.max_discharge, self._current_charge - self.min_capacity),
+                        external_charge=self.max_consumption,
+                        external_discharge=self.max_production)
+
+        return limits(**kwargs)
+
+    @property
+    def transition_calls(self):
+        """
+        Number of times the battery transition model has been called.
+
+        Includes calls with ``state_update=False`` made to compute :attr:`.max_production`,
+        :attr:`.max_consumption` and the action bounds; these are cached per battery state, so the count grows by a
+        bounded amount per step.
+
+        Returns
+        -------
+        transition_calls : int
+            Number of calls to :meth:`model_transition`.
+
+        """
+        return self._transition_calls
     @property
     def current_charge(self):
         """
@@ -402,3 +519,5 @@ class BatteryModule(BaseMicrogridModule):
             self._battery_transition_model = BatteryTransitionModel()
         else:
             self._battery_transition_model = value
+
+        self._limits_cache.clear()
@@ -5,3 +5,4 @@ from .unipi_transition_model import UnipiChemistryTransitionModel
 from .lfp_transition_model import LfpTransitionModel
 from .nmc_transition_model import NmcTransitionModel
 from .nca_transition_model import NcaTransitionModel
+from .energy_trace import EnergyTrace
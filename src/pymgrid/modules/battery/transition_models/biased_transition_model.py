@@ -3,11 +3,13 @@ from src.pymgrid.modules.battery.transition_models import BatteryTransitionModel
 
 class BiasedTransitionModel(BatteryTransitionModel):
     yaml_tag = u"!BiasedTransitionModel"
+    state_attributes = ('efficiency', )
 
     def __init__(self, true_efficiency=None, relative_efficiency=None):
         if true_efficiency is None and relative_efficiency is None:
             raise ValueError("Must pass one of 'true_efficiency' and 'relative_efficiency'.")
 
+        super().__init__()
         self.true_efficiency = true_efficiency
         self.relative_efficiency = relative_efficiency
         self.efficiency = None
@@ -21,7 +23,18 @@ class BiasedTransitionModel(BatteryTransitionModel):
         else:
             self.efficiency = self.true_efficiency
 
-    def transition(self, external_energy_change, efficiency, **kwargs):
+    def transition(self, external_energy_change, efficiency, state_update=True, **kwargs):
         self._set_efficiency(efficiency)
         return super().transition(external_energy_change=external_energy_change,
-                                  efficiency=self.efficiency)
+                                  efficiency=self.efficiency,
+                                  state_update=state_update)
+
+    def inverse_transition(self, internal_energy_change, efficiency, **kwargs):
+        if self.efficiency is not None:
+            efficiency = self.efficiency
+        elif self.true_efficiency is None:
+            efficiency = self.relative_efficiency * efficiency
+        else:
+            efficiency = self.true_efficiency
+
+        return super().inverse_transition(internal_energy_change, efficiency)
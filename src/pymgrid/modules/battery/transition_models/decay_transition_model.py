@@ -3,6 +3,7 @@ from src.pymgrid.modules.battery.transition_models import BatteryTransitionModel
 
 class DecayTransitionModel(BatteryTransitionModel):
     yaml_tag = u"!DecayTransitionModel"
+    state_attributes = ('initial_step', '_previous_step')
 
     def __init__(self, decay_rate=0.999**(1/24)):
         """
@@ -14,6 +15,7 @@ class DecayTransitionModel(BatteryTransitionModel):
             Default is equivalent to 1/10 of a percent decay in one day.
 
         """
+        super().__init__()
         self.decay_rate = decay_rate
         self.initial_step = None
         self._previous_step = 0
@@ -25,23 +27,38 @@ class DecayTransitionModel(BatteryTransitionModel):
     def _current_efficiency(self, efficiency, current_step):
         return efficiency * (self.decay_rate ** (current_step-self.initial_step))
 
+    def _efficiency_at(self, efficiency, current_step):
+        # _current_efficiency after _update_step(current_step), without updating the step.
+        if self.initial_step is None or current_step <= self.initial_step or \
+                current_step not in (self._previous_step, self._previous_step + 1):
+            return efficiency
+
+        return efficiency * (self._decay_rate() ** (current_step - self.initial_step))
+
+    def _decay_rate(self):
+        return self.decay_rate
+
+    def inverse_transition(self, internal_energy_change, efficiency, current_step=0, **kwargs):
+        return super().inverse_transition(internal_energy_change, self._efficiency_at(efficiency, current_step))
+
     def _update_step(self, current_step):
         if current_step == self._previous_step + 1:
             self._previous_step += 1
         elif self.initial_step is None or current_step <= self.initial_step or current_step != self._previous_step:
             self.reset(current_step)
 
-    def transition(self, external_energy_change, efficiency, current_step, **kwargs):
+    def transition(self, external_energy_change, efficiency, current_step, state_update=True, **kwargs):
         self._update_step(current_step)
         current_efficiency = self._current_efficiency(efficiency, current_step)
 
-        return super().transition(external_energy_change, efficiency=current_efficiency)
+        return super().transition(external_energy_change, efficiency=current_efficiency, state_update=state_update)
 
 
 class DecayCycleTransitionModel(DecayTransitionModel):
     # https://en.wikipedia.org/wiki/Capacity_loss
 
     yaml_tag = u"!DecayCycleTransitionModel"
+    state_attributes = (*DecayTransitionModel.state_attributes, 'decay_rate', 'cycle_amount', 'num_cycles')
 
     def __init__(self, decay_rate_per_cycle=1-2.5e-4):
         super().__init__(None)
@@ -57,6 +74,9 @@ class DecayCycleTransitionModel(DecayTransitionModel):
         self.decay_rate = self.decay_rate_per_cycle ** self.num_cycles
         return super()._current_efficiency(efficiency, current_step)
 
+    def _decay_rate(self):
+        return self.decay_rate_per_cycle ** self.num_cycles
+
     def _update_num_cycles(self, external_energy_change, max_capacity, min_capacity):
         if self.cycle_amount is None:
             self.cycle_amount = max_capacity - min_capacity
@@ -66,7 +86,9 @@ class DecayCycleTransitionModel(DecayTransitionModel):
 
         self.num_cycles += external_energy_change / self.cycle_amount
 
-    def transition(self, external_energy_change, efficiency, current_step, max_capacity, min_capacity, **kwargs):
-        self._update_num_cycles(external_energy_change, max_capacity, min_capacity)
+    def transition(self, external_energy_change, efficiency, current_step, max_capacity, min_capacity,
+                   state_update=True, **kwargs):
+        if state_update:
+            self._update_num_cycles(external_energy_change, max_capacity, min_capacity)
 
-        return super().transition(external_energy_change, efficiency, current_step)
+        return super().transition(external_energy_change, efficiency, current_step, state_update=state_update)
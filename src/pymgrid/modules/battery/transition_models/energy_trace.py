@@ -0,0 +1,170 @@
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+
+class EnergyTrace:
+    """Buffered trace of the intermediate values of a battery transition.
+
+    Each call to :meth:`record` writes a single row into a preallocated
+    float64 array of ``flush_size`` rows. What happens once the buffer is full
+    depends on ``path``:
+
+    * If ``path`` is None, the buffer is a ring buffer: the oldest rows are
+      overwritten and only the last ``flush_size`` rows are kept in memory.
+    * Otherwise, the buffered rows are appended to ``path`` in a single write
+      and the buffer is emptied. Call :meth:`close` (or use the trace as a
+      context manager) to write any remaining rows. CSV output is appended
+      to an existing file; parquet output overwrites it.
+
+    Parameters
+    ----------
+    fields : list of str
+        Names of the numeric fields recorded at each step.
+    path : str, Path or None, default None
+        File to write the trace to. If None, the trace is kept in memory only.
+    file_format : {'csv', 'npy', 'parquet'} or None, default None
+        Format of the output. If None, inferred from the suffix of ``path``.
+        With ``'npy'``, each flush is saved as a separate ``<stem>_<k>.npy``
+        file next to ``path``; ``'parquet'`` requires ``pyarrow``.
+    flush_size : int, default 1024
+        Number of rows buffered in memory before being written to ``path``,
+        or kept in memory if ``path`` is None.
+    """
+
+    formats = ('csv', 'npy', 'parquet')
+
+    def __init__(self, fields, path=None, file_format=None, flush_size=1024):
+        if flush_size < 1:
+            raise ValueError(f'flush_size must be positive, got {flush_size}.')
+
+        self.fields = list(fields)
+        self.path = Path(path) if path is not None else None
+        self.file_format = self._get_format(self.path, file_format)
+        self.flush_size = int(flush_size)
+
+        self._buffer = np.full((self.flush_size, len(self.fields) + 1), np.nan)
+        self._contexts = []
+        self._n_rows = 0
+        self._n_recorded = 0
+        self._n_chunks = 0
+        self._parquet_writer = None
+
+    @classmethod
+    def _get_format(cls, path, file_format):
+        if file_format is None:
+            if path is None:
+                return None
+            file_format = path.suffix.lstrip('.').lower() or 'csv'
+
+        if file_format not in cls.formats:
+            raise ValueError(f"file_format must be one of {cls.formats}, got '{file_format}'.")
+
+        if file_format == 'parquet':
+            try:
+                import pyarrow  # noqa: F401
+            except ImportError:
+                raise ImportError("pyarrow is required to write parquet traces. Install with: pip install pyarrow")
+
+        return file_format
+
+    def record(self, context, values):
+        """Record the values of one step.
+
+        Parameters
+        ----------
+        context : str
+            Label of the code path that produced the values.
+        values : sequence of float
+            Values of :attr:`fields`, in order.
+        """
+        try:
+            context_code = self._contexts.index(context)
+        except ValueError:
+            context_code = len(self._contexts)
+            self._contexts.append(context)
+
+        row = self._n_rows if self.path is not None else self._n_recorded % self.flush_size
+        self._buffer[row, 0] = context_code
+        self._buffer[row, 1:] = values
+
+        self._n_recorded += 1
+        if self.path is not None:
+            self._n_rows += 1
+            if self._n_rows == self.flush_size:
+                self.flush()
+        else:
+            self._n_rows = min(self._n_rows + 1, self.flush_size)
+
+    def flush(self):
+        """Write the buffered rows to :attr:`path`. Does nothing if ``path`` is None."""
+        if self.path is None or self._n_rows == 0:
+            return
+
+        rows = self._buffer[:self._n_rows]
+
+        if self.file_format == 'npy':
+            np.save(self.path.with_name(f'{self.path.stem}_{self._n_chunks:05d}.npy'), rows)
+        elif self.file_format == 'csv':
+            self._rows_to_frame(rows).to_csv(self.path, mode='a', header=not self.path.exists(), index=False)
+        else:
+            self._write_parquet(self._rows_to_frame(rows))
+
+        self._n_chunks += 1
+        self._n_rows = 0
+
+    def _write_parquet(self, df):
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+
+        table = pa.Table.from_pandas(df, preserve_index=False)
+        if self._parquet_writer is None:
+            self._parquet_writer = pq.ParquetWriter(self.path, table.schema)
+        self._parquet_writer.write_table(table)
+
+    def close(self):
+        """Write any remaining rows and close the output file."""
+        self.flush()
+        if self._parquet_writer is not None:
+            self._parquet_writer.close()
+            self._parquet_writer = None
+
+    def _rows_to_frame(self, rows):
+        df = pd.DataFrame(rows[:, 1:], columns=self.fields)
+        df.insert(0, 'context', pd.Categorical.from_codes(rows[:, 0].astype(int), categories=self._contexts))
+        return df
+
+    def to_frame(self):
+        """Rows currently held in memory, oldest first.
+
+        Returns
+        -------
+        pd.DataFrame
+        """
+        if self.path is None and self._n_recorded > self.flush_size:
+            start = self._n_recorded % self.flush_size
+            rows = np.roll(self._buffer, -start, axis=0)
+        else:
+            rows = self._buffer[:self._n_rows]
+
+        return self._rows_to_frame(rows)
+
+    def __len__(self):
+        return self._n_recorded
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    def __del__(self):
+        try:
+            self.close()
+        except Exception:
+            pass
+
+    def __repr__(self):
+        return f'{self.__class__.__name__}(path={self.path}, file_format={self.file_format}, ' \
+               f'flush_size={self.flush_size})'
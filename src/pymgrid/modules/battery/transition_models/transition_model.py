@@ -1,4 +1,6 @@
 import inspect
+import numpy as np
+from copy import deepcopy
 import yaml
 from pathlib import Path
 import math
@@ -55,6 +57,10 @@ class BatteryTransitionModel(yaml.YAMLObject):
     yaml_loader = yaml.SafeLoader
     yaml_tag = u"!BatteryTransitionModel"
 
+    state_attributes = ()
+    """
+    Attributes that change as the model transitions, captured by :meth:`snapshot_state`.
+    """
 
     def __init__(self):
         self._transition_history = []
@@ -113,6 +119,136 @@ class BatteryTransitionModel(yaml.YAMLObject):
 
         return internal_energy_change
 
+    def inverse_transition(self, internal_energy_change, efficiency, **kwargs):
+        """
+        External energy change that results in a given internal energy change.
+
+        Inverse of :meth:`transition` that does not update any state. Accepts arrays.
+
+        Parameters
+        ----------
+        internal_energy_change : float or np.ndarray
+            Change in internal energy. Positive when charging, negative when discharging.
+        efficiency : float
+            Efficiency of the battery.
+        **kwargs
+            Remaining transition keyword arguments; see :meth:`.BatteryModule.transition_kwargs`.
+
+        Returns
+        -------
+        external_energy_change : float or np.ndarray
+            External energy change, with the same sign convention as ``internal_energy_change``.
+
+        """
+        internal_energy_change = np.asarray(internal_energy_change, dtype=float)
+        external = np.where(internal_energy_change < 0,
+                            internal_energy_change * efficiency,
+                            internal_energy_change / efficiency)
+        return external if external.ndim else external.item()
+
+    def limits(self, min_capacity, max_capacity, max_charge, max_discharge, state_dict, **kwargs):
+        """
+        Bounds on charging and discharging the battery in a given state.
+
+        Computed analytically, without probing :meth:`transition`. ``state_dict['current_charge']`` may be an array,
+        in which case the bounds are returned for each charge.
+
+        Parameters
+        ----------
+        min_capacity, max_capacity, max_charge, max_discharge : float
+            Battery parameters; see :meth:`.BatteryModule.transition_kwargs`.
+        state_dict : dict
+            State dictionary with a ``current_charge`` key.
+        **kwargs
+            Remaining transition keyword arguments, passed to :meth:`inverse_transition`.
+
+        Returns
+        -------
+        limits : dict[str, float or np.ndarray]
+            Non-negative bounds with keys:
+
+            * ``internal_charge``, ``internal_discharge``: maximum change in stored energy.
+            * ``external_charge``, ``external_discharge``: maximum energy the battery can absorb from or provide to
+              the microgrid; equal to :attr:`.BatteryModule.max_consumption` and
+              :attr:`.BatteryModule.max_production` in that state.
+
+        """
+        current_charge = np.asarray(state_dict['current_charge'], dtype=float)
+        internal_charge = np.clip(max_capacity - current_charge, 0.0, max_charge)
+        internal_discharge = np.clip(current_charge - min_capacity, 0.0, max_discharge)
+
+        kwargs.update(min_capacity=min_capacity, max_capacity=max_capacity, max_charge=max_charge,
+                      max_discharge=max_discharge, state_dict=state_dict)
+
+        return self._format_limits(
+            internal_charge=internal_charge,
+            internal_discharge=internal_discharge,
+            external_charge=self.inverse_transition(internal_charge, **kwargs),
+            external_discharge=-1 * self.inverse_transition(-1 * internal_discharge, **kwargs)
+        )
+
+    @staticmethod
+    def _format_limits(**limits):
+        return {k: v.item() if isinstance(v, np.ndarray) and v.ndim == 0 else v for k, v in limits.items()}
+
+    def snapshot_state(self, history_tail=None):
+        """
+        Copy of the model's internal state, as restored by :meth:`restore_state`.
+
+        Contains the attributes in :attr:`state_attributes` that are set on the model and the tail of the
+        transition history. Parameters passed to the constructor are not included.
+
+        Parameters
+        ----------
+        history_tail : int or None, default None
+            Number of transition history entries to keep. If None, keeps the whole history.
+
+        Returns
+        -------
+        state : dict
+            The model's state.
+
+        """
+        history = self._transition_history
+        if history_tail is not None:
+            history = history[-history_tail:] if history_tail > 0 else []
+
+        state = {attr: deepcopy(getattr(self, attr)) for attr in self.state_attributes if hasattr(self, attr)}
+        state['_transition_history'] = deepcopy(history)
+        return state
+
+    def restore_state(self, state):
+        """
+        Restore a state returned by :meth:`snapshot_state` on a model with the same parameters.
+
+        Parameters
+        ----------
+        state : dict
+            State returned by :meth:`snapshot_state`.
+
+        Returns
+        -------
+        BatteryTransitionModel
+            The model, with the restored state.
+
+        """
+        for attr, value in state.items():
+            setattr(self, attr, deepcopy(value))
+
+        return self
+
+    def trim_transition_history(self, history_tail):
+        """
+        Drop all but the last ``history_tail`` entries of the transition history, in place.
+
+        Parameters
+        ----------
+        history_tail : int
+            Number of transition history entries to keep.
+
+        """
+        self._transition_history = self._transition_history[-history_tail:] if history_tail > 0 else []
+
     def new_kwargs(self):
         params = inspect.signature(self.__init__).parameters
         params = {k: getattr(self, k) for k in params.keys() if k not in ('args', 'kwargs')}
@@ -1,6 +1,6 @@
 import os
+from bisect import bisect_right
 from typing import Tuple
-import csv
 import numpy as np
 import scipy.io as sio
 from scipy.interpolate import RegularGridInterpolator
@@ -10,6 +10,7 @@ import math
 import matplotlib.pyplot as plt
 from pathlib import Path
 
+from .energy_trace import EnergyTrace
 from .transition_model import BatteryTransitionModel
 
 
@@ -50,18 +51,38 @@ class UnipiChemistryTransitionModel(BatteryTransitionModel):
         Duration (in hours) represented by each transition call. External
         energy is divided by ``delta_t_hours`` to obtain the requested power.
     debug_energy : bool, default False
-        If True, prints detailed intermediate values used to compute
-        ``internal_energy_change`` for both the ``dyn_eta`` and ``soe_new``
-        calculation paths.
+        If True, records the intermediate values used to compute
+        ``internal_energy_change`` at each update in an :class:`.EnergyTrace`,
+        available as :attr:`debug_trace`.
+    debug_trace_path : str or None, default None
+        File the debug trace is written to, in batches of
+        ``debug_flush_size`` rows. If None, the last ``debug_flush_size``
+        rows are kept in memory only. Ignored unless ``debug_energy``.
+    debug_trace_format : {'csv', 'npy', 'parquet'} or None, default None
+        Format of the debug trace; inferred from ``debug_trace_path`` if None.
+    debug_flush_size : int, default 1024
+        Number of rows of the debug trace buffered in memory.
     wear_a, wear_b, wear_B : float or None
         Optional empirical wear coefficients; if provided, ``get_wear_cost``
         mirrors the ESS_UNIPI_* cost estimator. Otherwise, ``get_wear_cost``
         returns 0.
+    soh : float, default 1.0
+        Initial state of health.
+    interpolation : {'scipy', 'lut'}, default 'scipy'
+        How Voc and R0 are interpolated from the lookup tables. ``'scipy'``
+        uses :class:`scipy.interpolate.RegularGridInterpolator`; ``'lut'``
+        uses a precompiled table with closed-form trilinear interpolation in
+        scalar math, which returns the same values up to floating point
+        rounding at a fraction of the per-call cost.
     """
 
     yaml_dumper = yaml.SafeDumper
     yaml_loader = yaml.SafeLoader
 
+    # The debug trace is not part of the state: it is an output, written to ``debug_trace_path``.
+    state_attributes = ('soc', 'soe', '_soe', 'soh', 'last_soh', 'cumulative_ah_throughput', 'v_prev',
+                        '_last_voltage', 'current_a', 'dyn_eta', 'last_wear_cost', 'last_dynamic_efficiency')
+
     def __init__(self,
                  parameters_mat: str,
                  reference_cell_capacity_ah: float,
@@ -72,11 +93,18 @@ class UnipiChemistryTransitionModel(BatteryTransitionModel):
                  temperature_c: float = 25.0,
                  eta_inverter: float = 1.0,
                  delta_t_hours: float = 0.25, 
-                 debug_energy: bool = True,
+                 debug_energy: bool = False,
+                 debug_trace_path: str = None,
+                 debug_trace_format: str = None,
+                 debug_flush_size: int = 1024,
                  wear_a: float = None,
                  wear_b: float = None,
                  wear_B: float = None,
-                 soh: float = 1.0):
+                 soh: float = 1.0,
+                 interpolation: str = 'scipy'):
+
+        if interpolation not in ('scipy', 'lut'):
+            raise ValueError(f"interpolation must be one of ('scipy', 'lut'), got '{interpolation}'.")
         
         self.parameters_mat = parameters_mat
         self.reference_cell_capacity_ah = reference_cell_capacity_ah
@@ -88,11 +116,20 @@ class UnipiChemistryTransitionModel(BatteryTransitionModel):
         self.eta_inverter = eta_inverter
         self.delta_t_hours = delta_t_hours
         self.debug_energy = debug_energy
+        self.debug_trace_path = debug_trace_path
+        self.debug_trace_format = debug_trace_format
+        self.debug_flush_size = debug_flush_size
         self.wear_a = wear_a
         self.wear_b = wear_b
         self.wear_B = wear_B
+        self.interpolation = interpolation
         self.dyn_eta = None
-        self.debug_log_path = Path(__file__).resolve().parent / "debug_log.csv"
+        self.debug_trace = None
+        if debug_energy:
+            self.debug_trace = EnergyTrace(self._debug_fields,
+                                           path=debug_trace_path,
+                                           file_format=debug_trace_format,
+                                           flush_size=debug_flush_size)
 
          # Determine chemistry from filename
         mat_basename = os.path.splitext(self.parameters_mat)[0].lower()
@@ -134,6 +171,26 @@ class UnipiChemistryTransitionModel(BatteryTransitionModel):
 
         self._transition_history = []
 
+    _debug_fields = (
+        "current_step",
+        "temperature_c",
+        "delta_t_hours",
+        "voc_v",
+        "R0_ohm",
+        "v_prev_v",
+        "v_batt_v",
+        "external_energy_change_kwh",
+        "power_kw",
+        "current_a",
+        "soc_previous",
+        "soc_unbounded",
+        "soc_new",
+        "dyn_eta",
+        "soe_previous",
+        "soe_new",
+        "internal_energy_change_kwh",
+    )
+
     def _debug_internal_energy_change(self,
                                        *,
                                        context: str,
@@ -154,37 +211,29 @@ class UnipiChemistryTransitionModel(BatteryTransitionModel):
                                        soe_previous: float,
                                        soe_new: float,
                                        internal_energy_change: float):
-        if not self.debug_energy:
+        if self.debug_trace is None:
             return
 
-        log_entry = {
-            "context": context,
-            "current_step": current_step,
-            "temperature_c": temperature_c,
-            "delta_t_hours": delta_t,
-            "voc_v": voc,
-            "R0_ohm": R0,
-            "v_prev_v": v_prev,
-            "v_batt_v": v_batt,
-            "external_energy_change_kwh": external_energy_change,
-            "power_kw": power_kw,
-            "current_a": current_a,
-            "soc_previous": soc_previous,
-            "soc_unbounded": soc_unbounded,
-            "soc_new": soc_new,
-            "dyn_eta": dyn_eta,
-            "soe_previous": soe_previous,
-            "soe_new": soe_new,
-            "internal_energy_change_kwh": internal_energy_change,
-        }
-
-        file_exists = self.debug_log_path.exists()
-
-        with self.debug_log_path.open("a", newline="") as csvfile:
-            writer = csv.DictWriter(csvfile, fieldnames=log_entry.keys())
-            if not file_exists:
-                writer.writeheader()
-            writer.writerow(log_entry)
+        # Same order as _debug_fields.
+        self.debug_trace.record(context, (
+            current_step,
+            temperature_c,
+            delta_t,
+            voc,
+            R0,
+            v_prev,
+            v_batt,
+            external_energy_change,
+            power_kw,
+            current_a,
+            soc_previous,
+            soc_unbounded,
+            soc_new,
+            dyn_eta,
+            soe_previous,
+            soe_new,
+            internal_energy_change,
+        ))
 
     def _load_tables(self):
         """Load battery parameters from .mat file.
@@ -261,6 +310,14 @@ class UnipiChemistryTransitionModel(BatteryTransitionModel):
                 r0_data_3d
             )
 
+        self._voc_r0_lookup = None
+        if self.interpolation == 'lut':
+            self._voc_r0_lookup = _TrilinearLookup(
+                (self.soc_grid, self.temperature_grid, self.soh_grid),
+                voc_data_3d,
+                r0_data_3d
+            )
+
     def _load_soh_curve(self):
         """Load SOH vs Ah throughput curve from Excel file for NMC chemistry.
         
@@ -358,6 +415,14 @@ class UnipiChemistryTransitionModel(BatteryTransitionModel):
         soh : float, optional
             State of health to use for interpolation. If None, uses ``self.soh``.
         """
+        if self._voc_r0_lookup is not None:
+            # Same clipping as below, in scalar math.
+            soh_to_use = self.soh if soh is None else soh
+            lookup = self._voc_r0_lookup
+            return lookup(min(max(soc, lookup.soc_bounds[0]), lookup.soc_bounds[1]),
+                          min(max(temperature_c, lookup.temperature_bounds[0]), lookup.temperature_bounds[1]),
+                          min(max(soh_to_use, lookup.soh_bounds[0]), lookup.soh_bounds[1]))
+
         soc_clipped = float(np.clip(soc, self.soc_grid[0], self.soc_grid[-1]))
         temp_clipped = float(np.clip(temperature_c, self.temperature_grid[0], self.temperature_grid[-1]))
         soh_to_use = self.soh if soh is None else soh
@@ -491,26 +556,27 @@ class UnipiChemistryTransitionModel(BatteryTransitionModel):
                 internal_energy_change = external_energy_change / (dyn_eta)"""
 
 
-            self._debug_internal_energy_change(
-                context="transition (state_update=True)",
-                current_step=current_step,
-                external_energy_change=external_energy_change,
-                temperature_c=temperature_c,
-                delta_t=delta_t,
-                voc=voc,
-                R0=R0,
-                v_prev=self.v_prev,
-                v_batt=v_batt,
-                power_kw=power_kw,
-                current_a=current_a,
-                soc_previous=soc_previous if soc_previous is not None else self.soc,
-                soc_unbounded=soc_unbounded,
-                soc_new=soc_new,
-                dyn_eta=dyn_eta,
-                soe_previous=self.soe,
-                soe_new=soe_new,
-                internal_energy_change=internal_energy_change,
-            )
+            if self.debug_trace is not None:
+                self._debug_internal_energy_change(
+                    context="transition (state_update=True)",
+                    current_step=current_step,
+                    external_energy_change=external_energy_change,
+                    temperature_c=temperature_c,
+                    delta_t=delta_t,
+                    voc=voc,
+                    R0=R0,
+                    v_prev=self.v_prev,
+                    v_batt=v_batt,
+                    power_kw=power_kw,
+                    current_a=current_a,
+                    soc_previous=soc_previous if soc_previous is not None else self.soc,
+                    soc_unbounded=soc_unbounded,
+                    soc_new=soc_new,
+                    dyn_eta=dyn_eta,
+                    soe_previous=self.soe,
+                    soe_new=soe_new,
+                    internal_energy_change=internal_energy_change,
+                )
 
 
             self.last_wear_cost = self._compute_wear_cost(self.soc, soc_new, power_kw, delta_t)
@@ -609,6 +675,59 @@ class UnipiChemistryTransitionModel(BatteryTransitionModel):
 
             return internal_energy_change
 
+    def _external_gain(self, state_dict, current_step):
+        """State of energy and ratio of internal to external energy change, as in :meth:`transition_without_update`.
+
+        For the current state of the model the ratio is ``Voc / v_prev``; for
+        an array of states, the battery is assumed at rest (``v_prev = Voc``)
+        and the ratio is one.
+        """
+        soe = np.asarray(state_dict.get('soc', 0.0), dtype=float)
+
+        if soe.ndim or current_step == 0 or self.soc is None or self.v_prev is None:
+            return soe, 1.0
+
+        voc, _ = self._interp_voc_r0(self.soc, float(state_dict.get('temperature_c', self.temperature_c)), self.soh)
+        return np.asarray(self.soe, dtype=float), voc / max(self.v_prev, 1e-9)
+
+    def inverse_transition(self, internal_energy_change, efficiency=None, current_step=None, state_dict=None,
+                           **kwargs):
+        """External energy change that results in a given internal energy change.
+
+        Closed-form inverse of :meth:`transition_without_update`: the internal
+        change equals the external change scaled by ``Voc / v_prev``, within
+        the bounds on the state of energy. Does not update any state.
+        """
+        _, gain = self._external_gain(state_dict or {}, current_step)
+        external = np.asarray(internal_energy_change, dtype=float) / gain
+        return external if external.ndim else external.item()
+
+    def limits(self, min_capacity, max_capacity, max_charge, max_discharge, state_dict, current_step=None,
+               **kwargs):
+        """Bounds on charging and discharging the battery in a given state.
+
+        Same keys as :meth:`.BatteryTransitionModel.limits`. The external
+        bounds are the internal ones scaled by ``Voc / v_prev`` and capped by
+        the energy left between the state of energy and its bounds, matching
+        the forward evaluation used by :class:`.BatteryModule`. Arrays of
+        ``state_dict['soc']`` and ``state_dict['current_charge']`` are
+        evaluated with the battery at rest.
+        """
+        current_charge = np.asarray(state_dict['current_charge'], dtype=float)
+        internal_charge = np.clip(max_capacity - current_charge, 0.0, max_charge)
+        internal_discharge = np.clip(current_charge - min_capacity, 0.0, max_discharge)
+
+        soe, gain = self._external_gain(state_dict, current_step)
+        available_charge = np.maximum((1 - soe) * self.nominal_energy_kwh, 0.0)
+        available_discharge = np.maximum((soe - min_capacity / max_capacity) * self.nominal_energy_kwh, 0.0)
+
+        return self._format_limits(
+            internal_charge=internal_charge,
+            internal_discharge=internal_discharge,
+            external_charge=np.minimum(gain * internal_charge, available_charge),
+            external_discharge=np.minimum(gain * internal_discharge, available_discharge)
+        )
+
     def get_wear_cost(self, soc_previous: float, power_kw: float, delta_t_hours: float):
         return self._compute_wear_cost(soc_previous, soc_previous, power_kw, delta_t_hours)
     
@@ -702,4 +821,86 @@ class UnipiChemistryTransitionModel(BatteryTransitionModel):
             figures[key] = (fig, ax)
 
         if not figures:
-            raise ValueError("No plottable metrics found in transition history.")
\ No newline at end of file
+            raise ValueError("No plottable metrics found in transition history.")
+
+class _TrilinearLookup:
+    """Closed-form trilinear interpolation of several tables over a rectilinear grid.
+
+    Scalar counterpart of :class:`scipy.interpolate.RegularGridInterpolator`
+    with ``method='linear'``: tables are converted to nested Python lists once,
+    cells are located arithmetically along uniform axes (bisection otherwise)
+    and the eight corner values are blended in plain float math. Axes of
+    length one are constant along that dimension.
+
+    Parameters
+    ----------
+    grids : tuple of np.ndarray
+        Grid points of each of the three axes; ascending or descending.
+    *tables : np.ndarray
+        Tables of shape ``tuple(len(g) for g in grids)`` to interpolate.
+    """
+
+    def __init__(self, grids, *tables):
+        values = np.stack(tables, axis=-1).astype(float)
+        axes = []
+
+        for dim, grid in enumerate(grids):
+            grid = np.asarray(grid, dtype=float)
+            if len(grid) > 1 and grid[0] > grid[-1]:
+                grid = grid[::-1]
+                values = np.flip(values, axis=dim)
+            axes.append(_LookupAxis(grid))
+
+        self._axes = axes
+        self._values = values.tolist()
+        self._n_tables = len(tables)
+
+        # Bounds as passed to np.clip in _interp_voc_r0, i.e. in the original grid order.
+        self.soc_bounds, self.temperature_bounds, self.soh_bounds = (
+            (float(grid[0]), float(grid[-1])) for grid in grids)
+
+    def __call__(self, x, y, z):
+        i0, i1, tx = self._axes[0].locate(x)
+        j0, j1, ty = self._axes[1].locate(y)
+        k0, k1, tz = self._axes[2].locate(z)
+
+        v = self._values
+        v00, v01, v10, v11 = v[i0][j0], v[i0][j1], v[i1][j0], v[i1][j1]
+
+        out = []
+        for m in range(self._n_tables):
+            c00 = v00[k0][m] + (v00[k1][m] - v00[k0][m]) * tz
+            c01 = v01[k0][m] + (v01[k1][m] - v01[k0][m]) * tz
+            c10 = v10[k0][m] + (v10[k1][m] - v10[k0][m]) * tz
+            c11 = v11[k0][m] + (v11[k1][m] - v11[k0][m]) * tz
+
+            c0 = c00 + (c01 - c00) * ty
+            c1 = c10 + (c11 - c10) * ty
+            out.append(c0 + (c1 - c0) * tx)
+
+        return tuple(out)
+
+
+class _LookupAxis:
+    def __init__(self, grid):
+        self.grid = grid.tolist()
+        self.n = len(grid)
+        self.start = self.grid[0]
+
+        steps = np.diff(grid)
+        self.uniform = self.n > 1 and np.allclose(steps, steps[0])
+        self.inv_step = 1.0 / steps[0] if self.uniform else None
+
+    def locate(self, x):
+        """Return the indices of the cell containing ``x`` and the fractional position within it."""
+        if self.n == 1:
+            return 0, 0, 0.0
+
+        if self.uniform:
+            i = int((x - self.start) * self.inv_step)
+        else:
+            i = bisect_right(self.grid, x) - 1
+
+        i = min(max(i, 0), self.n - 2)
+        lo, hi = self.grid[i], self.grid[i + 1]
+        return i, i + 1, (x - lo) / (hi - lo)
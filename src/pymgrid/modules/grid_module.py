@@ -75,6 +75,11 @@ class GridModule(BaseTimeSeriesMicrogridModule):
         entries corresponding to ``(import_price, export_price, co2_per_kwH, grid_status)``.
         If the status component is omitted it defaults to 1 (grid available).
 
+    online_max_history : int or None, default None
+        Maximum number of past steps kept in memory when ``online`` is True. Older steps are dropped
+        as new values are ingested; the current step and later steps are always retained.
+        If None, the full history is kept.
+
     """
 
     module_type = ('grid', 'controllable')
@@ -99,7 +104,8 @@ class GridModule(BaseTimeSeriesMicrogridModule):
                  normalized_action_bounds=(0, 1),
                  raise_errors=False,
                  online=False,
-                 initial_time_series_value=None):
+                 initial_time_series_value=None,
+                 online_max_history=None):
 
         time_series, initial_time_series_value = self._check_params(
             max_import,
@@ -124,7 +130,8 @@ class GridModule(BaseTimeSeriesMicrogridModule):
             provided_energy_name='grid_import',
             absorbed_energy_name='grid_export',
             online=online,
-            initial_time_series_value=initial_time_series_value
+            initial_time_series_value=initial_time_series_value,
+            online_max_history=online_max_history
         )
 
     def _check_params(self,
@@ -187,9 +194,12 @@ class GridModule(BaseTimeSeriesMicrogridModule):
 
         return validated_time_series, validated_initial_value
 
-    def _get_bounds(self):
-        min_obs = self._time_series.min(axis=0)
-        max_obs = self._time_series.max(axis=0)
+    def _get_bounds(self, time_series=None):
+        if time_series is None:
+            time_series = self._time_series
+
+        min_obs = time_series.min(axis=0)
+        max_obs = time_series.max(axis=0)
         assert len(min_obs) in (3, 4)
 
         min_act, max_act = -1 * self.max_export, self.max_import
@@ -230,10 +240,10 @@ class GridModule(BaseTimeSeriesMicrogridModule):
 
         """
         if as_source:  # Import
-            import_cost = self._time_series[self.current_step, 0]
+            import_cost = self._get_timeseries_row(self.current_step)[0]
             return -1 * import_cost*import_export + self.get_co2_cost(import_export, as_source, as_sink)
         elif as_sink:  # Export
-            export_cost = self._time_series[self.current_step, 1]
+            export_cost = self._get_timeseries_row(self.current_step)[1]
             return export_cost * import_export + self.get_co2_cost(import_export, as_source, as_sink)
         else:
             raise RuntimeError
@@ -284,7 +294,7 @@ class GridModule(BaseTimeSeriesMicrogridModule):
 
         """
         if as_source:  # Import
-            co2_prod_per_kWh = self._time_series[self.current_step, 2]
+            co2_prod_per_kWh = self._get_timeseries_row(self.current_step)[2]
             co2 = import_export*co2_prod_per_kWh
             return co2
         elif as_sink:  # Export
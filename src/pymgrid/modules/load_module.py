@@ -60,6 +60,11 @@ class LoadModule(BaseTimeSeriesMicrogridModule):
         Initial value used to bootstrap the internal time series when ``online``
         is True and no historical data are provided.
 
+    online_max_history : int or None, default None
+        Maximum number of past steps kept in memory when ``online`` is True. Older steps are dropped
+        as new values are ingested; the current step and later steps are always retained.
+        If None, the full history is kept.
+
     """
     module_type = ('load', 'fixed')
     yaml_tag = u"!LoadModule"
@@ -79,7 +84,8 @@ class LoadModule(BaseTimeSeriesMicrogridModule):
                  normalized_action_bounds=(0, 1),
                  raise_errors=False,
                  online=False,
-                 initial_time_series_value=0.0):
+                 initial_time_series_value=0.0,
+                 online_max_history=None):
         super().__init__(
             time_series,
             raise_errors=raise_errors,
@@ -93,11 +99,12 @@ class LoadModule(BaseTimeSeriesMicrogridModule):
             provided_energy_name=None,
             absorbed_energy_name='load_met',
             online=online,
-            initial_time_series_value=initial_time_series_value
+            initial_time_series_value=initial_time_series_value,
+            online_max_history=online_max_history
         )
 
-    def _get_bounds(self):
-        _min_obs, _max_obs, _, _ = super()._get_bounds()
+    def _get_bounds(self, time_series=None):
+        _min_obs, _max_obs, _, _ = super()._get_bounds(time_series)
         return _min_obs, _max_obs, np.array([]), np.array([])
 
     def update(self, external_energy_change, as_source=False, as_sink=False):
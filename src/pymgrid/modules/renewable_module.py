@@ -63,6 +63,11 @@ class RenewableModule(BaseTimeSeriesMicrogridModule):
         Initial value used when ``online`` is True and no historical time series
         is supplied.
 
+    online_max_history : int or None, default None
+        Maximum number of past steps kept in memory when ``online`` is True. Older steps are dropped
+        as new values are ingested; the current step and later steps are always retained.
+        If None, the full history is kept.
+
     """
     module_type = ('renewable', 'flex')
     yaml_tag = u"!RenewableModule"
@@ -83,7 +88,8 @@ class RenewableModule(BaseTimeSeriesMicrogridModule):
                  normalized_action_bounds=(0, 1),
                  provided_energy_name='renewable_used',
                  online=False,
-                 initial_time_series_value=0.0):
+                 initial_time_series_value=0.0,
+                 online_max_history=None):
         super().__init__(
             time_series,
             raise_errors,
@@ -97,7 +103,8 @@ class RenewableModule(BaseTimeSeriesMicrogridModule):
             provided_energy_name=provided_energy_name,
             absorbed_energy_name=None,
             online=online,
-            initial_time_series_value=initial_time_series_value
+            initial_time_series_value=initial_time_series_value,
+            online_max_history=online_max_history
         )
 
     def update(self, external_energy_change, as_source=False, as_sink=False):
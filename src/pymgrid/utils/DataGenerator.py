@@ -916,13 +916,16 @@ class SampleGenerator:
 
         return mape
 
-    def sample_from_forecasts(self, n_samples=10, **sampling_args):
+    def sample_from_forecasts(self, n_samples=10, seed=None, **sampling_args):
         """
             Generates samples of load, grid, pv data by sampling from the distributions defined by using self.forecasts
                 as a baseline in NoisyLoadData, NoisyPVData, NoisyGridData.
 
         :param n_samples: int, default 100
             Number of samples to generate
+        :param seed: int or None, default None
+            If not None, the global numpy random state is seeded before each sample with a seed derived from it,
+            so that sample j only depends on seed and j.
         :param sampling_args: dict
             Sampling arguments to be passed to NPV.sample() and NL.sample()
         :return:
@@ -934,12 +937,16 @@ class SampleGenerator:
         NG = NoisyGridData(grid_data=self.forecasts['grid'])
 
         samples = []
+        sample_seeds = np.random.SeedSequence(seed).generate_state(n_samples) if seed is not None else None
 
         if 'noise_types' not in sampling_args.keys():
             sampling_args['noise_types'] = (None, 'gaussian')
 
         for j in range(n_samples):
             print('Creating sample {}'.format(j))
+            if sample_seeds is not None:
+                np.random.seed(sample_seeds[j])
+
             pv_forecast = NPV.sample(**sampling_args)
             load_forecast = NL.sample(**sampling_args)
 
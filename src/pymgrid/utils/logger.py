@@ -38,6 +38,22 @@ class ModularLogger(UserDict):
     def to_dict(self):
         return self.data.copy()
 
+    def tail(self, n=None):
+        """
+        Copy of the last ``n`` logged entries of each key; of the whole log if ``n`` is None.
+        """
+        if n is None:
+            return {k: list(v) for k, v in self.data.items()}
+
+        return {k: list(v[-n:]) if n > 0 else [] for k, v in self.data.items()}
+
+    def restore(self, log):
+        """
+        Replace the contents of the logger with ``log``, e.g. the output of :meth:`tail`.
+        """
+        self.data = {k: list(v) for k, v in log.items()}
+        self._log_length = max(len(v) for v in self.data.values()) if len(self.data) else 0
+
     def raw(self):
         return {k: list(map(float, v)) for k, v in self.data.items()}
 
@@ -57,3 +73,159 @@ class ModularLogger(UserDict):
         elif isinstance(raw, str):
             raw = pd.read_csv(raw).to_dict()
         return cls(raw)
+
+
+class ColumnarLogger(ModularLogger):
+    """
+    Logger storing numeric logs in a preallocated float64 array.
+
+    Behaves like :class:`ModularLogger` -- ``logger[key]`` returns the values logged under ``key`` -- but values
+    are written into a single ``(capacity, n_keys)`` array instead of being appended to Python lists. Indexing,
+    :meth:`to_dict` and :meth:`to_frame` return views of this array rather than copies; the array is grown
+    geometrically if more than ``capacity`` entries are logged.
+
+    Keys that are not logged in a given step are filled with NaN. Unlike :class:`ModularLogger`, :meth:`flush`
+    keeps the keys and the allocation so that subsequent episodes do not reallocate.
+
+    Parameters
+    ----------
+    capacity : int, default 1024
+        Number of entries to preallocate. Usually ``final_step - initial_step``.
+
+    *args, **kwargs
+        Initial log, as in :class:`ModularLogger`.
+
+    """
+    def __init__(self, *args, capacity=1024, **kwargs):
+        self._capacity = max(int(capacity), 1)
+        self._block = np.full((self._capacity, 0), np.nan)
+        self._cols = {}
+        self._last_keys, self._last_cols = None, None
+        self._log_length = 0
+
+        UserDict.__init__(self)
+        initial = dict(*args, **kwargs)
+
+        if initial:
+            length = max(len(v) for v in initial.values())
+            self._reserve(length)
+            for key, value in initial.items():
+                if isinstance(value, dict):
+                    value = list(value.values())
+                col = self._add_key(key)
+                self._block[:len(value), col] = np.asarray(value, dtype=float)
+
+            self._log_length = length
+
+    def _add_key(self, key):
+        col = self._cols[key] = len(self._cols)
+        self._block = np.hstack([self._block, np.full((self._capacity, 1), np.nan)])
+        self._set_views()
+        return col
+
+    def _reserve(self, length):
+        if length <= self._capacity:
+            return
+
+        while self._capacity < length:
+            self._capacity *= 2
+
+        block = np.full((self._capacity, self._block.shape[1]), np.nan)
+        block[:self._log_length] = self._block[:self._log_length]
+        self._block = block
+        self._set_views()
+
+    def _set_views(self):
+        self.data = {key: self._block[:, col] for key, col in self._cols.items()}
+
+    def flush(self):
+        d = {key: self[key].copy() for key in self._cols}
+        self._block[:self._log_length] = np.nan
+        self._log_length = 0
+        return d
+
+    def log(self, log_dict=None, **log_items):
+        if log_items:
+            if log_dict:
+                raise TypeError('Cannot pass both positional and keyword arguments.')
+
+            log_dict = log_items
+
+        self._reserve(self._log_length + 1)
+
+        keys = tuple(log_dict.keys())
+        if keys != self._last_keys:
+            cols = [self._cols[key] if key in self._cols else self._add_key(key) for key in keys]
+            self._last_keys, self._last_cols = keys, np.array(cols, dtype=int)
+
+        try:
+            self._block[self._log_length, self._last_cols] = list(log_dict.values())
+        except (ValueError, TypeError):
+            # Values containing arrays of size one.
+            values = []
+            for value in log_dict.values():
+                try:
+                    values.append(value.item())
+                except AttributeError:
+                    values.append(value)
+                except ValueError:
+                    raise ValueError('Only scalar values can be logged.')
+
+            self._block[self._log_length, self._last_cols] = values
+
+        self._log_length += 1
+
+    def __getitem__(self, key):
+        return self.data[key][:self._log_length]
+
+    def __setitem__(self, key, value):
+        value = np.asarray(value, dtype=float)
+        if len(value) != self._log_length:
+            raise ValueError(f'Expected {self._log_length} values for key {key}, received {len(value)}.')
+
+        col = self._cols[key] if key in self._cols else self._add_key(key)
+        self._block[:self._log_length, col] = value
+
+    def __delitem__(self, key):
+        raise TypeError(f'{self.__class__.__name__} does not support deleting keys.')
+
+    def __eq__(self, other):
+        if not isinstance(other, ModularLogger):
+            return NotImplemented
+
+        return set(self.keys()) == set(other.keys()) and \
+            all(np.array_equal(self[key], other[key], equal_nan=True) for key in self.keys())
+
+    def __copy__(self):
+        return self.__class__(self.to_dict(), capacity=self._capacity)
+
+    def copy(self):
+        return self.__copy__()
+
+    def to_dict(self):
+        return {key: self[key] for key in self._cols}
+
+    def tail(self, n=None):
+        start = 0 if n is None else max(self._log_length - n, 0) if n > 0 else self._log_length
+        return {key: self[key][start:].copy() for key in self._cols}
+
+    def restore(self, log):
+        # Keeps the allocation size, so that a restored logger does not reallocate more often than the original.
+        self.__init__(log, capacity=self._capacity)
+
+    def to_frame(self):
+        return pd.DataFrame(self._block[:self._log_length], columns=list(self._cols), copy=False)
+
+    def raw(self):
+        return {key: self[key].tolist() for key in self._cols}
+
+    @property
+    def capacity(self):
+        """
+        Number of entries that can be logged before the underlying array is reallocated.
+
+        Returns
+        -------
+        int
+        """
+        return self._capacity
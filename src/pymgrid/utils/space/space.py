@@ -70,6 +70,13 @@ def _transform_builtins(d, normalized=False):
     return transformed
 
 
+def _short_repr(arr):
+    # Same representation as gym.spaces.box._short_repr, used for Box.low_repr and Box.high_repr.
+    if arr.size != 0 and np.min(arr) == np.max(arr):
+        return str(np.min(arr))
+    return str(arr)
+
+
 def extract_builtins(d, act_or_obs='act', normalized=False):
     try:
         d = d.groupby(level=0).agg(list).T
@@ -324,6 +331,39 @@ class ModuleSpace(_PymgridSpace):
         self._norm_spread = self._normalized.high - self._normalized.low
         self._norm_spread[self._norm_spread == 0] = 1
 
+    def update_bounds(self, unnormalized_low, unnormalized_high):
+        """
+        Update the unnormalized bounds in place.
+
+        Avoids rebuilding the space when bounds move, e.g. as online data are ingested. Objects holding a
+        reference to this space (or to :attr:`unnormalized`) see the new bounds.
+
+        Parameters
+        ----------
+        unnormalized_low : np.ndarray
+            New lower bound. Must have the same shape as the current one.
+
+        unnormalized_high : np.ndarray
+            New upper bound. Must have the same shape as the current one.
+
+        """
+        box = self._unnormalized
+
+        if np.shape(unnormalized_low) != box.low.shape or np.shape(unnormalized_high) != box.high.shape:
+            raise ValueError(f'Bounds of shape {np.shape(unnormalized_low)} and {np.shape(unnormalized_high)} do not '
+                             f'match space of shape {box.shape}.')
+
+        box.low[...] = unnormalized_low
+        box.high[...] = unnormalized_high
+        box.bounded_below = -np.inf < box.low
+        box.bounded_above = np.inf > box.high
+
+        if hasattr(box, 'low_repr'):
+            box.low_repr, box.high_repr = _short_repr(box.low), _short_repr(box.high)
+
+        self._unnorm_spread[...] = box.high - box.low
+        self._unnorm_spread[self._unnorm_spread == 0] = 1
+
     def normalize(self, val):
         un_low, un_high = self._unnormalized.low, self._unnormalized.high
 
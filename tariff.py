@@ -0,0 +1,137 @@
+"""
+Tariffa a fasce compilata da price_bands di params.yml, condivisa dai percorsi offline e online.
+
+Le fasce vengono risolte una sola volta in una tabella [giorno della settimana, ora] -> indice della fascia:
+    - le fasce con `ranges` (ore intere, estremi inclusi; [22, 5] attraversa la mezzanotte) sono valutate
+      nell'ordine del file YAML e vince la prima che contiene l'ora
+    - le ore non coperte vanno alla fascia di ripiego: 'offpeak' se definita, altrimenti la prima fascia
+      senza ranges, altrimenti la prima fascia
+    - una fascia puo' limitarsi ad alcuni giorni con `days` (0 = lunedi' ... 6 = domenica); i festivi passati
+      a Tariff seguono la tabella della domenica
+
+La ricerca online (lookup) e' un accesso alla tabella e restituisce il vettore prezzi precalcolato della
+fascia, senza allocazioni; quella offline (prices, bands) e' un'indicizzazione numpy sull'intera serie.
+
+Uso:
+    tariff = Tariff(config['price_bands'], config['timezone'])
+    grid_prices, band = tariff.lookup(sample.timestamp)               # Online, un timestamp
+    price_buy, price_sell = tariff.prices(timestamps)                 # Offline, serie di timestamp
+"""
+import numpy as np
+import pandas as pd
+
+
+FALLBACK_BAND = 'offpeak'
+HOLIDAY_WEEKDAY = 6             # I festivi usano la tabella della domenica
+
+
+class Tariff:
+    """
+    Tariffa a fasce precompilata, con ricerca O(1) per timestamp.
+
+    price_config: sezione price_bands di params.yml ({fascia: {buy, sell, ranges, days}})
+    timezone:     fuso orario locale delle fasce, usato per convertire le serie offline
+    holidays:     date (datetime.date o stringhe ISO) trattate come domenica
+    """
+
+    def __init__(self, price_config, timezone=None, holidays=None):
+        if not price_config:
+            raise ValueError("price_bands vuoto: definire almeno una fascia tariffaria")
+
+        self.timezone = timezone
+        self.holidays = frozenset(pd.Timestamp(day).date() for day in holidays or ())
+
+        self.band_names = [str(band_name).upper() for band_name in price_config]
+        self.buy = np.array([float(band_cfg.get('buy', 0.0)) for band_cfg in price_config.values()])
+        self.sell = np.array([float(band_cfg.get('sell', 0.0)) for band_cfg in price_config.values()])
+
+        # Vettori prezzi della rete [buy, sell, co2, grid_status] per fascia, condivisi tra gli step
+        self._grid_prices = []
+        for buy, sell in zip(self.buy.tolist(), self.sell.tolist()):
+            grid_prices = np.array([buy, sell, 0.0, 1.0])
+            grid_prices.setflags(write=False)
+            self._grid_prices.append(grid_prices)
+
+        self.fallback = self._fallback_index(price_config)
+        self.table = self._compile(price_config, self.fallback)
+        self._lookup_table = [                      # Stessa tabella come liste: accesso piu' rapido per un solo step
+            [(self._grid_prices[index], self.band_names[index]) for index in row.tolist()]
+            for row in self.table
+        ]
+
+    @staticmethod
+    def _fallback_index(price_config):
+        """Indice della fascia di ripiego per le ore non coperte da alcun range."""
+        if FALLBACK_BAND in price_config:
+            return list(price_config).index(FALLBACK_BAND)
+        return next((index for index, band_cfg in enumerate(price_config.values()) if not band_cfg.get('ranges')), 0)
+
+    @staticmethod
+    def _compile(price_config, fallback):
+        """Tabella (7, 24) giorno della settimana x ora -> indice della fascia in price_config."""
+        table = np.full((7, 24), fallback, dtype=np.int64)
+        assigned = np.zeros((7, 24), dtype=bool)
+        hours = np.arange(24)
+
+        for index, band_cfg in enumerate(price_config.values()):
+            ranges = band_cfg.get('ranges')
+            if not ranges:
+                continue
+
+            band_hours = np.zeros(24, dtype=bool)
+            for start, end in ranges:
+                if start <= end:
+                    band_hours |= (hours >= start) & (hours <= end)
+                else:                                               # Range a cavallo della mezzanotte
+                    band_hours |= (hours >= start) | (hours <= end)
+
+            band_days = np.zeros(7, dtype=bool)
+            band_days[list(band_cfg.get('days', range(7)))] = True
+
+            mask = band_days[:, None] & band_hours[None, :] & ~assigned     # Vince la prima fascia nell'ordine YAML
+            table[mask] = index
+            assigned |= mask
+
+        return table
+
+    def _weekday(self, timestamp):
+        if self.holidays and timestamp.date() in self.holidays:
+            return HOLIDAY_WEEKDAY
+        return timestamp.weekday()
+
+    def lookup(self, timestamp):
+        """
+        (vettore prezzi [buy, sell, 0, 1], nome fascia) per un timestamp gia' nel fuso locale (come i campioni
+        del KafkaConsumer). Il vettore e' condiviso e in sola lettura.
+        """
+        return self._lookup_table[self._weekday(timestamp)][timestamp.hour]
+
+    def band_indices(self, ts_series):
+        """
+        Indice della fascia di ogni timestamp della serie (convertita nel fuso della tariffa se tz-aware).
+        I timestamp mancanti (NaT) ricadono nella fascia di ripiego.
+        """
+        timestamps = pd.DatetimeIndex(ts_series)
+        if self.timezone is not None and timestamps.tz is not None:
+            timestamps = timestamps.tz_convert(self.timezone)
+
+        missing = timestamps.isna()
+        weekdays = np.where(missing, 0, timestamps.weekday.to_numpy()).astype(np.int64)
+        hours = np.where(missing, 0, timestamps.hour.to_numpy()).astype(np.int64)
+        if self.holidays:
+            is_holiday = np.isin(timestamps.date, list(self.holidays))
+            weekdays = np.where(is_holiday, HOLIDAY_WEEKDAY, weekdays)
+
+        return np.where(missing, self.fallback, self.table[weekdays, hours])
+
+    def prices(self, ts_series):
+        """(price_buy, price_sell) per ogni timestamp della serie."""
+        indices = self.band_indices(ts_series)
+        return self.buy[indices], self.sell[indices]
+
+    def bands(self, ts_series):
+        """Nome della fascia (es. 'OFFPEAK') per ogni timestamp della serie."""
+        return np.asarray(self.band_names)[self.band_indices(ts_series)]
+
+    def __repr__(self):
+        return f"Tariff(bands={self.band_names}, timezone={self.timezone!r}, holidays={len(self.holidays)})"
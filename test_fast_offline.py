@@ -0,0 +1,91 @@
+"""
+Test di parita' tra il kernel veloce (fast_offline) e il percorso a oggetti Rule_Based_EMS + microgrid.step.
+"""
+import numpy as np
+import pandas as pd
+
+from EMS import Rule_Based_EMS
+from fast_offline import simulate_rule_based
+from microgrid_simulator import MicrogridSimulator
+
+
+N_STEPS = 300
+
+
+def _build_simulator(efficiency, n=N_STEPS + 10, seed=0):
+    rng = np.random.default_rng(seed)
+    load_time_series = pd.Series(rng.uniform(0.0, 3.0, n))
+    pv_time_series = pd.Series(np.clip(rng.uniform(-2.0, 3.5, n), 0.0, None))
+    grid_time_series = np.stack([rng.uniform(0.1, 0.3, n), rng.uniform(0.05, 0.1, n), np.zeros(n)], axis=1)
+
+    simulator = MicrogridSimulator(
+        config_path='params.yml',
+        online=False,
+        load_time_series=load_time_series,
+        pv_time_series=pv_time_series,
+        grid_time_series=grid_time_series,
+        battery_chemistry='generic'
+    )
+    simulator.battery_efficiency = efficiency
+    return simulator
+
+
+def _run_object_path(simulator, bands=None, allow_night_grid_charge=False):
+    microgrid = simulator.build_microgrid()
+    microgrid.reset()
+
+    rule_based_EMS = Rule_Based_EMS(microgrid)
+    load_module = microgrid.modules['load'][0]
+    pv_module = microgrid.modules['pv'][0]
+
+    for step in range(N_STEPS):
+        e_batt, e_grid = rule_based_EMS.control(
+            load_kwh=load_module.current_load,
+            pv_kwh=pv_module.current_renewable,
+            band=None if bands is None else bands[step],
+            allow_night_grid_charge=allow_night_grid_charge
+        )
+        microgrid.step({"battery": e_batt, "grid": e_grid}, normalized=False)
+
+    return microgrid.log
+
+
+def test_fast_offline_matches_object_path():
+    for efficiency in (1.0, 0.9):
+        simulator = _build_simulator(efficiency)
+        expected = _run_object_path(simulator)
+
+        microgrid = simulator.build_microgrid()
+        microgrid.reset()
+        result = simulate_rule_based(microgrid, steps=N_STEPS)
+
+        pd.testing.assert_frame_equal(result, expected, check_exact=False, rtol=1e-12, atol=1e-12, check_names=False)
+
+
+def test_fast_offline_night_grid_charge():
+    simulator = _build_simulator(1.0, seed=1)
+    bands = np.where(np.arange(N_STEPS) % 4 == 0, 'OFFPEAK', 'PEAK')
+    expected = _run_object_path(simulator, bands=bands, allow_night_grid_charge=True)
+
+    microgrid = simulator.build_microgrid()
+    microgrid.reset()
+    result = simulate_rule_based(microgrid, steps=N_STEPS, bands=bands, allow_night_grid_charge=True)
+
+    pd.testing.assert_frame_equal(result, expected, check_exact=False, rtol=1e-12, atol=1e-12, check_names=False)
+
+
+def test_run_fast_offline_log_split():
+    simulator = _build_simulator(1.0)
+    expected_df, expected_log = simulator.split_simulation_log(_run_object_path(simulator))
+    microgrid_df, log = simulator.run_fast_offline(steps=N_STEPS)
+
+    pd.testing.assert_frame_equal(microgrid_df, expected_df, check_exact=False, rtol=1e-12, atol=1e-12,
+                                  check_names=False)
+    pd.testing.assert_frame_equal(log, expected_log, check_exact=False, rtol=1e-12, atol=1e-12)
+
+
+if __name__ == '__main__':
+    test_fast_offline_matches_object_path()
+    test_fast_offline_night_grid_charge()
+    test_run_fast_offline_log_split()
+    print("fast_offline: parita' con il percorso a oggetti verificata")
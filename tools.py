@@ -8,37 +8,17 @@ from typing import Dict, List, Optional, Tuple, Any
 import pytz
 import pandas as pd
 
+from tariff import Tariff
 
 
 
 def get_online_grid_prices(timestamp: datetime, price_config: dict):
-    """Determina la fascia oraria del timestamp e restituisce il vettore prezzi associato."""
-    hour = timestamp.hour  # Confrontiamo solo l'ora perché le fasce sono espresse in intervalli orari.
-
-    def hour_in_ranges(hr, ranges):
-        """True se l'ora `hr` rientra in uno dei range dichiarati per la fascia (peak o standard), altrimenti False."""
-        for rng in ranges or []:
-            start, end = rng
-            if start <= hr <= end:
-                return True
-        return False
-
-    # Ricerca prioritaria: prima le fasce più costose (peak) poi quelle standard.
-    for band_key in ('peak', 'standard'):
-        band_cfg = price_config.get(band_key)
-        if band_cfg and hour_in_ranges(hour, band_cfg.get('ranges')):
-            return (
-                np.array([band_cfg.get('buy', 0.0), band_cfg.get('sell', 0.0), 0.0, 1.0]),
-                band_key.upper(),
-            )
-
-    # In assenza di match utilizziamo la fascia di fallback (offpeak o la prima definita).
-    fallback_key = 'offpeak' if 'offpeak' in price_config else next(iter(price_config))
-    fallback_cfg = price_config.get(fallback_key, {})
-    return (
-        np.array([fallback_cfg.get('buy', 0.0), fallback_cfg.get('sell', 0.0), 0.0, 1.0]),
-        fallback_key.upper(),
-    )
+    """
+    Determina la fascia oraria del timestamp e restituisce il vettore prezzi associato.
+
+    Compila la tariffa a ogni chiamata: nei cicli real-time usare Tariff.lookup sulla tariffa di load_config().
+    """
+    return Tariff(price_config).lookup(timestamp)
 
 
 
@@ -120,13 +100,31 @@ def load_config(path='params.yml'):
     except (TypeError, ValueError) as exc:
         raise ValueError("I campi 'buffer_size' e 'steps' devono essere interi.") from exc
 
+    multisite_cfg = ems_cfg.get('multisite') or {}           # Runtime multi-sito (ems_realtime_multisite.py)
+    kafka_topics = multisite_cfg.get('kafka_topics') or [ems_cfg['kafka_topic']]
+
     return {
         'kafka_topic': ems_cfg['kafka_topic'],
         'buffer_size': buffer_size,
         'timezone': ems_cfg['timezone'],
         'steps': steps,
         'price_bands': ems_cfg['price_bands'],
+        'tariff': Tariff(ems_cfg['price_bands'], ems_cfg['timezone'], holidays=ems_cfg.get('holidays')),
         'allow_night_grid_charge': bool(ems_cfg.get('allow_night_grid_charge', False)),
+        'fast_offline': bool(ems_cfg.get('fast_offline', False)),
+        'live_display': bool(ems_cfg.get('live_display', True)),
+        'display_max_fps': float(ems_cfg.get('display_max_fps', 5.0)),
+        'results_dir': ems_cfg.get('results_dir', 'outputs/realtime'),
+        'flush_every': int(ems_cfg.get('flush_every', 96)),
+        'resume_from': ems_cfg.get('resume_from'),
+        'multisite': {
+            'kafka_topics': [kafka_topics] if isinstance(kafka_topics, str) else list(kafka_topics),
+            'sites': multisite_cfg.get('sites'),
+            'max_sites': int(multisite_cfg.get('max_sites', 500)),
+            'pending_size': int(multisite_cfg.get('pending_size', 96)),
+            'log_history': int(multisite_cfg.get('log_history', 96)),
+            'keep_results': int(multisite_cfg.get('keep_results', 96)),
+        },
     }
 
 
@@ -362,46 +360,15 @@ def plot_results(df: pd.DataFrame, base_name: str, timezone: Optional[str] = Non
 
 
 def compute_offline_tariff_vectors(ts_series, local_timezone, price_config):
+    """Prezzi di acquisto e vendita di ogni step, con la stessa tariffa compilata del percorso online (Tariff)."""
 
-    hr = ts_series.dt.tz_convert(local_timezone).dt.hour
-
-    # List di condizioni e valori risultanti
-    condlist = []
-    buy_choices = []
-    sell_choices = []
-
-    # Itera sulle fasce definite nel file YAML
-    for band_name, band_data in price_config.items():
-        buy_val = float(band_data['buy'])
-        sell_val = float(band_data['sell'])
-
-        # Bande con ranges
-        if 'ranges' in band_data and band_data['ranges'] is not None:
-            band_conditions = None
-
-            # Ogni range è [start_hour, end_hour]
-            for start, end in band_data['ranges']:
-                # Se l’utente usa in YAML range inclusivi (es. 18–20)
-                # li interpretiamo come ore intere: start ≤ hr ≤ end
-                condition = hr.between(start, end)
-                band_conditions = condition if band_conditions is None else (band_conditions | condition)
-
-            condlist.append(band_conditions)
-
-        else:
-            # Bande senza ranges → si assume valida per tutte le ore non coperte da altre fasce
-            # Per evitare comportamenti non deterministici, creiamo una condizione placeholder;
-            # verrà assegnata *solo se nessuna delle fasce precedenti è valida* dopo np.select.
-            condlist.append(np.full(len(hr), True, dtype=bool))
+    return Tariff(price_config, local_timezone).prices(ts_series)
 
-        buy_choices.append(buy_val)
-        sell_choices.append(sell_val)
 
-    # np.select valuta i condlist in ordine: la prima condizione vera viene assegnata
-    price_buy_vec = np.select(condlist, buy_choices).astype(float)
-    price_sell_vec = np.select(condlist, sell_choices).astype(float)
+def compute_offline_band_vector(ts_series, local_timezone, price_config):
+    """Nome della fascia (es. 'OFFPEAK') di ogni step, con la stessa precedenza di compute_offline_tariff_vectors."""
 
-    return price_buy_vec, price_sell_vec
+    return Tariff(price_config, local_timezone).bands(ts_series)
 
 
 def add_module_columns(df, mapping):